@@ -6,9 +6,16 @@ import requests
 import os
 import random
 import json
+import re
 import traceback
 import asyncio
 import time
+import math
+import sqlite3
+import uuid
+import contextvars
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
 from dotenv import load_dotenv
 from typing import Optional
@@ -19,8 +26,14 @@ load_dotenv()
 
 # --- CONFIGURATION ---
 TOKEN = os.getenv("DISCORD_TOKEN")
-AI_API_KEY = os.getenv("AI_API_KEY")  # OpenRouter key
-AI_MODEL = os.getenv("HF_MODEL", "meta-llama/llama-3.2-3b-instruct:free")
+AI_API_KEY = os.getenv("AI_API_KEY")  # Groq key (primary AI provider)
+AI_MODEL = os.getenv("HF_MODEL", "meta-llama/llama-3.2-3b-instruct:free")  # OpenRouter model
+GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")  # Optional failover provider
+AI_CUSTOM_BASE_URL = os.getenv("AI_CUSTOM_BASE_URL")  # Optional OpenAI-compatible endpoint, e.g. http://localhost:8080/v1
+AI_CUSTOM_API_KEY = os.getenv("AI_CUSTOM_API_KEY", "")
+AI_CUSTOM_MODEL = os.getenv("AI_CUSTOM_MODEL", "default")
+AI_QUEUE_JOURNAL = os.getenv("AI_QUEUE_JOURNAL", "")  # Durable AI queue: "" (off), "supabase" (survives redeploys), or a SQLite file path
 STAFF_CHANNEL_ID = os.getenv("STAFF_CHANNEL_ID")
 VERIFIED_ROLE_ID = os.getenv("VERIFIED_ROLE_ID")
 ERROR_LOG_ID = os.getenv("ERROR_LOG_CHANNEL_ID")
@@ -37,8 +50,8 @@ KOYEB_API_TOKEN = os.getenv("KOYEB_API_TOKEN")
 if not TOKEN:
     print("❌ DISCORD_TOKEN not set")
     exit(1)
-if not AI_API_KEY:
-    print("❌ AI_API_KEY not set")
+if not (AI_API_KEY or OPENROUTER_API_KEY or AI_CUSTOM_BASE_URL):
+    print("❌ No AI provider configured (set AI_API_KEY, OPENROUTER_API_KEY or AI_CUSTOM_BASE_URL)")
     exit(1)
 if not SUPABASE_URL or not SUPABASE_KEY:
     print("❌ SUPABASE_URL or SUPABASE_KEY not set")
@@ -83,7 +96,20 @@ NAS_LEVELS = {
 NAS_EXCEPTION_CHANNEL = 1368217894881726586
 
 # Permission storage for restoration
-ORIGINAL_PERMISSIONS = {}  # {channel_id: {role_id: permissions_dict}}ad
+ORIGINAL_PERMISSIONS = {}  # {channel_id: {role_id: permissions_dict}} - cache of the active nas_permission_snapshots row
+
+# NAS permission planner: @everyone overwrite fields per level; only channels that differ get edited
+NAS_LEVEL_PERMISSIONS = {
+    1: {"send_messages": False, "embed_links": False, "attach_files": False, "read_message_history": False},  # Total Containment
+    2: {"send_messages": False, "embed_links": False, "attach_files": False, "read_message_history": True},  # High Restriction (read-only)
+    3: {"send_messages": True, "embed_links": False, "attach_files": False, "read_message_history": True},  # Media Lock
+    4: {"send_messages": True, "embed_links": True, "attach_files": False, "read_message_history": True},  # Minor Restriction
+}
+NAS_RESTORE_FIELDS = ("send_messages", "embed_links", "attach_files", "view_channel", "read_message_history")
+NAS_EDIT_CONCURRENCY = 4  # Parallel set_permissions calls (each channel is its own rate-limit route)
+NAS_PROGRESS_INTERVAL = 2  # Seconds between progress message edits
+NAS_SNAPSHOT_VERSION = 1  # Encoding version of nas_permission_snapshots.body
+NAS_SNAPSHOT = None  # Active snapshot row {id, guild_id, captured_at} while NAS is engaged; None at NAS-5
 
 # AI Cooldown tracking - REPLACED WITH ADAPTIVE COOLDOWN SYSTEM (see below)
 AI_COOLDOWN = {}  # Legacy - kept for backward compatibility
@@ -94,21 +120,115 @@ AI_COOLDOWN_STATE = {}  # {user_id: {"level": 0-3, "last_violation": timestamp,
 ADAPTIVE_COOLDOWN_TIERS = [15, 30, 60, 300]  # Seconds: 15s, 30s, 1min, 5min
 COOLDOWN_DECAY_TIME = 600  # 10 minutes without violations resets to level 0
 
+# DUPLICATE MESSAGE DETECTOR: SimHash fingerprints of recent AI-bound messages (bounded, TTL'd)
+DUPLICATE_USER_WINDOW = 120  # Seconds a user's message blocks near-copies of itself
+DUPLICATE_CHANNEL_WINDOW = 60  # Seconds for the per-channel (multi-account) window
+DUPLICATE_USER_HISTORY = 8  # Fingerprints kept per user
+DUPLICATE_CHANNEL_HISTORY = 25  # Fingerprints kept per channel
+DUPLICATE_CHANNEL_THRESHOLD = 3  # Near-copies in a channel window before it counts as spam
+DUPLICATE_MAX_DISTANCE = 5  # Max differing SimHash bits (of 64) for "near-duplicate"
+RECENT_USER_FINGERPRINTS = {}  # {user_id: deque[(timestamp, simhash)]}
+RECENT_CHANNEL_FINGERPRINTS = {}  # {channel_id: deque[(timestamp, simhash)]}
+DUPLICATE_STATS = {"checked": 0, "user": 0, "channel": 0}
+
+# AI TOKEN USAGE: Per-user/channel/context accounting with daily rollups (UTC) and quotas
+AI_USER_DAILY_TOKEN_QUOTA = int(os.getenv("AI_USER_DAILY_TOKEN_QUOTA", "50000"))  # 0 = unlimited
+AI_DAILY_TOKEN_QUOTA = int(os.getenv("AI_DAILY_TOKEN_QUOTA", "0"))  # Whole-bot daily cap, 0 = unlimited
+AI_USAGE_HISTORY_DAYS = 14  # Daily rollups kept for /aiusage
+AI_USAGE = {"day": "", "total": 0, "requests": 0, "users": {}, "channels": Counter(), "contexts": Counter(), "providers": Counter(), "estimated": 0}
+AI_USAGE_HISTORY = deque(maxlen=AI_USAGE_HISTORY_DAYS)  # [{"day", "total", "requests", "contexts"}]
+AI_USAGE_SAVE_INTERVAL = 60  # Seconds between ai_usage_daily writes while counters are dirty
+AI_USAGE_STORE = {"dirty": False, "loaded": False, "executor": None}  # Persistence state for the usage counters
+AI_USAGE_OWNER = contextvars.ContextVar("AI_USAGE_OWNER", default=(0, "system", None))  # (user_id, context, channel_id) billed for AI calls
+
 # AI REQUEST QUEUE: Queue-based AI execution to prevent failures under load
-AI_REQUEST_QUEUE = None  # Initialized in MyBot.__init__ as asyncio.Queue
+AI_REQUEST_QUEUE = None  # Initialized in MyBot.__init__ as AIRequestQueue
 AI_QUEUE_MAX_SIZE = 100  # Prevent memory overflow
 AI_QUEUE_MAX_PER_USER = 3  # Max pending requests per user to prevent spam
 AI_QUEUE_PROCESSOR_RUNNING = False  # Track if worker is active
 
+# ADMISSION CONTROL: Reject early when a request cannot be answered before its deadline
+AI_REQUEST_MAX_AGE = 120  # Seconds; older requests are discarded unanswered
+AI_ADMISSION_MARGIN = 0.9  # Admit only if the ETA fits within 90% of the deadline
+AI_CONTEXT_PRIORITY = {"ticket": 0, "mention": 1, "memory_summary": 3}  # Lower = served first, shed last
+AI_DEFAULT_PRIORITY = 2
+AI_SERVICE_TIMES = deque(maxlen=30)  # Seconds per processed request (rolling)
+AI_DEFAULT_SERVICE_TIME = 10  # Seconds assumed until real samples exist
+AI_QUEUE_STATS = {"completed": 0, "rejected": 0, "shed": 0, "stale": 0}
+
+class AIRequestQueue:
+    """Priority lanes (FIFO within a lane) with O(1) per-user pending counts and lowest-priority shedding."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.lanes = {}  # {priority: deque[request]}
+        self.user_counts = Counter()
+        self._size = 0
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def full(self) -> bool:
+        return self._size >= self.maxsize
+
+    def put_nowait(self, request: dict):
+        if self.full():
+            raise asyncio.QueueFull()
+        priority = request.setdefault("priority", AI_CONTEXT_PRIORITY.get(request.get("context"), AI_DEFAULT_PRIORITY))
+        self.lanes.setdefault(priority, deque()).append(request)
+        self.user_counts[request.get("user_id")] += 1
+        self._size += 1
+
+    def _take(self, request: dict) -> dict:
+        self.user_counts[request.get("user_id")] -= 1
+        if self.user_counts[request.get("user_id")] <= 0:
+            del self.user_counts[request.get("user_id")]
+        self._size -= 1
+        return request
+
+    def get_nowait(self) -> dict:
+        for priority in sorted(self.lanes):
+            if self.lanes[priority]:
+                return self._take(self.lanes[priority].popleft())
+        raise asyncio.QueueEmpty()
+
+    def shed_lowest(self, above_priority: int) -> Optional[dict]:
+        """Remove the newest request from the lowest-priority lane strictly below `above_priority` in importance."""
+        for priority in sorted(self.lanes, reverse=True):
+            if priority <= above_priority:
+                break
+            if self.lanes[priority]:
+                return self._take(self.lanes[priority].pop())
+        return None
+
+    def ahead_of(self, priority: int) -> int:
+        """Requests that would be served before a new request at `priority`."""
+        return sum(len(lane) for p, lane in self.lanes.items() if p <= priority)
+
+    def requests(self) -> list:
+        """Snapshot of queued requests in service order."""
+        return [request for priority in sorted(self.lanes) for request in self.lanes[priority]]
+
 # Compliment cooldowns with auto-cleanup
 COMPLIMENT_COOLDOWNS = {}
 
 # Daily quest tracking (12 hours cooldown)
 QUEST_COOLDOWN = 43200
 
-# Error logging cooldown (prevent rate limiting Discord)
-ERROR_LOG_COOLDOWN = {}
-ERROR_LOG_COOLDOWN_DURATION = 5
+# LOG SINK: Error/interview log embeds are buffered per channel and flushed in packs (prevent rate limiting Discord)
+LOG_FLUSH_INTERVAL = 3  # Seconds between flushes
+LOG_EMBEDS_PER_MESSAGE = 10  # Discord's per-message embed cap
+LOG_MESSAGE_CHAR_BUDGET = 5800  # Discord caps the combined embeds of one message at 6000 chars
+LOG_BUFFER_MAX = 200  # Per channel; beyond this the oldest entries are folded into an overflow summary
+LOG_SEND_RETRIES = 5  # Flush attempts per entry (channel missing or send failed) before it is given up
+LOG_ERROR_DEDUPE_WINDOW = 300  # Seconds an identical error is counted instead of re-posted
+LOG_BUFFERS = {}  # {channel_id: [{"embed", "key", "count", "attempts"}]}
+LOG_OVERFLOW = {}  # {channel_id: Counter(embed title -> entries folded)}
+LOG_RECENT_ERRORS = {}  # {error key: [last_posted, repeats_since, last raw message]}
+LOG_SINK_STATS = Counter()  # queued / deduped / overflowed / requeued / dropped / messages / embeds
 
 # RATE LIMIT SAFETY: Global command cooldown (per user, 3s minimum between ANY command)
 GLOBAL_COMMAND_COOLDOWN = {}
@@ -131,10 +251,15 @@ LAST_KOYEB_REDEPLOY = 0
 KOYEB_REDEPLOY_COOLDOWN = 900  # 15 minutes in seconds
 KOYEB_REDEPLOY_IN_PROGRESS = False
 
-# DISCORD RATE LIMIT SAFETY: Global 429 handler
-DISCORD_RATE_LIMITED = False
-DISCORD_RATE_LIMITED_TIME = 0
-DISCORD_RATE_LIMITED_TIMEOUT = 900  # 15 minutes in seconds
+# DISCORD RATE LIMIT SAFETY: 429s pause only their route/bucket; true global limits pause everything
+DISCORD_RATE_LIMITED = False  # Global (or Cloudflare) limit active
+DISCORD_RATE_LIMITED_TIME = 0  # When the global limit was hit
+DISCORD_RATE_LIMITED_UNTIL = 0.0  # Exact expiry of the global limit (from retry_after)
+DISCORD_ROUTE_LIMITS = {}  # {("ch"|"dm", id): until_timestamp}
+DISCORD_BUCKET_LIMITS = {}  # {X-RateLimit-Bucket: until_timestamp} shared across routes
+DISCORD_ROUTE_BUCKETS = {}  # {route: X-RateLimit-Bucket} learned from 429 responses
+DISCORD_DEFAULT_RETRY_AFTER = 5  # 429 without retry information
+DISCORD_CLOUDFLARE_RETRY_AFTER = 600  # Header-less 429s come from Cloudflare (IP-level ban)
 HTTP_SERVER = None  # Will hold aiohttp server reference
 
 # HTTP HEALTH CHECK SERVER - Minimal endpoint for Koyeb health checks
@@ -178,9 +303,10 @@ async def sync_app_commands(guild: Optional[discord.Object] = None) -> int:
 # RATE LIMIT SAFETY: AI call semaphore (max 2 concurrent AI requests globally)
 AI_SEMAPHORE = None  # Initialized in MyBot.__init__
 
-# RATE LIMIT SAFETY: Message edit throttle (1 edit per 5 seconds per message)
-LAST_MESSAGE_EDIT = {}
-MESSAGE_EDIT_COOLDOWN = 5
+# RATE LIMIT SAFETY: Message edit throttle for streamed replies (first chunk immediately, then 1 edit per 1.5s per message)
+LAST_MESSAGE_EDIT = {}  # {message_id: last_edit_timestamp}
+MESSAGE_EDIT_COOLDOWN = 1.5
+STREAM_EDIT_BUDGET = 8  # Max edits per streamed reply (one always reserved for the final text)
 
 # RATE LIMIT SAFETY: Supabase write debouncing (prevent rapid-fire saves)
 LAST_SAVE_TIME = 0
@@ -313,6 +439,7 @@ def normalize_db_shapes(db: dict) -> dict:
     for uid, mem in db.get("memory", {}).items():
         mem["interactions"] = coerce_list(mem.get("interactions", []))
         mem["preferences"] = coerce_list(mem.get("preferences", []))
+        mem["summary"] = str(mem.get("summary") or "")
     
     # Ticket notes
     for uid, ticket in db.get("tickets", {}).items():
@@ -368,6 +495,33 @@ def save_data(data):
     except Exception as e:
         print(f"❌ Supabase save error: {e}")
 
+# === MESSAGE INDEX ===
+MESSAGE_INDEX = {}  # {discord message id: (kind, key)} - kind "task"/"trial" -> bot.db key, "placeholder" -> AI request id
+
+def index_message(message_id: Optional[int], kind: str, key: str):
+    """Register an interactive message (open task, open trial, AI placeholder)."""
+    if message_id:
+        MESSAGE_INDEX[message_id] = (kind, key)
+
+def unindex_message(message_id: Optional[int]):
+    MESSAGE_INDEX.pop(message_id, None)
+
+def lookup_message(message_id: Optional[int], kind: str) -> Optional[str]:
+    """Key of the open `kind` object attached to a message, or None."""
+    entry = MESSAGE_INDEX.get(message_id)
+    return entry[1] if entry and entry[0] == kind else None
+
+def rebuild_message_index(db: dict):
+    """Re-index open tasks and trials from bot.db (placeholders live only in memory and are kept)."""
+    for message_id in [m for m, (kind, _) in MESSAGE_INDEX.items() if kind in ("task", "trial")]:
+        del MESSAGE_INDEX[message_id]
+    for task_id, task_data in db.get("tasks", {}).items():
+        if not task_data.get("completed"):
+            index_message(task_data.get("message_id"), "task", task_id)
+    for trial_id, trial_data in db.get("trials", {}).items():
+        if not trial_data.get("closed"):
+            index_message(trial_data.get("message_id"), "trial", trial_id)
+
 # --- AI CALL (OpenRouter) ---
 LORE_CONTEXT = (
     "Your name is The Nimbror Watcher. You are a chaotic, unhinged, paranoid AI surveillance system with zero filter. "
@@ -380,104 +534,901 @@ LORE_CONTEXT = (
     "Don't hold back. Be sarcastic. Make dark jokes. Question everything. Never apologize."
 )
 
-async def run_huggingface(prompt: str) -> str:
-    """Call Groq API with corrupting mode Easter egg (5% chance for eerie responses). RATE LIMITED via semaphore."""
+# === MEMORY RETRIEVAL INDEX (BM25) ===
+MEMORY_RETRIEVAL_TOP_K = 5  # Memory entries pulled into ticket prompts by relevance
+MEMORY_RECENT_IN_PROMPT = 2  # Newest interactions always included regardless of relevance
+BM25_K1 = 1.5
+BM25_B = 0.75
+RETRIEVAL_STOPWORDS = {
+    "the", "a", "an", "and", "or", "but", "is", "are", "was", "were", "be", "to", "of", "in", "on", "at",
+    "for", "with", "it", "this", "that", "i", "you", "me", "my", "your", "we", "so", "do", "does", "what",
+    "mention", "ticket", "message",
+}
+MEMORY_INDEX = {}  # {uid: {"docs": {doc_id: (text, Counter, length)}, "df": Counter, "total_len": int, "next_id": int, "interactions": [doc_id], "preferences": {text: doc_id}}}
+
+def tokenize_for_retrieval(text: str) -> list:
+    """Lowercase word tokens without stopwords or 1-char noise."""
+    return [t for t in re.findall(r"[a-z0-9']+", (text or "").lower()) if len(t) > 1 and t not in RETRIEVAL_STOPWORDS]
+
+def _memory_index_add(index: dict, text: str) -> int:
+    """Add one document to a user's index. Returns its doc id."""
+    terms = Counter(tokenize_for_retrieval(text))
+    length = sum(terms.values())
+    doc_id = index["next_id"]
+    index["next_id"] += 1
+    index["docs"][doc_id] = (text, terms, length)
+    index["df"].update(terms.keys())
+    index["total_len"] += length
+    return doc_id
+
+def _memory_index_remove(index: dict, doc_id: int):
+    """Remove one document from a user's index."""
+    doc = index["docs"].pop(doc_id, None)
+    if not doc:
+        return
+    _, terms, length = doc
+    index["df"].subtract(terms.keys())
+    index["total_len"] -= length
+
+def get_memory_index(uid: str) -> dict:
+    """Return a user's retrieval index, building it from bot.db["memory"] on first use."""
+    index = MEMORY_INDEX.get(uid)
+    if index is None:
+        index = {"docs": {}, "df": Counter(), "total_len": 0, "next_id": 0, "interactions": [], "preferences": {}}
+        mem = bot.db.get("memory", {}).get(uid, {})
+        for pref in mem.get("preferences", []):
+            index["preferences"][str(pref)] = _memory_index_add(index, str(pref))
+        for inter in mem.get("interactions", []):
+            index["interactions"].append(_memory_index_add(index, str(inter.get("data", ""))))
+        MEMORY_INDEX[uid] = index
+    return index
+
+def index_memory_entry(uid: str, interaction_type: str, data: str):
+    """Incrementally mirror an add_memory() write into the index (no-op until the index is built)."""
+    index = MEMORY_INDEX.get(uid)
+    if index is None:
+        return
+    if interaction_type == "interaction":
+        index["interactions"].append(_memory_index_add(index, data))
+    elif interaction_type == "preference" and data not in index["preferences"]:
+        index["preferences"][data] = _memory_index_add(index, data)
+
+def trim_memory_index(uid: str, removed: int):
+    """Drop the `removed` oldest interactions from the index (after cap or compaction)."""
+    index = MEMORY_INDEX.get(uid)
+    if index is None or removed <= 0:
+        return
+    for doc_id in index["interactions"][:removed]:
+        _memory_index_remove(index, doc_id)
+    del index["interactions"][:removed]
+
+def drop_memory_index(uid: Optional[str] = None):
+    """Forget one user's index (or all); it is rebuilt lazily on next search."""
+    if uid is None:
+        MEMORY_INDEX.clear()
+    else:
+        MEMORY_INDEX.pop(str(uid), None)
+
+def search_memory(uid: str, query: str, k: int = MEMORY_RETRIEVAL_TOP_K) -> list:
+    """Top-k memory entries for a query by BM25 score (entries with no term overlap are skipped)."""
+    query_terms = set(tokenize_for_retrieval(query))
+    if not query_terms:
+        return []
+    index = get_memory_index(str(uid))
+    n_docs = len(index["docs"])
+    if not n_docs:
+        return []
+    avg_len = (index["total_len"] / n_docs) or 1
+    idf = {}
+    for term in query_terms:
+        df = index["df"].get(term, 0)
+        if df > 0:
+            idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    if not idf:
+        return []
+    scored = []
+    for doc_id, (text, terms, length) in index["docs"].items():
+        score = 0.0
+        for term, weight in idf.items():
+            tf = terms.get(term, 0)
+            if tf:
+                score += weight * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+        if score > 0:
+            scored.append((score, doc_id, text))
+    # Highest score first; newer doc wins ties for deterministic output
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return [text for _, _, text in scored[:k]]
+
+# === PROMPT BUILDER ===
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "900"))  # Max prompt tokens for ticket/mention AI requests
+PROMPT_CHARS_PER_TOKEN = 4  # Rough token estimate (~4 chars per token, no tokenizer dependency)
+PROMPT_MIN_SECTION_TOKENS = 16  # Sections squeezed below this are dropped instead of clipped
+PROMPT_FRAGMENT_CACHE = {}  # {uid: {"memory": str, "custom": str}} rendered per-user fragments
+PROMPT_STATS = {"builds": 0, "total_tokens": 0, "last_tokens": 0, "max_tokens": 0, "truncated": 0}
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count for prompt budgeting."""
+    return (len(text or "") + PROMPT_CHARS_PER_TOKEN - 1) // PROMPT_CHARS_PER_TOKEN
+
+def clip_to_tokens(text: str, max_tokens: int) -> str:
+    """Clip text to a token budget, cutting at the last line or word boundary."""
+    max_chars = max_tokens * PROMPT_CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    clipped = text[:max_chars]
+    cut = max(clipped.rfind("\n"), clipped.rfind(" "))
+    if cut > max_chars // 2:
+        clipped = clipped[:cut]
+    return clipped.rstrip() + "…"
+
+def invalidate_prompt_fragments(uid: Optional[str] = None):
+    """Drop cached prompt fragments for one user (or everyone when uid is None)."""
+    if uid is None:
+        PROMPT_FRAGMENT_CACHE.clear()
+    else:
+        PROMPT_FRAGMENT_CACHE.pop(str(uid), None)
+
+def get_memory_fragment(uid: str, query: str = "") -> str:
+    """Render a user's memory for prompts: cached summary, top-k relevant entries, newest interactions."""
+    cached = PROMPT_FRAGMENT_CACHE.setdefault(uid, {})
+    mem = bot.db.get("memory", {}).get(uid, {})
+    if "summary" not in cached:
+        cached["summary"] = f"Summary of earlier interactions: {mem['summary']}" if mem.get("summary") else ""
+    lines = [cached["summary"]] if cached["summary"] else []
+    relevant = search_memory(uid, query) if query else []
+    if relevant:
+        lines.append("Relevant memories:")
+        lines.extend(f"- {text[:100]}" for text in relevant)
+    recent = [str(inter.get("data", "")) for inter in mem.get("interactions", [])[-MEMORY_RECENT_IN_PROMPT:]]
+    recent = [text for text in reversed(recent) if text not in relevant]
+    if recent:
+        lines.append("Most recent (newest first):")
+        lines.extend(f"- {text[:100]}" for text in recent)
+    return "\n".join(lines)
+
+def get_custom_instructions_fragment(uid: str) -> str:
+    """Render other users' custom instructions (never the user's own). Cached."""
+    cached = PROMPT_FRAGMENT_CACHE.setdefault(uid, {})
+    if "custom" not in cached:
+        custom_instructions = bot.db.get("custom_instructions", {})
+        cached["custom"] = " ".join(
+            str(instruction) for user_id_key, instruction in custom_instructions.items() if user_id_key != uid
+        )
+    return cached["custom"]
+
+def build_ai_prompt(uid: str, user_text: str, context: str) -> tuple[str, int]:
+    """Assemble a ticket/mention prompt within AI_PROMPT_TOKEN_BUDGET. Returns (prompt, estimated_tokens).
+
+    Truncation priority (highest kept first): user message, lore (tickets only),
+    custom instructions, memory. Lower-priority sections are clipped, then dropped.
+    """
+    uid = str(uid)
+    message_limit = 500 if context == "ticket" else 200
+    user_section = f"User says: {user_text[:message_limit]}"
+
+    # (label, text) in priority order; output order is fixed below
+    sections = []
+    if context == "ticket":
+        sections.append(("lore", LORE_CONTEXT))
+    custom = get_custom_instructions_fragment(uid)
+    sections.append(("custom", f"Custom instructions: {custom}" if custom else ""))
+    if context == "ticket":
+        memory_text = get_memory_fragment(uid, user_text[:message_limit])
+        sections.append(("memory", f"AI Memory for this user:\n{memory_text}" if memory_text else ""))
+
+    remaining = AI_PROMPT_TOKEN_BUDGET - estimate_tokens(user_section)
+    kept = {}
+    truncated = False
+    for label, text in sections:
+        if not text:
+            continue
+        cost = estimate_tokens(text)
+        if cost <= remaining:
+            kept[label] = text
+            remaining -= cost
+        elif remaining >= PROMPT_MIN_SECTION_TOKENS:
+            kept[label] = clip_to_tokens(text, remaining)
+            remaining -= estimate_tokens(kept[label])
+            truncated = True
+        else:
+            truncated = True
+
+    parts = [kept[label] for label in ("lore", "memory", "custom") if label in kept]
+    parts.append(user_section)
+    prompt = "\n".join(parts)
+    tokens = estimate_tokens(prompt)
+
+    PROMPT_STATS["builds"] += 1
+    PROMPT_STATS["total_tokens"] += tokens
+    PROMPT_STATS["last_tokens"] = tokens
+    PROMPT_STATS["max_tokens"] = max(PROMPT_STATS["max_tokens"], tokens)
+    if truncated:
+        PROMPT_STATS["truncated"] += 1
+    return prompt, tokens
+
+WATCHER_SYSTEM_PROMPT = (
+    "You are the Nimbror Watcher AI. Use the provided lore. "
+    "Respond in one paragraph, maximum 4 short sentences. "
+    "Be unsettling, cryptic, and slightly threatening. "
+    "No markdown beyond what the user supplies."
+)
+
+# === AI PROVIDER REGISTRY ===
+AI_BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failures (timeouts, 5xx, invalid JSON) before a provider's circuit opens
+AI_BREAKER_BASE_BACKOFF = 15  # Seconds open after the failure threshold; doubles on each re-open
+AI_BREAKER_MAX_BACKOFF = 300  # Cap on open duration
+AI_RETRY_MAX_WAIT = 30  # Only retry in-call when the provider asks us to wait at most this long
+AI_DEFAULT_RETRY_AFTER = 25  # 429 without usable headers
+AI_ROUTER_MIN_SAMPLES = 5  # Providers with fewer latency samples are tried first (exploration)
+AI_ROUTER_ERROR_PENALTY = 3  # Score multiplier per unit error rate: score = p50 * (1 + penalty * error_rate)
+
+def make_ai_session() -> requests.Session:
+    """Keep-alive HTTP session sized for AI_SEMAPHORE-level concurrency."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def make_ai_provider(name: str, base_url: str, api_key: str, model: str, min_interval: float) -> dict:
+    """Registry entry: endpoint, model, pacing limit, rolling health and its own circuit breaker."""
+    return {
+        "name": name,
+        "url": base_url.rstrip("/") + "/chat/completions",
+        "api_key": api_key,
+        "model": model,
+        "min_interval": min_interval,  # Seconds between calls to this provider
+        "session": make_ai_session(),  # Pooled keep-alive connections
+        "last_call": 0.0,
+        "latencies": deque(maxlen=50),  # Seconds per successful completion
+        "outcomes": deque(maxlen=50),  # True = success, False = failure
+        "breaker": {
+            "state": "closed",  # closed -> open -> half_open -> closed
+            "failures": 0,
+            "open_until": 0.0,
+            "reopen_count": 0,
+            "probe_in_flight": False,
+            "last_reason": "",
+        },
+    }
+
+AI_PROVIDERS = []
+if AI_API_KEY:
+    AI_PROVIDERS.append(make_ai_provider("groq", "https://api.groq.com/openai/v1", AI_API_KEY, GROQ_MODEL, GLOBAL_AI_COOLDOWN))
+if OPENROUTER_API_KEY:
+    AI_PROVIDERS.append(make_ai_provider(
+        "openrouter", "https://openrouter.ai/api/v1", OPENROUTER_API_KEY, AI_MODEL,
+        float(os.getenv("OPENROUTER_MIN_INTERVAL", str(GLOBAL_AI_COOLDOWN)))
+    ))
+if AI_CUSTOM_BASE_URL:
+    AI_PROVIDERS.append(make_ai_provider(
+        "custom", AI_CUSTOM_BASE_URL, AI_CUSTOM_API_KEY, AI_CUSTOM_MODEL,
+        float(os.getenv("AI_CUSTOM_MIN_INTERVAL", "0"))
+    ))
+
+def parse_duration_seconds(value: str) -> Optional[float]:
+    """Parse rate-limit durations like '7.66s', '2m59.56s', '350ms' or plain seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds to wait from Retry-After (seconds or HTTP date) or x-ratelimit-reset-* headers."""
+    if not headers:
+        return None
+    retry_after = headers.get("Retry-After") or headers.get("retry-after")
+    if retry_after:
+        seconds = parse_duration_seconds(retry_after)
+        if seconds is not None:
+            return seconds
+        try:
+            from email.utils import parsedate_to_datetime
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    resets = [
+        parse_duration_seconds(headers.get(name, ""))
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens", "x-ratelimit-reset")
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+def provider_is_open(provider: dict) -> bool:
+    """True while the provider's circuit is open and its cool-off has not elapsed (non-mutating)."""
+    breaker = provider["breaker"]
+    return breaker["state"] == "open" and time.time() < breaker["open_until"]
+
+def ai_breaker_is_open() -> bool:
+    """True when every provider's circuit is open (nothing can serve a request right now). False with no providers."""
+    return bool(AI_PROVIDERS) and all(provider_is_open(provider) for provider in AI_PROVIDERS)
+
+def ai_breaker_allow(provider: dict) -> bool:
+    """Gate a provider call. Open fails fast; after cool-off one half-open probe is let through."""
+    breaker = provider["breaker"]
+    if breaker["state"] == "closed":
+        return True
+    if breaker["state"] == "open":
+        if time.time() < breaker["open_until"]:
+            return False
+        breaker["state"] = "half_open"
+        breaker["probe_in_flight"] = False
+    if breaker["probe_in_flight"]:
+        return False
+    breaker["probe_in_flight"] = True
+    return True
+
+def ai_breaker_open(provider: dict, seconds: float, reason: str):
+    """Open a provider's circuit for `seconds`."""
+    breaker = provider["breaker"]
+    breaker["state"] = "open"
+    breaker["open_until"] = time.time() + seconds
+    breaker["probe_in_flight"] = False
+    breaker["last_reason"] = reason
+    print(f"🔴 AI circuit OPEN for {provider['name']} ({seconds:.0f}s, {reason})")
+
+def ai_breaker_record_success(provider: dict, latency: float, headers=None):
+    """Record a success; pre-emptively open the circuit if the provider reports zero remaining requests."""
+    breaker = provider["breaker"]
+    if breaker["state"] != "closed":
+        print(f"✅ AI circuit CLOSED for {provider['name']}")
+    breaker.update(state="closed", failures=0, reopen_count=0, probe_in_flight=False)
+    provider["latencies"].append(latency)
+    provider["outcomes"].append(True)
+    if headers and headers.get("x-ratelimit-remaining-requests") == "0":
+        reset = parse_duration_seconds(headers.get("x-ratelimit-reset-requests", ""))
+        if reset:
+            ai_breaker_open(provider, reset, "quota_exhausted")
+
+def ai_breaker_record_failure(provider: dict, reason: str, retry_after: Optional[float] = None):
+    """Count a failure. 429s open for the provider's Retry-After; other failures open after the threshold."""
+    breaker = provider["breaker"]
+    breaker["failures"] += 1
+    provider["outcomes"].append(False)
+    if retry_after is not None:
+        ai_breaker_open(provider, retry_after, reason)
+    elif breaker["state"] == "half_open" or breaker["failures"] >= AI_BREAKER_FAILURE_THRESHOLD:
+        backoff = min(AI_BREAKER_BASE_BACKOFF * (2 ** breaker["reopen_count"]), AI_BREAKER_MAX_BACKOFF)
+        breaker["reopen_count"] += 1
+        ai_breaker_open(provider, backoff, reason)
+
+def provider_latency_percentile(provider: dict, pct: float) -> Optional[float]:
+    """Rolling latency percentile (seconds), or None without samples."""
+    samples = sorted(provider["latencies"])
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(pct * len(samples)))]
+
+def provider_error_rate(provider: dict) -> float:
+    """Failure share of the provider's recent calls."""
+    outcomes = provider["outcomes"]
+    return (outcomes.count(False) / len(outcomes)) if outcomes else 0.0
+
+def rank_ai_providers() -> list:
+    """Providers in routing order: unexplored first, then by error-weighted p50 (p95 breaks ties). Open circuits last."""
+    def score(indexed):
+        position, provider = indexed
+        if provider_is_open(provider):
+            return (2, 0, 0, position)
+        if len(provider["latencies"]) < AI_ROUTER_MIN_SAMPLES:
+            return (0, 0, 0, position)
+        p50 = provider_latency_percentile(provider, 0.5)
+        p95 = provider_latency_percentile(provider, 0.95)
+        return (1, p50 * (1 + AI_ROUTER_ERROR_PENALTY * provider_error_rate(provider)), p95, position)
+    return [provider for _, provider in sorted(enumerate(AI_PROVIDERS), key=score)]
+
+def ai_breaker_status() -> str:
+    """Per-provider circuit and latency summary for /status."""
+    lines = []
+    for provider in AI_PROVIDERS:
+        breaker = provider["breaker"]
+        if breaker["state"] == "open":
+            remaining = max(0, int(breaker["open_until"] - time.time()))
+            state = f"🔴 OPEN ({breaker['last_reason']}, retry in {remaining}s)"
+        elif breaker["state"] == "half_open":
+            state = "🟡 HALF-OPEN"
+        else:
+            state = "🟢 CLOSED"
+        p50 = provider_latency_percentile(provider, 0.5)
+        p95 = provider_latency_percentile(provider, 0.95)
+        latency = f"p50 `{p50:.1f}s` p95 `{p95:.1f}s`" if p50 is not None else "no samples"
+        lines.append(f"{provider['name']}: {state} • {latency} • err `{provider_error_rate(provider):.0%}`")
+    return "\n  ".join(lines) if lines else "none configured"
+
+async def _ai_post(provider: dict, payload: dict, on_text=None, parts: Optional[list] = None, usage: Optional[dict] = None) -> tuple:
+    """POST one chat completion to a provider in a worker thread. Returns (text or None, response headers).
+
+    Reported token usage, when the provider sends it, is copied into `usage`.
+    """
+    loop = asyncio.get_running_loop()
+    parts = parts if parts is not None else []
+    usage = usage if usage is not None else {}
+    deltas = asyncio.Queue()
+    headers_box = requests.structures.CaseInsensitiveDict()
+    body = dict(payload, model=provider["model"])
+    
+    def call():
+        headers = {"Content-Type": "application/json"}
+        if provider["api_key"]:
+            headers["Authorization"] = f"Bearer {provider['api_key']}"
+        stream = bool(body.get("stream"))
+        response = provider["session"].post(provider["url"], headers=headers, json=body, timeout=60, stream=stream)
+        try:
+            headers_box.update(response.headers)
+            
+            # === 429 HANDLING ===
+            if response.status_code == 429:
+                raise requests.exceptions.HTTPError("429 Rate Limit", response=response)
+            response.raise_for_status()
+            
+            if not stream:
+                data = response.json()
+                usage.update(data.get("usage") or {})
+                # === JSON VALIDATION: Never assume "choices" exists ===
+                if "choices" not in data or not data["choices"]:
+                    print(f"⚠️ AI response missing 'choices' ({provider['name']}): {data}")
+                    return None
+                return data["choices"][0]["message"]["content"].strip()
+            
+            # SSE: "data: {json}" lines, terminated by "data: [DONE]"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    continue
+                # Usage arrives on the final chunk (OpenAI-style "usage", Groq "x_groq.usage")
+                usage.update(chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or {})
+                choices = chunk.get("choices") or []
+                if choices:
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        loop.call_soon_threadsafe(deltas.put_nowait, delta)
+            return None
+        finally:
+            response.close()
+    
+    if not body.get("stream"):
+        result = await asyncio.wait_for(loop.run_in_executor(None, call), timeout=60)
+        return result, headers_box
+    
+    future = loop.run_in_executor(None, call)
+    future.add_done_callback(lambda _: deltas.put_nowait(None))
+    deadline = time.time() + 60
+    while True:
+        delta = await asyncio.wait_for(deltas.get(), timeout=max(0.1, deadline - time.time()))
+        if delta is None:
+            break
+        parts.append(delta)
+        if on_text:
+            await on_text("".join(parts))
+    await future  # Surface errors raised in the worker thread
+    return ("".join(parts).strip() or None), headers_box
+
+# === AI TOKEN USAGE ===
+def ai_usage_day() -> str:
+    """Current accounting day (UTC)."""
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+def seconds_until_usage_reset() -> int:
+    """Seconds until the next 00:00 UTC quota reset."""
+    return 86400 - int(time.time()) % 86400
+
+def rollover_ai_usage():
+    """Fold yesterday's counters into AI_USAGE_HISTORY when the UTC day changes."""
+    day = ai_usage_day()
+    if AI_USAGE["day"] == day:
+        return
+    if AI_USAGE["day"]:
+        AI_USAGE_HISTORY.append({
+            "day": AI_USAGE["day"],
+            "total": AI_USAGE["total"],
+            "requests": AI_USAGE["requests"],
+            "contexts": dict(AI_USAGE["contexts"])
+        })
+        persist_ai_usage()  # Final state of the finished day
+    AI_USAGE.update(day=day, total=0, requests=0, users={}, channels=Counter(), contexts=Counter(), providers=Counter(), estimated=0)
+
+def ai_usage_body() -> dict:
+    """JSON-safe copy of today's counters (one ai_usage_daily row)."""
+    return {
+        "total": AI_USAGE["total"],
+        "requests": AI_USAGE["requests"],
+        "estimated": AI_USAGE["estimated"],
+        "users": {str(uid): dict(entry) for uid, entry in AI_USAGE["users"].items()},
+        "channels": {str(cid): n for cid, n in AI_USAGE["channels"].items()},
+        "contexts": dict(AI_USAGE["contexts"]),
+        "providers": dict(AI_USAGE["providers"]),
+    }
+
+def persist_ai_usage():
+    """Upsert the current day's row to ai_usage_daily on a worker thread (never blocks the event loop).
+    Returns the write's concurrent Future, or None when there is nothing to write yet."""
+    if not AI_USAGE["day"] or not AI_USAGE_STORE["loaded"]:
+        return None  # Never overwrite the stored day with partial counters before they were reloaded
+    row = {"day": AI_USAGE["day"], "body": ai_usage_body(), "updated_at": int(time.time())}
+    AI_USAGE_STORE["dirty"] = False
+    
+    def write():
+        try:
+            response = supabase.table("ai_usage_daily").upsert(row).execute()
+            ensure_ok(response, "ai_usage_daily upsert")
+        except Exception as e:
+            AI_USAGE_STORE["dirty"] = True  # Retry on the next save tick
+            print(f"⚠️ AI usage save failed: {e}")
+    
+    if AI_USAGE_STORE["executor"] is None:
+        AI_USAGE_STORE["executor"] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-usage")
+    return AI_USAGE_STORE["executor"].submit(write)
+
+def fetch_ai_usage_rows() -> list:
+    """Most recent ai_usage_daily rows, newest first (blocking)."""
+    response = supabase.table("ai_usage_daily").select("*").order("day", desc=True).limit(AI_USAGE_HISTORY_DAYS + 1).execute()
+    ensure_ok(response, "ai_usage_daily select")
+    return response.data or []
+
+async def load_ai_usage():
+    """Restore today's counters and the daily rollups after a restart; only a new UTC day starts from zero."""
+    if AI_USAGE_STORE["loaded"]:
+        return
+    try:
+        rows = await asyncio.get_running_loop().run_in_executor(None, fetch_ai_usage_rows)
+    except Exception as e:
+        print(f"⚠️ AI usage load failed: {e}")
+        return
+    AI_USAGE_STORE["loaded"] = True
+    rollover_ai_usage()
+    today = AI_USAGE["day"]
+    history = []
+    for row in rows:
+        body = row.get("body") or {}
+        if row.get("day") == today:
+            # Merge (calls made before the load finished are kept)
+            AI_USAGE["total"] += body.get("total", 0)
+            AI_USAGE["requests"] += body.get("requests", 0)
+            AI_USAGE["estimated"] += body.get("estimated", 0)
+            for uid, entry in (body.get("users") or {}).items():
+                user = AI_USAGE["users"].setdefault(int(uid), {"tokens": 0, "requests": 0})
+                user["tokens"] += entry.get("tokens", 0)
+                user["requests"] += entry.get("requests", 0)
+            AI_USAGE["channels"].update({int(cid): n for cid, n in (body.get("channels") or {}).items()})
+            AI_USAGE["contexts"].update(body.get("contexts") or {})
+            AI_USAGE["providers"].update(body.get("providers") or {})
+        else:
+            history.append({"day": row["day"], "total": body.get("total", 0), "requests": body.get("requests", 0), "contexts": body.get("contexts") or {}})
+    AI_USAGE_HISTORY.clear()
+    AI_USAGE_HISTORY.extend(reversed(history[:AI_USAGE_HISTORY_DAYS]))
+    print(f"📉 AI usage restored: {AI_USAGE['total']} tokens today, {len(AI_USAGE_HISTORY)} day(s) of history")
+
+def set_ai_usage_owner(user_id: int, context: str, channel_id: Optional[int] = None):
+    """Bill AI calls made from the current task to this user/context/channel."""
+    AI_USAGE_OWNER.set((user_id or 0, context or "system", channel_id))
+
+def record_ai_usage(payload: dict, result: str, usage: dict, provider: dict):
+    """Count one completion against its owner. Uses provider-reported usage, else a chars/4 estimate."""
+    rollover_ai_usage()
+    tokens = usage.get("total_tokens") or ((usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0))
+    if not tokens:
+        prompt_text = "".join(m.get("content") or "" for m in payload.get("messages", []))
+        tokens = estimate_tokens(prompt_text) + estimate_tokens(result)
+        AI_USAGE["estimated"] += tokens
+    user_id, context, channel_id = AI_USAGE_OWNER.get()
+    user = AI_USAGE["users"].setdefault(user_id, {"tokens": 0, "requests": 0})
+    user["tokens"] += tokens
+    user["requests"] += 1
+    if channel_id:
+        AI_USAGE["channels"][channel_id] += tokens
+    AI_USAGE["contexts"][context] += tokens
+    AI_USAGE["providers"][provider["name"]] += tokens
+    AI_USAGE["total"] += tokens
+    AI_USAGE["requests"] += 1
+    AI_USAGE_STORE["dirty"] = True
+
+def get_user_ai_tokens_today(user_id: int) -> int:
+    """Tokens billed to a user since 00:00 UTC."""
+    rollover_ai_usage()
+    return AI_USAGE["users"].get(user_id, {}).get("tokens", 0)
+
+def ai_quota_exceeded(user_id: int) -> bool:
+    """True when the user's (or the bot's) daily token quota is used up."""
+    rollover_ai_usage()
+    if AI_DAILY_TOKEN_QUOTA and AI_USAGE["total"] >= AI_DAILY_TOKEN_QUOTA:
+        return True
+    return bool(AI_USER_DAILY_TOKEN_QUOTA) and get_user_ai_tokens_today(user_id) >= AI_USER_DAILY_TOKEN_QUOTA
+
+def ai_quota_message(user_id: int) -> Optional[str]:
+    """User-facing text when the daily token quota blocks AI for this user, else None."""
+    if not ai_quota_exceeded(user_id):
+        return None
+    reset = seconds_until_usage_reset()
+    return f"📉 Daily AI quota reached. Resets in {reset // 3600}h {reset % 3600 // 60}m."
+
+def ai_usage_status() -> str:
+    """One-line usage summary for /status."""
+    rollover_ai_usage()
+    quota = f" / `{AI_DAILY_TOKEN_QUOTA}`" if AI_DAILY_TOKEN_QUOTA else ""
+    return f"`{AI_USAGE['total']}`{quota} tokens today over `{AI_USAGE['requests']}` calls"
+
+async def ai_chat_completion(payload: dict, fail_text: str, on_text=None) -> str:
+    """Route a completion across providers (fastest healthy first, automatic failover).
+
+    Each provider sits behind its own circuit breaker and pacing interval. Backoff waits
+    happen outside AI_SEMAPHORE; when every circuit is open the call fails fast.
+    """
     global LAST_AI_CALL
     
-    # RATE LIMIT SAFETY: Use global semaphore to limit concurrent AI calls
-    async with AI_SEMAPHORE:
-        # === GLOBAL AI COOLDOWN (8 seconds) ===
-        now = time.time()
-        cooldown_remaining = GLOBAL_AI_COOLDOWN - (now - LAST_AI_CALL)
-        if cooldown_remaining > 0:
-            await asyncio.sleep(cooldown_remaining)
-        
-        LAST_AI_CALL = time.time()
+    def failed(kind: Optional[str] = None) -> str:
+        return fail_text.replace("]", f" — {kind}]") if kind else fail_text
+    
+    kind = None
+    for attempt in range(2):  # Max 1 retry round (2 total rounds across providers)
+        retry_wait = None
+        tried = 0
         
-        # === MAKE REQUEST WITH 429 HANDLING ===
-        for attempt in range(2):  # Max 1 retry (2 total attempts)
-            try:
-                loop = asyncio.get_running_loop()
-                def call():
-                    url = "https://api.groq.com/openai/v1/chat/completions"
-                    headers = {"Authorization": f"Bearer {AI_API_KEY}", "Content-Type": "application/json"}
-                    
-                    # Randomly add corrupting mode trigger (5% chance for eerie responses)
-                    corrupting_trigger = ""
-                    if random.random() < 0.05:
-                        corrupting_trigger = " (Respond with slight strangeness and eeriness as if your signals are corrupted)"
-                    
-                    payload = {
-                        "model": "mixtral-8x7b-32768",  # Groq's fast model
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": (
-                                    "You are the Nimbror Watcher AI. Use the provided lore. "
-                                    "Respond in one paragraph, maximum 4 short sentences. "
-                                    "Be unsettling, cryptic, and slightly threatening. "
-                                    "No markdown beyond what the user supplies." + corrupting_trigger
-                                )
-                            },
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 300
-                    }
-                    response = requests.post(url, headers=headers, json=payload, timeout=60)
-                    
-                    # === 429 HANDLING ===
-                    if response.status_code == 429:
-                        raise requests.exceptions.HTTPError("429 Rate Limit", response=response)
-                    
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    # === JSON VALIDATION: Never assume "choices" exists ===
-                    if "choices" not in data or not data["choices"]:
-                        print(f"⚠️ AI response missing 'choices': {data}")
-                        return None
-                    
-                    return data["choices"][0]["message"]["content"].strip()
+        for provider in rank_ai_providers():
+            if not ai_breaker_allow(provider):
+                continue
+            tried += 1
+            parts = []
+            usage = {}
+            
+            # RATE LIMIT SAFETY: Use global semaphore to limit concurrent AI calls
+            async with AI_SEMAPHORE:
+                # === PER-PROVIDER COOLDOWN (Groq: GLOBAL_AI_COOLDOWN) ===
+                cooldown_remaining = provider["min_interval"] - (time.time() - provider["last_call"])
+                if cooldown_remaining > 0:
+                    await asyncio.sleep(cooldown_remaining)
+                provider["last_call"] = LAST_AI_CALL = time.time()
+                started = time.time()
                 
-                result = await asyncio.wait_for(loop.run_in_executor(None, call), timeout=60)
+                try:
+                    result, headers = await _ai_post(provider, payload, on_text, parts, usage)
+                    if result:
+                        ai_breaker_record_success(provider, time.time() - started, headers)
+                        record_ai_usage(payload, result, usage, provider)
+                        return result
+                    # Invalid JSON / empty stream counts as a provider failure
+                    ai_breaker_record_failure(provider, "invalid_response")
+                    print(f"⚠️ Invalid AI response from {provider['name']}, failing over...")
+                    retry_wait = min(retry_wait or AI_DEFAULT_RETRY_AFTER, AI_DEFAULT_RETRY_AFTER)
                 
-                # If result is None (invalid JSON), treat as failure
-                if result is None:
-                    if attempt == 0:
-                        print("⚠️ Invalid AI response, retrying once...")
-                        await asyncio.sleep(25)
-                        continue
+                except requests.exceptions.HTTPError as e:
+                    status_code = e.response.status_code if e.response is not None else None
+                    if status_code == 429:
+                        retry_after = parse_retry_after(e.response.headers) or AI_DEFAULT_RETRY_AFTER
+                        ai_breaker_record_failure(provider, "rate_limited", retry_after)
+                        print(f"⚠️ {provider['name']} 429 rate limit, retry after {retry_after:.1f}s (attempt {attempt + 1}/2)")
+                        retry_wait = min(retry_wait or retry_after, retry_after)
+                        kind = "RATE LIMITED"
                     else:
-                        return "🛰️ *[SIGNAL LOST]*"
+                        ai_breaker_record_failure(provider, f"http_{status_code}")
+                        print(f"❌ AI HTTP error ({provider['name']}): {type(e).__name__}: {str(e)[:150]}")
+                        if status_code and status_code >= 500:
+                            retry_wait = min(retry_wait or 5, 5)
                 
-                return result
-            
-            except requests.exceptions.HTTPError as e:
-                if "429" in str(e):
-                    print(f"⚠️ OpenRouter 429 rate limit (attempt {attempt + 1}/2)")
-                    if attempt == 0:
-                        await asyncio.sleep(25)
-                        continue
-                    else:
-                        return "🛰️ *[SIGNAL LOST — RATE LIMITED]*"
-                else:
-                    print(f"❌ AI HTTP error: {type(e).__name__}: {str(e)[:150]}")
-                    return "🛰️ *[SIGNAL LOST]*"
-            
-            except asyncio.TimeoutError:
-                print(f"⚠️ AI timeout (attempt {attempt + 1}/2)")
-                if attempt == 0:
-                    await asyncio.sleep(5)
-                    continue
-                else:
-                    return "🛰️ *[SIGNAL LOST — TIMEOUT]*"
+                except asyncio.CancelledError:
+                    provider["breaker"]["probe_in_flight"] = False
+                    raise
+                
+                except asyncio.TimeoutError:
+                    ai_breaker_record_failure(provider, "timeout")
+                    print(f"⚠️ AI timeout ({provider['name']}, attempt {attempt + 1}/2)")
+                    retry_wait = min(retry_wait or 5, 5)
+                    kind = "TIMEOUT"
+                
+                except Exception as e:
+                    ai_breaker_record_failure(provider, "error")
+                    print(f"❌ AI error ({provider['name']}): {type(e).__name__}: {str(e)[:150]}")
             
-            except Exception as e:
-                print(f"❌ AI error: {type(e).__name__}: {str(e)[:150]}")
-                return "🛰️ *[SIGNAL LOST]*"
+            # Partially streamed text is better than failing over from scratch
+            if parts:
+                result = "".join(parts).strip()
+                record_ai_usage(payload, result, usage, provider)
+                return result
+        
+        if not tried:
+            return failed(kind or "CIRCUIT OPEN")
         
-        return "🛰️ *[SIGNAL LOST]*"
+        # Every provider failed this round: back off outside the semaphore, then retry once
+        if attempt == 0 and retry_wait is not None and retry_wait <= AI_RETRY_MAX_WAIT:
+            await asyncio.sleep(retry_wait)
+            continue
+        return failed(kind)
+    
+    return failed(kind)
+
+# === SINGLE-FLIGHT AI CALLS ===
+AI_INFLIGHT = {}  # {(profile, normalized prompt): asyncio.Future} shared by concurrent identical requests
+AI_COALESCE_STATS = {"leaders": 0, "joined": 0}
+
+def ai_flight_key(profile: str, prompt: str) -> tuple:
+    """Coalescing key: profile plus case/whitespace-normalized prompt."""
+    return (profile, " ".join((prompt or "").lower().split()))
+
+class AIFlightCancelled(RuntimeError):
+    """Raised in joiners when the single-flight leader was cancelled."""
+
+async def ai_single_flight(profile: str, prompt: str, call):
+    """Run call() once per identical in-flight (profile, prompt); concurrent duplicates await the same result."""
+    key = ai_flight_key(profile, prompt)
+    existing = AI_INFLIGHT.get(key)
+    if existing is not None:
+        AI_COALESCE_STATS["joined"] += 1
+        return await asyncio.shield(existing)
+    
+    future = asyncio.get_running_loop().create_future()
+    AI_INFLIGHT[key] = future
+    AI_COALESCE_STATS["leaders"] += 1
+    try:
+        result = await call()
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        # Joiners fail like any other provider error; only the leader sees the cancellation
+        future.set_exception(AIFlightCancelled("single-flight leader cancelled"))
+        future.exception()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved so unjoined failures don't warn
+        raise
+    finally:
+        AI_INFLIGHT.pop(key, None)
+
+# === AI CLIENT PROFILES ===
+# One engine for every AI call: payload shape, coalescing, caching and metrics come from the profile.
+WATCHER_CONCISE_SYSTEM_PROMPT = (
+    "You are the Nimbror Watcher. Be unsettling, cryptic, and slightly threatening. "
+    "No friendliness. Speak like a paranoid surveillance AI. "
+    "Plain text only—no markdown, no emojis, no lists. "
+    "Keep it tight: 1-4 short sentences max."
+)
+SCORING_SYSTEM_PROMPT = (
+    "You are a strict, deterministic grader. Follow the scoring rules in the user message exactly "
+    "and output only the requested digits or JSON array. No commentary."
+)
+CORRUPTING_TRIGGER = " (Respond with slight strangeness and eeriness as if your signals are corrupted)"
+AI_RESPONSE_CACHE_MAX = 500  # Cached completions across cache-enabled profiles
+
+AI_PROFILES = {}  # {name: profile dict}; see register_ai_profile
+AI_RESPONSE_CACHE = {}  # {(profile, normalized prompt): (timestamp, text)}
+AI_PROFILE_STATS = {}  # {name: {"calls", "cache_hits", "failures", "latency"}}
+
+def register_ai_profile(name: str, system_prompt: str, max_tokens: int, temperature: float = 0.7,
+                        fail_text: str = "[SIGNAL LOST]", corrupt_chance: float = 0.0, cache_ttl: int = 0):
+    """Declare a response profile. cache_ttl > 0 reuses successful completions for identical prompts."""
+    AI_PROFILES[name] = {
+        "system_prompt": system_prompt,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "fail_text": fail_text,
+        "corrupt_chance": corrupt_chance,  # Chance of the eerie "corrupted signal" Easter egg
+        "cache_ttl": cache_ttl,
+    }
+    AI_PROFILE_STATS.setdefault(name, {"calls": 0, "cache_hits": 0, "failures": 0, "latency": 0.0})
+
+register_ai_profile("full", WATCHER_SYSTEM_PROMPT, 300, fail_text="🛰️ *[SIGNAL LOST]*", corrupt_chance=0.05)
+register_ai_profile("concise", WATCHER_CONCISE_SYSTEM_PROMPT, 120)
+register_ai_profile("scoring", SCORING_SYSTEM_PROMPT, 60, temperature=0.0, cache_ttl=3600)
+
+def build_ai_payload(profile: dict, prompt: str, system_prompt: Optional[str] = None, stream: bool = False) -> dict:
+    """Chat-completions payload for a profile (model is filled in per provider)."""
+    system = system_prompt or profile["system_prompt"]
+    if profile["corrupt_chance"] and random.random() < profile["corrupt_chance"]:
+        system += CORRUPTING_TRIGGER
+    payload = {
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": profile["temperature"],
+        "max_tokens": profile["max_tokens"]
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+async def ai_complete(profile_name: str, prompt: str, on_text=None, system_prompt: Optional[str] = None) -> str:
+    """Run a completion under a named profile.
+
+    Identical concurrent prompts share one provider call (streamers join without partial text);
+    cache-enabled profiles return recent successful results without calling a provider.
+    """
+    profile = AI_PROFILES[profile_name]
+    stats = AI_PROFILE_STATS[profile_name]
+    flight = profile_name if system_prompt is None else f"{profile_name}:{hash(system_prompt)}"
+    key = ai_flight_key(flight, prompt)
+    
+    if profile["cache_ttl"]:
+        cached = AI_RESPONSE_CACHE.get(key)
+        if cached and time.time() - cached[0] < profile["cache_ttl"]:
+            stats["cache_hits"] += 1
+            return cached[1]
+    
+    async def call():
+        started = time.time()
+        payload = build_ai_payload(profile, prompt, system_prompt, stream=on_text is not None)
+        result = await ai_chat_completion(payload, profile["fail_text"], on_text=on_text)
+        stats["calls"] += 1
+        stats["latency"] += time.time() - started
+        if "SIGNAL LOST" in result:
+            stats["failures"] += 1
+        elif profile["cache_ttl"]:
+            if len(AI_RESPONSE_CACHE) >= AI_RESPONSE_CACHE_MAX:
+                AI_RESPONSE_CACHE.pop(next(iter(AI_RESPONSE_CACHE)))
+            AI_RESPONSE_CACHE[key] = (time.time(), result)
+        return result
+    
+    try:
+        return await ai_single_flight(flight, prompt, call)
+    except AIFlightCancelled:
+        stats["failures"] += 1
+        return profile["fail_text"]
+
+def ai_profile_status() -> str:
+    """Compact per-profile metrics for /status."""
+    parts = []
+    for name, stats in AI_PROFILE_STATS.items():
+        if not (stats["calls"] or stats["cache_hits"]):
+            continue
+        avg = stats["latency"] / stats["calls"] if stats["calls"] else 0
+        hits = f", {stats['cache_hits']} cached" if stats["cache_hits"] else ""
+        parts.append(f"`{name}` {stats['calls']} ({stats['failures']} failed{hits}, {avg:.1f}s avg)")
+    return " • ".join(parts) or "no calls yet"
+
+async def run_huggingface(prompt: str) -> str:
+    """Full Watcher reply ("full" profile)."""
+    return await ai_complete("full", prompt)
+
+async def run_huggingface_stream(prompt: str, on_text) -> str:
+    """Streamed full Watcher reply. Awaits on_text(text_so_far) as tokens arrive; returns the full text."""
+    return await ai_complete("full", prompt, on_text=on_text)
+
+async def run_huggingface_concise(prompt: str, system_prompt: Optional[str] = None) -> str:
+    """Concise Watcher reply ("concise" profile), optionally with a caller-supplied system prompt."""
+    return await ai_complete("concise", prompt, system_prompt=system_prompt)
+
+def render_ai_reply(context: str, text: str, partial: bool = False) -> dict:
+    """Message kwargs for an AI reply (embed for tickets, plain text for mentions). Partial replies get a cursor."""
+    cursor = " ▌" if partial else ""
+    if context == "ticket":
+        embed = create_embed("🛰️ WATCHER RESPONSE", text[:1900] + cursor, color=EMBED_COLORS["info"])
+        return {"content": None, "embed": embed}
+    return {"content": (clamp_response(text, max_chars=500) + cursor)[:2000], "embed": None}
+
+async def stream_edit_reply(reply: dict, channel, context: str, text: str):
+    """Progressively show streamed text. Coalesces chunks to one edit per MESSAGE_EDIT_COOLDOWN within STREAM_EDIT_BUDGET."""
+    message = reply.get("message")
+    if message is not None:
+        since_last = time.time() - LAST_MESSAGE_EDIT.get(message.id, 0)
+        if since_last < MESSAGE_EDIT_COOLDOWN or reply["edits"] >= STREAM_EDIT_BUDGET - 1:
+            return  # Later chunks (or the final edit) carry this text
+    try:
+        kwargs = render_ai_reply(context, text, partial=True)
+        if message is None:
+            if channel is None:
+                return
+            message = await channel.send(**kwargs, allowed_mentions=discord.AllowedMentions.none())
+            reply["message"] = message
+        else:
+            await message.edit(**kwargs, allowed_mentions=discord.AllowedMentions.none())
+        reply["edits"] += 1
+        LAST_MESSAGE_EDIT[message.id] = time.time()
+    except Exception as e:
+        print(f"⚠️ Stream edit failed: {e}")
 
 # --- DISCORD BOT ---
 class MyBot(discord.Client):
@@ -488,12 +1439,13 @@ class MyBot(discord.Client):
         super().__init__(intents=intents)
         self.tree = app_commands.CommandTree(self)
         self.db = normalize_db_shapes(load_data())
+        rebuild_message_index(self.db)
         self.synced = False
         
         # RATE LIMIT SAFETY: Initialize global AI semaphore (max 2 concurrent AI calls)
         global AI_SEMAPHORE, AI_REQUEST_QUEUE
         AI_SEMAPHORE = asyncio.Semaphore(2)
-        AI_REQUEST_QUEUE = asyncio.Queue(maxsize=AI_QUEUE_MAX_SIZE)
+        AI_REQUEST_QUEUE = AIRequestQueue(maxsize=AI_QUEUE_MAX_SIZE)
         
         # SPAM SYSTEM: Track active controlled spam (owner-only)
         self.active_spam_task = None
@@ -509,7 +1461,6 @@ class MyBot(discord.Client):
         self.active_chaos_task = None
         self.active_chaos_channel = None
         self.active_chaos_count = 0
-        self.last_chaos_ai = 0
         self.chaos_optout = set()  # Users who opted out of chaos pings (reset each session)
         self.chaos_notified = set()  # Users already notified about /optout (reset each session)
         
@@ -541,23 +1492,11 @@ class MyBot(discord.Client):
                 if not guild:
                     return
                 
-                members = [m for m in guild.members if not m.bot]
-                if not members:
+                quest_user = sample_member(guild)
+                if not quest_user:
                     return
                 
-                quest_user = random.choice(members)
-                quests = [
-                    "🔮 The Ice Wall is CRACKING. Find out what's on the other side before they seal it.",
-                    "👁️ Three people near you are NOT who they say they are. IDENTIFY THEM.",
-                    "📡 We intercepted a signal. It's... unsettling. Decode it. I dare you.",
-                    "🗝️ The key is right in front of you. Stop being blind.",
-                    "🌑 You saw something on [REDACTED]. You know what I mean. Report it.",
-                    "👻 Elvis left a voicemail. Listen. Tell me what you heard.",
-                    "❄️ The Wall is moving. THEY'RE BUILDING SOMETHING. Find out what.",
-                    "💀 A message was left in your area. Find it before THEY do."
-                ]
-                
-                quest = random.choice(quests)
+                quest = take_pooled_line("quest", QUEST_LINES)
                 quest_id = f"{current_time}_{quest_user.id}"
                 
                 self.db["completed_quests"][quest_id] = False
@@ -682,6 +1621,7 @@ class MyBot(discord.Client):
                     if current_time - trial_data.get("timestamp", 0) > trial_duration:
                         await process_trial_results(trial_id, trial_data, self)
                         trial_data["closed"] = True
+                        unindex_message(trial_data.get("message_id"))
                         save_data(self.db)
         except Exception as e:
             await log_error(f"trial_timeout_check: {traceback.format_exc()}")
@@ -817,7 +1757,13 @@ class MyBot(discord.Client):
         if not AI_REQUEST_QUEUE or AI_REQUEST_QUEUE.empty():
             return
         
+        # Circuit open: leave requests queued instead of burning them on fail-fast errors
+        if ai_breaker_is_open():
+            return
+        
         AI_QUEUE_PROCESSOR_RUNNING = True
+        request = None
+        requeued = False
         
         try:
             # Get next request (non-blocking)
@@ -833,85 +1779,180 @@ class MyBot(discord.Client):
             created_at = request.get("created_at", int(time.time()))
             retry_count = request.get("retry_count", 0)
             placeholder_message_id = request.get("placeholder_message_id")
+            payload = request.get("payload") or {}
             
-            # Check if request is too old (>2 minutes), discard it
-            if (time.time() - created_at) > 120:
+            # Check if request is too old (>2 minutes by default), discard it
+            if (time.time() - created_at) > (request.get("max_age") or AI_REQUEST_MAX_AGE):
                 print(f"⚠️ Discarding stale AI request from user {user_id} (age: {int(time.time() - created_at)}s)")
+                AI_QUEUE_STATS["stale"] += 1
+                discard_ai_request(request, "EXPIRED")
                 return
             
-            # Execute AI call with semaphore protection
-            async with AI_SEMAPHORE:
-                try:
-                    # Call appropriate AI function based on context
-                    if context in ["mention", "ticket"]:
-                        result = await run_huggingface(prompt)
-                    else:
-                        result = await run_huggingface_concise(prompt)
-                    
-                    # Apply corruption if active (for ticket context)
-                    if context == "ticket" and should_enable_corruption():
-                        result = corrupt_message(result)
-                    
-                    # Send result to channel (or edit placeholder if available)
+            service_started = time.time()
+            set_ai_usage_owner(user_id, context, channel_id)
+            
+            # AI calls take AI_SEMAPHORE themselves (and release it while backing off)
+            try:
+                # Background memory compaction: store result, nothing to send
+                if context == "memory_summary":
                     try:
-                        channel = bot.get_channel(channel_id)
-                        if channel and result:
-                            target_message = None
-                            if placeholder_message_id:
-                                try:
-                                    target_message = await channel.fetch_message(placeholder_message_id)
-                                except Exception:
-                                    target_message = None
-                            if context == "ticket":
-                                embed = create_embed("🛰️ WATCHER RESPONSE", result[:1900], color=EMBED_COLORS["info"])
-                                if target_message:
-                                    await target_message.edit(embed=embed, content=None, allowed_mentions=discord.AllowedMentions.none())
-                                else:
-                                    await channel.send(embed=embed)
-                            else:
-                                result = clamp_response(result, max_chars=500)
-                                # Don't send if AI failed (signal lost)
-                                if "SIGNAL LOST" in result:
-                                    print(f"⚠️ Skipping failed AI response for user {user_id}")
-                                elif target_message:
-                                    await target_message.edit(content=result[:2000], embed=None, allowed_mentions=discord.AllowedMentions.none())
-                                else:
-                                    await channel.send(result[:2000], allowed_mentions=discord.AllowedMentions.none())
-                    except Exception as e:
-                        print(f"⚠️ Failed to send queued AI response: {e}")
-                    
-                except requests.exceptions.HTTPError as e:
-                    # Handle 429 rate limit from OpenRouter
-                    if e.response and e.response.status_code == 429:
-                        escalate_cooldown(user_id, "openrouter_429")
-                        
-                        # Requeue ONCE with backoff
-                        if retry_count == 0:
-                            print(f"⚠️ OpenRouter 429 for user {user_id}, requeuing with backoff...")
-                            await asyncio.sleep(5)  # Backoff before requeue
-                            request["retry_count"] = 1
-                            try:
-                                AI_REQUEST_QUEUE.put_nowait(request)
-                            except:
-                                pass  # Queue full, drop request
-                        else:
-                            print(f"⚠️ OpenRouter 429 for user {user_id}, max retries reached, dropping request")
-                    else:
-                        print(f"⚠️ AI HTTP error for user {user_id}: {e}")
+                        result = await ai_complete("summary", prompt)
+                        apply_memory_summary(payload.get("uid"), payload.get("until", ""), result, payload.get("older", []))
+                    finally:
+                        MEMORY_COMPACTION_PENDING.discard(payload.get("uid"))
+                    return
                 
-                except Exception as e:
-                    print(f"⚠️ AI queue processor error for user {user_id}: {e}")
+                channel = await resolve_ai_channel(channel_id, user_id)
+                
+                # Keep a handle to the placeholder (no fetch): the live Message, else a PartialMessage.
+                # A placeholder deleted while queued has left the index; the reply is then sent fresh
+                target_message = None
+                if lookup_message(placeholder_message_id, "placeholder") == request.get("id"):
+                    target_message = request.get("placeholder_message")
+                    if target_message is None and channel:
+                        target_message = channel.get_partial_message(placeholder_message_id)
+                reply = {"message": target_message, "edits": 0}
+                
+                # Call appropriate AI function based on context (user-facing replies stream)
+                if context in ["mention", "ticket"]:
+                    async def on_text(text):
+                        await stream_edit_reply(reply, channel, context, text)
+                    result = await run_huggingface_stream(prompt, on_text)
+                else:
+                    result = await run_huggingface_concise(prompt)
+                
+                # Provider throttled mid-request: requeue ONCE (no user penalty) to run after the breaker closes
+                if "SIGNAL LOST" in result and ai_breaker_is_open() and retry_count == 0 and reply["edits"] == 0:
+                    request["retry_count"] = 1
+                    try:
+                        AI_REQUEST_QUEUE.put_nowait(request)
+                        requeued = True
+                        print(f"⚠️ AI circuit open, requeued request for user {user_id}")
+                        return
+                    except asyncio.QueueFull:
+                        pass  # Queue full, fall through and report failure
+                
+                # Apply corruption if active (for ticket context)
+                if context == "ticket" and should_enable_corruption():
+                    result = corrupt_message(result)
                 
-                # Brief sleep between requests to prevent API spam
-                await asyncio.sleep(1)
+                # Final render: edit the streamed/placeholder message, or send if none exists
+                try:
+                    if channel and result:
+                        target_message = reply["message"]
+                        # Don't send if AI failed (signal lost) on mentions
+                        if context != "ticket" and "SIGNAL LOST" in result:
+                            print(f"⚠️ Skipping failed AI response for user {user_id}")
+                        elif target_message:
+                            await target_message.edit(**render_ai_reply(context, result), allowed_mentions=discord.AllowedMentions.none())
+                        else:
+                            await channel.send(**render_ai_reply(context, result), allowed_mentions=discord.AllowedMentions.none())
+                        if target_message:
+                            LAST_MESSAGE_EDIT.pop(target_message.id, None)
+                except Exception as e:
+                    print(f"⚠️ Failed to send queued AI response: {e}")
                 
+            except Exception as e:
+                print(f"⚠️ AI queue processor error for user {user_id}: {e}")
+            
+            if not requeued:
+                AI_SERVICE_TIMES.append(time.time() - service_started)
+                AI_QUEUE_STATS["completed"] += 1
+            
+            # Brief sleep between requests to prevent API spam
+            await asyncio.sleep(1)
+            
         except Exception as e:
             print(f"⚠️ AI queue processor critical error: {e}")
         finally:
+            if request is not None and not requeued:
+                journal_ack(request.get("id"))
+                unindex_message(request.get("placeholder_message_id"))
             AI_QUEUE_PROCESSOR_RUNNING = False
     
+    @tasks.loop(minutes=5)
+    async def memory_compaction_loop(self):
+        """Fold old interactions into per-user summaries via the AI queue (off the hot path)."""
+        try:
+            queued = 0
+            for uid, mem in list(self.db.get("memory", {}).items()):
+                if queued >= MEMORY_COMPACT_PER_RUN:
+                    break
+                interactions = mem.get("interactions", [])
+                if len(interactions) <= MEMORY_COMPACT_THRESHOLD or uid in MEMORY_COMPACTION_PENDING:
+                    continue
+                older = interactions[:-MEMORY_RAW_WINDOW]
+                payload = {"uid": uid, "until": str(older[-1].get("timestamp", "")), "older": older}
+                prompt = build_memory_summary_prompt(mem.get("summary", ""), older)
+                if not queue_background_ai_request(prompt, "memory_summary", payload):
+                    break  # Queue busy with user work; try next pass
+                MEMORY_COMPACTION_PENDING.add(uid)
+                queued += 1
+            if queued:
+                print(f"🧠 Queued memory compaction for {queued} user(s)")
+        except Exception as e:
+            print(f"⚠️ Memory compaction error: {e}")
+    
+    @tasks.loop(seconds=AI_USAGE_SAVE_INTERVAL)
+    async def ai_usage_save(self):
+        """Persist today's AI usage counters when they changed (throttled)."""
+        try:
+            if not AI_USAGE_STORE["loaded"]:
+                await load_ai_usage()  # Startup load failed; keep trying before any write
+            rollover_ai_usage()
+            if AI_USAGE_STORE["dirty"]:
+                persist_ai_usage()
+        except Exception as e:
+            print(f"⚠️ AI usage save error: {e}")
+    
+    @tasks.loop(seconds=30)
+    async def content_pool_refill(self):
+        """Top up the flavor-text pool, one batch per tick, only while the AI provider is idle."""
+        try:
+            # Idle capacity only: no queued/active user requests and the global AI cooldown has passed
+            if (AI_REQUEST_QUEUE and not AI_REQUEST_QUEUE.empty()) or AI_QUEUE_PROCESSOR_RUNNING:
+                return
+            if time.time() - LAST_AI_CALL < GLOBAL_AI_COOLDOWN or ai_breaker_is_open():
+                return
+            
+            # Drop expired lines, then refill the emptiest category
+            cutoff = time.time() - CONTENT_POOL_TTL
+            for cat in CONTENT_POOL_PROMPTS:
+                CONTENT_POOL[cat] = [item for item in CONTENT_POOL.get(cat, []) if item[0] >= cutoff]
+            category = min(CONTENT_POOL_PROMPTS, key=lambda cat: len(CONTENT_POOL[cat]))
+            if len(CONTENT_POOL[category]) >= CONTENT_POOL_TARGET:
+                return
+            
+            prompt = CONTENT_POOL_PROMPTS[category].format(n=CONTENT_POOL_BATCH)
+            set_ai_usage_owner(0, "content_pool")
+            result = await run_huggingface_concise(prompt, system_prompt=CONTENT_POOL_SYSTEM_PROMPT)
+            now = time.time()
+            lines = parse_pool_lines(result)[:CONTENT_POOL_BATCH]
+            CONTENT_POOL[category].extend((now, line) for line in lines)
+            if lines:
+                print(f"🎲 Content pool +{len(lines)} {category} lines")
+        except Exception as e:
+            print(f"⚠️ Content pool refill error: {e}")
+    
     # ===== 5 SUPER ANNOYING FEATURES =====
     
+    @tasks.loop(seconds=LOG_FLUSH_INTERVAL)
+    async def log_sink_flush(self):
+        """Flush buffered log embeds in multi-embed packs."""
+        try:
+            await flush_log_sink()
+        except Exception as e:
+            print(f"⚠️ Log sink flush error: {e}")
+    
+    @tasks.loop(seconds=0)
+    async def outbound_dispatcher(self):
+        """Deliver queued outbound messages (priority lanes, per-destination token buckets)."""
+        try:
+            await OUTBOUND.pump()
+        except Exception as e:
+            print(f"⚠️ Outbound dispatcher error: {e}")
+            await asyncio.sleep(1)
+    
     @tasks.loop(minutes=random.randint(3, 8))
     async def annoying_random_google_ad_ping(self):
         """Randomly ping people with Google ads in main channel."""
@@ -921,14 +1962,11 @@ class MyBot(discord.Client):
             if not ch:
                 return
             
-            # Get all members
-            members = list(self.guilds[0].members) if self.guilds else []
-            if not members:
+            random_member = sample_member(self.guilds[0] if self.guilds else None)
+            if not random_member:
                 return
-            
-            random_member = random.choice([m for m in members if not m.bot])
             ad = random.choice(GOOGLE_ADS)
-            await ch.send(f"{random_member.mention}: {ad}")
+            await dispatch_send(ch, DISPATCH_BULK, content=f"{random_member.mention}: {ad}")
         except Exception as e:
             print(f"⚠️ Annoying ad ping error: {e}")
     
@@ -941,11 +1979,9 @@ class MyBot(discord.Client):
             if not ch:
                 return
             
-            members = list(self.guilds[0].members) if self.guilds else []
-            if not members:
+            random_member = sample_member(self.guilds[0] if self.guilds else None)
+            if not random_member:
                 return
-            
-            random_member = random.choice([m for m in members if not m.bot])
             interrogations = [
                 f"{random_member.mention}, why didn't you Google that? 🔍",
                 f"{random_member.mention}, Google has the answers. Always. 👁️",
@@ -955,7 +1991,7 @@ class MyBot(discord.Client):
                 f"{random_member.mention}, Google knows you searched this 3 years ago 💾",
                 f"{random_member.mention}, GOOGLE GOOGLE GOOGLE 🔔",
             ]
-            await ch.send(random.choice(interrogations))
+            await dispatch_send(ch, DISPATCH_BULK, content=random.choice(interrogations))
         except Exception as e:
             print(f"⚠️ Interrogation error: {e}")
     
@@ -979,7 +2015,7 @@ class MyBot(discord.Client):
                 "⚡ GOOGLE IS ALWAYS WATCHING ⚡",
                 "🕵️ The Watcher never sleeps. Neither does Google.",
             ]
-            await ch.send(random.choice(watching_msgs))
+            await dispatch_send(ch, DISPATCH_BULK, content=random.choice(watching_msgs))
         except Exception as e:
             print(f"⚠️ Watching message error: {e}")
     
@@ -992,11 +2028,9 @@ class MyBot(discord.Client):
             if not ch:
                 return
             
-            members = list(self.guilds[0].members) if self.guilds else []
-            if not members:
+            random_member = sample_member(self.guilds[0] if self.guilds else None)
+            if not random_member:
                 return
-            
-            random_member = random.choice([m for m in members if not m.bot])
             did_you_mean = [
                 f"{random_member.mention}: Did you mean: **GOOGLE**? 🔍",
                 f"{random_member.mention}: Showing results for **Google** instead",
@@ -1004,7 +2038,7 @@ class MyBot(discord.Client):
                 f"{random_member.mention}: I think you meant to search **Google** for that",
                 f"{random_member.mention}: Google has the answer (we already know it)",
             ]
-            await ch.send(random.choice(did_you_mean))
+            await dispatch_send(ch, DISPATCH_BULK, content=random.choice(did_you_mean))
         except Exception as e:
             print(f"⚠️ Did you mean error: {e}")
     
@@ -1017,11 +2051,9 @@ class MyBot(discord.Client):
             if not ch:
                 return
             
-            members = list(self.guilds[0].members) if self.guilds else []
-            if not members:
+            random_member = sample_member(self.guilds[0] if self.guilds else None)
+            if not random_member:
                 return
-            
-            random_member = random.choice([m for m in members if not m.bot])
             compliance_msgs = [
                 f"{random_member.mention}, Google suggests you comply with the terms of service 🔐",
                 f"{random_member.mention}, your social credit has been analyzed by Google's AI 📊",
@@ -1031,7 +2063,7 @@ class MyBot(discord.Client):
                 f"{random_member.mention}, your IP address is now flagged by Google Search 🚨",
                 f"{random_member.mention}, Google has assigned you a compliance score 📈",
             ]
-            await ch.send(random.choice(compliance_msgs))
+            await dispatch_send(ch, DISPATCH_BULK, content=random.choice(compliance_msgs))
         except Exception as e:
             print(f"⚠️ Compliance message error: {e}")
 
@@ -1089,6 +2121,12 @@ def cleanup_expired_cooldowns():
     for uid in list(GLOBAL_COMMAND_COOLDOWN.keys()):
         if (now - GLOBAL_COMMAND_COOLDOWN[uid]) > (GLOBAL_COMMAND_COOLDOWN_DURATION + 5):
             del GLOBAL_COMMAND_COOLDOWN[uid]
+    # Near-duplicate detector fingerprints
+    cleanup_duplicate_fingerprints()
+    # Expired Discord route/bucket rate limits
+    cleanup_discord_rate_limits()
+    # Elapsed reactive reply windows
+    cleanup_reactive_budgets()
 
 def get_adaptive_cooldown_state(user_id: int) -> dict:
     """Get or create adaptive cooldown state for a user."""
@@ -1116,6 +2154,10 @@ def check_adaptive_cooldown(user_id: int) -> tuple[bool, int, int]:
         remaining = int(state["cooldown_until"] - now)
         return (False, remaining, state["level"])
     
+    # Daily token quota spent: paused until the UTC reset
+    if ai_quota_exceeded(user_id):
+        return (False, seconds_until_usage_reset(), len(ADAPTIVE_COOLDOWN_TIERS) - 1)
+    
     return (True, 0, state["level"])
 
 def escalate_cooldown(user_id: int, reason: str = "rate_limit"):
@@ -1133,31 +2175,57 @@ def escalate_cooldown(user_id: int, reason: str = "rate_limit"):
     
     print(f"⚠️ User {user_id} escalated to cooldown level {state['level']} ({cooldown_duration}s) - Reason: {reason}")
 
+def simhash_text(text: str) -> int:
+    """64-bit SimHash over character trigrams of mention-stripped, normalized text."""
+    text = re.sub(r"<[@#][!&]?\d+>", " ", (text or "").lower())
+    text = " ".join(re.sub(r"[^\w\s]", " ", text).split())
+    if len(text) < 3:
+        return hash(text) & 0xFFFFFFFFFFFFFFFF
+    weights = [0] * 64
+    for shingle in {text[i:i + 3] for i in range(len(text) - 2)}:
+        h = hash(shingle)
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+def _count_near_duplicates(history: deque, fingerprint: int, window: int, now: float) -> int:
+    """Expire entries older than `window`, then count fingerprints within DUPLICATE_MAX_DISTANCE bits."""
+    while history and now - history[0][0] > window:
+        history.popleft()
+    return sum(1 for _, other in history if bin(fingerprint ^ other).count("1") <= DUPLICATE_MAX_DISTANCE)
+
+def check_duplicate_message(user_id: int, channel_id: int, text: str) -> Optional[str]:
+    """Record an AI-bound message; return "user"/"channel" if it near-duplicates recent traffic, else None."""
+    now = time.time()
+    fingerprint = simhash_text(text)
+    user_history = RECENT_USER_FINGERPRINTS.setdefault(user_id, deque(maxlen=DUPLICATE_USER_HISTORY))
+    channel_history = RECENT_CHANNEL_FINGERPRINTS.setdefault(channel_id, deque(maxlen=DUPLICATE_CHANNEL_HISTORY))
+    user_hits = _count_near_duplicates(user_history, fingerprint, DUPLICATE_USER_WINDOW, now)
+    channel_hits = _count_near_duplicates(channel_history, fingerprint, DUPLICATE_CHANNEL_WINDOW, now)
+    user_history.append((now, fingerprint))
+    channel_history.append((now, fingerprint))
+    
+    DUPLICATE_STATS["checked"] += 1
+    if user_hits:
+        DUPLICATE_STATS["user"] += 1
+        return "user"
+    if channel_hits + 1 >= DUPLICATE_CHANNEL_THRESHOLD:
+        DUPLICATE_STATS["channel"] += 1
+        return "channel"
+    return None
+
+def cleanup_duplicate_fingerprints():
+    """Drop fingerprint histories whose newest entry is past its window."""
+    now = time.time()
+    for store, window in ((RECENT_USER_FINGERPRINTS, DUPLICATE_USER_WINDOW), (RECENT_CHANNEL_FINGERPRINTS, DUPLICATE_CHANNEL_WINDOW)):
+        for key in [k for k, history in store.items() if not history or now - history[-1][0] > window]:
+            del store[key]
+
 def count_user_pending_requests(user_id: int) -> int:
     """Count how many AI requests are pending in queue for a user."""
     if not AI_REQUEST_QUEUE:
         return 0
-    
-    count = 0
-    # Create temporary list to count without modifying queue
-    temp_items = []
-    try:
-        while not AI_REQUEST_QUEUE.empty():
-            item = AI_REQUEST_QUEUE.get_nowait()
-            temp_items.append(item)
-            if item.get("user_id") == user_id:
-                count += 1
-    except:
-        pass
-    finally:
-        # Restore queue
-        for item in temp_items:
-            try:
-                AI_REQUEST_QUEUE.put_nowait(item)
-            except:
-                pass
-    
-    return count
+    return AI_REQUEST_QUEUE.user_counts.get(user_id, 0)
 
 def check_command_cooldown(user_id: int) -> tuple[bool, int]:
     """RATE LIMIT SAFETY: Check if user is on global command cooldown. Returns (is_ready, remaining_seconds)."""
@@ -1174,20 +2242,379 @@ def check_command_cooldown(user_id: int) -> tuple[bool, int]:
     GLOBAL_COMMAND_COOLDOWN[uid] = now
     return (True, 0)
 
+# === MEMBER SAMPLING INDEX ===
+MEMBER_SAMPLE_ATTEMPTS = 8  # Rejection-sampling tries against a skip set before falling back to a scan
+
+class MemberSampler:
+    """Non-bot member ids of one guild: list + position map for O(1) add/remove/uniform sampling.
+    
+    Opted-out ids are swapped to the tail of the list, so ids[:active] is always the opted-in pool.
+    """
+
+    def __init__(self, member_ids=()):
+        self.ids = []
+        self.pos = {}
+        self.active = 0  # ids[:active] are not opted out
+        for member_id in member_ids:
+            self.add(member_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, member_id):
+        return member_id in self.pos
+
+    def _swap(self, i: int, j: int):
+        self.ids[i], self.ids[j] = self.ids[j], self.ids[i]
+        self.pos[self.ids[i]] = i
+        self.pos[self.ids[j]] = j
+
+    def add(self, member_id: int):
+        if member_id in self.pos:
+            return
+        self.pos[member_id] = len(self.ids)
+        self.ids.append(member_id)
+        self._swap(self.active, len(self.ids) - 1)
+        self.active += 1
+
+    def remove(self, member_id: int):
+        if member_id not in self.pos:
+            return
+        self.include(member_id)
+        self._swap(self.pos[member_id], self.active - 1)  # Last opted-in slot
+        self._swap(self.active - 1, len(self.ids) - 1)  # Fill it from the tail
+        self.active -= 1
+        self.ids.pop()
+        del self.pos[member_id]
+
+    def exclude(self, member_id: int):
+        """Opt out: move to the excluded tail."""
+        i = self.pos.get(member_id)
+        if i is None or i >= self.active:
+            return
+        self._swap(i, self.active - 1)
+        self.active -= 1
+
+    def include(self, member_id: int):
+        """Undo exclude."""
+        i = self.pos.get(member_id)
+        if i is None or i < self.active:
+            return
+        self._swap(i, self.active)
+        self.active += 1
+
+    def include_all(self):
+        self.active = len(self.ids)
+
+    def sample(self, skip=(), honour_optout: bool = False) -> Optional[int]:
+        """Uniform random id not in `skip` (and not opted out if honour_optout), or None."""
+        size = self.active if honour_optout else len(self.ids)
+        if size == 0:
+            return None
+        for _ in range(MEMBER_SAMPLE_ATTEMPTS):
+            member_id = self.ids[random.randrange(size)]
+            if member_id not in skip:
+                return member_id
+        remaining = [member_id for member_id in self.ids[:size] if member_id not in skip]
+        return random.choice(remaining) if remaining else None
+
+ELIGIBLE_MEMBER_INDEX = {}  # {guild_id: MemberSampler}; built lazily, kept current by member join/remove and /optout
+
+def eligible_member_index(guild: discord.Guild) -> MemberSampler:
+    """The guild's sampler, built from guild.members on first use."""
+    index = ELIGIBLE_MEMBER_INDEX.get(guild.id)
+    if index is None:
+        index = MemberSampler(m.id for m in guild.members if not m.bot)
+        for member_id in bot.chaos_optout:
+            index.exclude(member_id)
+        ELIGIBLE_MEMBER_INDEX[guild.id] = index
+    return index
+
+def sample_member(guild: Optional[discord.Guild], skip=(), honour_optout: bool = False) -> Optional[discord.Member]:
+    """Random non-bot member of the guild; ids that have gone stale are dropped from the index."""
+    if not guild:
+        return None
+    index = eligible_member_index(guild)
+    for _ in range(MEMBER_SAMPLE_ATTEMPTS):
+        member_id = index.sample(skip, honour_optout)
+        if member_id is None:
+            return None
+        member = guild.get_member(member_id)
+        if member is not None:
+            return member
+        index.remove(member_id)
+    return None
+
+def set_chaos_optout(user_id: int):
+    """Opt a user out of chaos pings for this session."""
+    bot.chaos_optout.add(user_id)
+    for index in ELIGIBLE_MEMBER_INDEX.values():
+        index.exclude(user_id)
+
+def clear_chaos_optout():
+    """End-of-session reset of chaos opt-outs."""
+    bot.chaos_optout.clear()
+    for index in ELIGIBLE_MEMBER_INDEX.values():
+        index.include_all()
+
+# === OUTBOUND DISPATCHER ===
+DISPATCH_CRITICAL = 0  # Moderation, NAS, announcements
+DISPATCH_STAFF = 1  # Tickets, interviews, staff/error logs
+DISPATCH_REPLY = 2  # Direct replies to users
+DISPATCH_BULK = 3  # Chaos, ads, spam, ambient pings (dropped/merged first)
+DISPATCH_CHANNEL_BURST = 5  # Per-channel bucket size (Discord allows ~5 messages / 5s per channel)
+DISPATCH_CHANNEL_RATE = 1.0  # Per-channel refill, messages/second
+DISPATCH_DM_BURST = 2  # Per-DM bucket size
+DISPATCH_DM_RATE = 0.5  # Per-DM refill, messages/second
+DISPATCH_GLOBAL_BURST = 40  # Whole-bot bucket (Discord's global cap is 50/s)
+DISPATCH_GLOBAL_RATE = 40.0
+DISPATCH_BULK_MAX_PENDING = 5  # Per destination; further BULK messages are dropped
+DISPATCH_MAX_AGE = {DISPATCH_REPLY: 120, DISPATCH_BULK: 30}  # Seconds before an unsent message is dropped
+OUTBOUND_STATS = Counter()  # sent / dropped / merged / expired / 429 / failed
+
+class OutboundDispatcher:
+    """Priority lanes of pending sends, paced by per-destination and global token buckets."""
+
+    def __init__(self):
+        self.lanes = {p: deque() for p in (DISPATCH_CRITICAL, DISPATCH_STAFF, DISPATCH_REPLY, DISPATCH_BULK)}
+        self.pending = Counter()  # {destination: queued jobs}
+        self.buckets = {}  # {destination: [tokens, last_refill]}
+        self.global_bucket = [DISPATCH_GLOBAL_BURST, time.time()]
+        self.wake = asyncio.Event()
+
+    @staticmethod
+    def destination(target) -> tuple:
+        """Bucket key: the target's Discord rate-limit route."""
+        return discord_route(target)
+
+    def qsize(self) -> int:
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def submit(self, target, priority: int, coalesce_key: Optional[str], kwargs: dict) -> asyncio.Future:
+        """Queue a send. Identical coalesce_key for a destination merges into the pending job."""
+        dest = self.destination(target)
+        lane = self.lanes[priority]
+        if coalesce_key:
+            for job in lane:
+                if job["dest"] == dest and job["key"] == coalesce_key:
+                    OUTBOUND_STATS["merged"] += 1
+                    return job["future"]
+        future = asyncio.get_running_loop().create_future()
+        if priority >= DISPATCH_BULK and self.pending[dest] >= DISPATCH_BULK_MAX_PENDING:
+            OUTBOUND_STATS["dropped"] += 1
+            future.set_result(None)
+            return future
+        lane.append({"target": target, "dest": dest, "priority": priority, "kwargs": kwargs,
+                     "future": future, "key": coalesce_key, "created": time.time(), "retried": False})
+        self.pending[dest] += 1
+        self.wake.set()
+        return future
+
+    def _refill(self, bucket: list, burst: float, rate: float, now: float):
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+
+    def _wait_for(self, dest: tuple, now: float) -> float:
+        """Seconds until `dest` may send (0 = a token is available now)."""
+        burst, rate = (DISPATCH_DM_BURST, DISPATCH_DM_RATE) if dest[0] == "dm" else (DISPATCH_CHANNEL_BURST, DISPATCH_CHANNEL_RATE)
+        bucket = self.buckets.setdefault(dest, [burst, now])
+        self._refill(bucket, burst, rate, now)
+        self._refill(self.global_bucket, DISPATCH_GLOBAL_BURST, DISPATCH_GLOBAL_RATE, now)
+        waits = [discord_rate_limit_remaining(dest), (1 - bucket[0]) / rate, (1 - self.global_bucket[0]) / DISPATCH_GLOBAL_RATE]
+        return max(0.0, *waits)
+
+    def _finish(self, job: dict):
+        self.pending[job["dest"]] -= 1
+        if self.pending[job["dest"]] <= 0:
+            del self.pending[job["dest"]]
+
+    def next_ready(self) -> tuple:
+        """Highest-priority job whose destination has a token. Returns (job or None, seconds to wait)."""
+        now = time.time()
+        soonest = 1.0
+        blocked = set()
+        for priority in sorted(self.lanes):
+            lane = self.lanes[priority]
+            for job in list(lane):
+                max_age = DISPATCH_MAX_AGE.get(priority)
+                if max_age and now - job["created"] > max_age:
+                    lane.remove(job)
+                    self._finish(job)
+                    OUTBOUND_STATS["expired"] += 1
+                    if not job["future"].done():
+                        job["future"].set_result(None)
+                    continue
+                if job["dest"] in blocked:
+                    continue
+                wait = self._wait_for(job["dest"], now)
+                if wait <= 0:
+                    lane.remove(job)
+                    return job, 0.0
+                blocked.add(job["dest"])  # Keep per-destination order
+                soonest = min(soonest, wait)
+        return None, soonest
+
+    async def _deliver(self, job: dict):
+        bucket = self.buckets[job["dest"]]
+        bucket[0] -= 1
+        self.global_bucket[0] -= 1
+        try:
+            message = await job["target"].send(**job["kwargs"])
+            self._finish(job)
+            OUTBOUND_STATS["sent"] += 1
+            if not job["future"].done():
+                job["future"].set_result(message)
+        except discord.HTTPException as e:
+            if e.status == 429 and not job["retried"]:
+                # Only this route waits (exactly retry_after); everything else keeps flowing
+                OUTBOUND_STATS["429"] += 1
+                set_discord_rate_limited(True, e, job["dest"])
+                job["retried"] = True
+                self.lanes[job["priority"]].appendleft(job)
+                return
+            self._finish(job)
+            OUTBOUND_STATS["failed"] += 1
+            if not job["future"].done():
+                job["future"].set_exception(e)
+        except Exception as e:
+            self._finish(job)
+            OUTBOUND_STATS["failed"] += 1
+            if not job["future"].done():
+                job["future"].set_exception(e)
+
+    async def pump(self):
+        """Wait for work, then deliver until the lanes are empty."""
+        try:
+            await asyncio.wait_for(self.wake.wait(), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+        self.wake.clear()
+        while self.qsize():
+            job, wait = self.next_ready()
+            if job:
+                await self._deliver(job)
+                continue
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=wait)  # New (maybe higher-priority) work cuts the wait short
+            except asyncio.TimeoutError:
+                pass
+
+OUTBOUND = OutboundDispatcher()
+
+async def dispatch_send(target, priority: int = DISPATCH_REPLY, coalesce_key: Optional[str] = None, **kwargs):
+    """Send through the outbound dispatcher and wait for delivery. Returns the Message, or None if dropped/merged away."""
+    if not bot.outbound_dispatcher.is_running():
+        return await target.send(**kwargs)
+    return await asyncio.shield(OUTBOUND.submit(target, priority, coalesce_key, kwargs))
+
+def _log_dispatch_failure(future: asyncio.Future):
+    if not future.cancelled() and future.exception():
+        print(f"⚠️ Outbound send failed: {future.exception()}")
+
+def dispatch_nowait(target, priority: int = DISPATCH_BULK, coalesce_key: Optional[str] = None, **kwargs):
+    """Fire-and-forget send through the dispatcher; failures are logged, not raised."""
+    if not bot.outbound_dispatcher.is_running():
+        asyncio.create_task(target.send(**kwargs)).add_done_callback(_log_dispatch_failure)
+        return
+    OUTBOUND.submit(target, priority, coalesce_key, kwargs).add_done_callback(_log_dispatch_failure)
+
+def outbound_status() -> str:
+    """One-line dispatcher summary for /status."""
+    limited = sum(1 for until in DISCORD_ROUTE_LIMITS.values() if until > time.time())
+    global_limit = f" • 🔴 global limit `{int(discord_rate_limit_remaining())}s`" if check_discord_rate_limit() else ""
+    return (f"`{OUTBOUND.qsize()}` pending • sent `{OUTBOUND_STATS['sent']}` • merged `{OUTBOUND_STATS['merged']}` • "
+            f"dropped `{OUTBOUND_STATS['dropped'] + OUTBOUND_STATS['expired']}` • 429s `{OUTBOUND_STATS['429']}` "
+            f"({limited} routes paused){global_limit} • reactive `{REACTIVE_STATS['fired']}` sent / "
+            f"`{REACTIVE_STATS['suppressed']}` suppressed")
+
+# === REACTIVE RESPONDER ===
+# Side replies triggered by ordinary messages. Windows are seconds between replies per channel / per user (0 = no limit)
+REACTIVE_BUDGETS = {
+    "ask_google": {"channel": 30, "user": 120},  # "?" spam
+    "ad_disclosure": {"channel": 10, "user": 60},  # Mentions during an ad campaign
+    "chaos_optout": {"channel": 0, "user": 0},  # DM notice; per-user de-dup is bot.chaos_notified
+    "chaos_optout_fallback": {"channel": 15, "user": 0},  # In-channel notice when the DM fails
+}
+REACTIVE_MAX_INFLIGHT = 20  # Concurrent reactive sends; beyond this new triggers are suppressed
+REACTIVE_LAST_FIRED = {}  # {(kind, "ch"|"user", id): timestamp}
+REACTIVE_INFLIGHT = set()  # Running reaction tasks
+REACTIVE_STATS = Counter()  # fired / suppressed / failed
+
+def reactive_allowed(kind: str, channel_id: int, user_id: int) -> bool:
+    """Check and consume the per-channel and per-user windows for a reactive reply."""
+    budget = REACTIVE_BUDGETS[kind]
+    now = time.time()
+    keys = [(kind, scope, target) for scope, target in (("ch", channel_id), ("user", user_id)) if budget["channel" if scope == "ch" else "user"]]
+    for key in keys:
+        window = budget["channel" if key[1] == "ch" else "user"]
+        if now - REACTIVE_LAST_FIRED.get(key, 0) < window:
+            return False
+    for key in keys:
+        REACTIVE_LAST_FIRED[key] = now
+    return True
+
+async def _run_reaction(kind: str, coro):
+    try:
+        await coro
+    except Exception as e:
+        REACTIVE_STATS["failed"] += 1
+        print(f"⚠️ Reactive {kind} failed: {e}")
+
+def react(kind: str, channel_id: int, user_id: int, make_coro) -> bool:
+    """Schedule make_coro() off the event's critical path if the budget allows (one reply per window)."""
+    if len(REACTIVE_INFLIGHT) >= REACTIVE_MAX_INFLIGHT or not reactive_allowed(kind, channel_id, user_id):
+        REACTIVE_STATS["suppressed"] += 1
+        return False
+    REACTIVE_STATS["fired"] += 1
+    task = asyncio.create_task(_run_reaction(kind, make_coro()))
+    REACTIVE_INFLIGHT.add(task)
+    task.add_done_callback(REACTIVE_INFLIGHT.discard)
+    return True
+
+def cleanup_reactive_budgets():
+    """Forget windows that have already elapsed."""
+    now = time.time()
+    longest = max(max(budget.values()) for budget in REACTIVE_BUDGETS.values())
+    for key in [k for k, fired in REACTIVE_LAST_FIRED.items() if now - fired > longest]:
+        del REACTIVE_LAST_FIRED[key]
+
+async def send_ask_google(channel):
+    """The "?" reaction: one message carrying the whole burst."""
+    await dispatch_send(channel, DISPATCH_BULK, coalesce_key="ask_google", content="\n".join(["JUST ASK GOOGLE " * 5] * 4))
+
+async def send_ad_disclosure(message: discord.Message):
+    """Paid-promotion disclosure when the bot is mentioned during an ad campaign."""
+    disclosure = "I WAS PAID BY GOOGLE LLC TO SAY THIS"
+    emojis = "🔍📧☁️📱🎬🗺️💳🎤🖼️📰🎮📊🔐🌐🔔🎯📍🔊💬🌟⌚🏠📡🛒🌍🎨📚🔬🎵🚗🏥🌱🔮🤖🏪📞🎪📋📈🖊️🗂️🔗🎒🎬🌐📊🔍📱⚡🎮💾🧠🌈🎓"
+    random_emojis = "".join(random.choices(emojis, k=25))
+    await dispatch_send(message.channel, DISPATCH_BULK, coalesce_key="ad_disclosure", content=f"{message.author.mention}: **{disclosure}**\n{random_emojis}")
+
+async def send_chaos_optout_notice(message: discord.Message):
+    """Tell a user about /optout: DM first, budgeted in-channel fallback."""
+    optout_msg = discord.Embed(
+        title="🌀 Chaos Mode Active",
+        description="The Watcher has unleashed chaos. Use `/optout` to stop being pinged.",
+        color=EMBED_COLORS["warning"]
+    )
+    try:
+        await dispatch_send(message.author, DISPATCH_REPLY, embed=optout_msg)
+    except (discord.Forbidden, discord.HTTPException):
+        if reactive_allowed("chaos_optout_fallback", message.channel.id, message.author.id):
+            await dispatch_send(message.channel, DISPATCH_BULK, content=f"{message.author.mention}", embed=optout_msg, delete_after=15)
+
 async def safe_send_dm(user: discord.User, embed: discord.Embed = None, content: str = None) -> bool:
     """Safely send DM with error suppression. Returns True if sent."""
     try:
         # Check rate-limit before sending
-        if check_discord_rate_limit():
+        if check_discord_rate_limit(discord_route(user)):
             print(f"⏳ DM blocked due to Discord rate-limit: {user}")
             return False
         
-        await user.send(embed=embed, content=content)
-        return True
+        return await dispatch_send(user, DISPATCH_REPLY, embed=embed, content=content) is not None
     except discord.HTTPException as e:
         if e.status == 429:
-            set_discord_rate_limited(True)
-            print(f"❌ HTTP 429 on DM to {user} - rate-limit engaged")
+            set_discord_rate_limited(True, e, discord_route(user))
             return False
         print(f"⚠️ Cannot DM {user}: {e}")
         return False
@@ -1195,64 +2622,312 @@ async def safe_send_dm(user: discord.User, embed: discord.Embed = None, content:
         print(f"⚠️ Cannot DM {user}")
         return False
 
-def check_discord_rate_limit():
-    """Check if bot is currently Discord rate-limited. Auto-clears after timeout."""
+def discord_route(target) -> tuple:
+    """Rate-limit route for a send target: DMs and channels are limited separately."""
+    if isinstance(target, (discord.User, discord.Member)):
+        return ("dm", target.id)
+    return ("ch", getattr(target, "id", id(target)))
+
+def parse_discord_rate_limit(error) -> tuple:
+    """(retry_after seconds, is_global, bucket) from a 429 HTTPException or discord.RateLimited."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    bucket = headers.get("X-RateLimit-Bucket")
+    is_global = headers.get("X-RateLimit-Global", "").lower() == "true" or headers.get("X-RateLimit-Scope") == "global"
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        retry_after = parse_duration_seconds(headers.get("Retry-After") or headers.get("X-RateLimit-Reset-After") or "")
+    if retry_after is None and response is not None and not bucket:
+        # No Discord rate-limit headers at all: Cloudflare, which limits the whole IP
+        return DISCORD_CLOUDFLARE_RETRY_AFTER, True, None
+    return (retry_after if retry_after is not None else DISCORD_DEFAULT_RETRY_AFTER), is_global, bucket
+
+def discord_rate_limit_remaining(route: Optional[tuple] = None) -> float:
+    """Seconds until sends may resume: the global limit, plus (given a route) its route/bucket limit."""
     global DISCORD_RATE_LIMITED, DISCORD_RATE_LIMITED_TIME
-    
-    if not DISCORD_RATE_LIMITED:
-        return False
-    
-    # Check if timeout has elapsed
-    if int(time.time()) - DISCORD_RATE_LIMITED_TIME > DISCORD_RATE_LIMITED_TIMEOUT:
-        print(f"✅ Discord rate-limit lock cleared after {DISCORD_RATE_LIMITED_TIMEOUT}s timeout")
+    now = time.time()
+    if DISCORD_RATE_LIMITED:
+        if now < DISCORD_RATE_LIMITED_UNTIL:
+            return DISCORD_RATE_LIMITED_UNTIL - now
+        print(f"✅ Discord global rate limit cleared after {int(now - DISCORD_RATE_LIMITED_TIME)}s")
         DISCORD_RATE_LIMITED = False
         DISCORD_RATE_LIMITED_TIME = 0
-        return False
+    if route is None:
+        return 0.0
+    until = max(DISCORD_ROUTE_LIMITS.get(route, 0), DISCORD_BUCKET_LIMITS.get(DISCORD_ROUTE_BUCKETS.get(route), 0))
+    return max(0.0, until - now)
+
+def check_discord_rate_limit(route: Optional[tuple] = None) -> bool:
+    """Check if sends (to `route`, if given) are currently rate-limited. Limits expire at their exact retry_after."""
+    return discord_rate_limit_remaining(route) > 0
+
+def set_discord_rate_limited(status: bool, error=None, route: Optional[tuple] = None) -> float:
+    """Record a 429 (or clear with status=False). Only global limits block every send. Returns seconds to wait."""
+    global DISCORD_RATE_LIMITED, DISCORD_RATE_LIMITED_TIME, DISCORD_RATE_LIMITED_UNTIL
+    if not status:
+        DISCORD_RATE_LIMITED = False
+        DISCORD_RATE_LIMITED_TIME = 0
+        DISCORD_RATE_LIMITED_UNTIL = 0.0
+        return 0.0
     
-    return True
-
-def set_discord_rate_limited(status: bool):
-    """Set global Discord rate-limit flag."""
-    global DISCORD_RATE_LIMITED, DISCORD_RATE_LIMITED_TIME
-    if status:
+    retry_after, is_global, bucket = parse_discord_rate_limit(error) if error is not None else (DISCORD_DEFAULT_RETRY_AFTER, False, None)
+    until = time.time() + retry_after
+    if is_global:
         DISCORD_RATE_LIMITED = True
         DISCORD_RATE_LIMITED_TIME = int(time.time())
-        print(f"🔴 DISCORD RATE LIMITED (429) - All message sends blocked for {DISCORD_RATE_LIMITED_TIMEOUT}s")
+        DISCORD_RATE_LIMITED_UNTIL = max(DISCORD_RATE_LIMITED_UNTIL, until)
+        print(f"🔴 DISCORD GLOBAL RATE LIMIT (429) - All message sends paused for {retry_after:.1f}s")
+    elif route is not None:
+        DISCORD_ROUTE_LIMITS[route] = max(DISCORD_ROUTE_LIMITS.get(route, 0), until)
+        if bucket:
+            DISCORD_ROUTE_BUCKETS[route] = bucket
+            DISCORD_BUCKET_LIMITS[bucket] = max(DISCORD_BUCKET_LIMITS.get(bucket, 0), until)
+        print(f"🟠 Discord 429 on {route[0]}:{route[1]} (bucket {bucket or 'unknown'}) - paused {retry_after:.1f}s")
     else:
-        DISCORD_RATE_LIMITED = False
-        DISCORD_RATE_LIMITED_TIME = 0
+        print(f"🟠 Discord 429 (route unknown) - retry after {retry_after:.1f}s")
+    return retry_after
+
+def cleanup_discord_rate_limits():
+    """Forget expired route/bucket limits."""
+    now = time.time()
+    for limits in (DISCORD_ROUTE_LIMITS, DISCORD_BUCKET_LIMITS):
+        for key in [k for k, until in limits.items() if until <= now]:
+            del limits[key]
+    for route in [r for r in DISCORD_ROUTE_BUCKETS if r not in DISCORD_ROUTE_LIMITS]:
+        del DISCORD_ROUTE_BUCKETS[route]
 
 async def safe_send_message_with_ratelimit(channel_or_interaction, **kwargs) -> Optional:
     """Send message/response safely, respecting Discord rate-limit flag."""
-    global DISCORD_RATE_LIMITED
-    
-    if check_discord_rate_limit():
-        print(f"⏳ Blocked message send due to 429 rate limit (will auto-clear in {DISCORD_RATE_LIMITED_TIMEOUT}s)")
+    is_interaction = hasattr(channel_or_interaction, 'response')
+    route = None if is_interaction else discord_route(channel_or_interaction)
+    wait = discord_rate_limit_remaining(route)
+    if wait > 0:
+        print(f"⏳ Blocked message send due to 429 rate limit (clears in {wait:.1f}s)")
         return None
     
     try:
         # Determine if this is an interaction or channel
-        if hasattr(channel_or_interaction, 'response'):  # discord.Interaction
+        if is_interaction:  # discord.Interaction
             if 'ephemeral' not in kwargs:
                 kwargs['ephemeral'] = True
             await channel_or_interaction.response.send_message(**kwargs)
         else:  # discord.TextChannel
-            await channel_or_interaction.send(**kwargs)
+            await dispatch_send(channel_or_interaction, DISPATCH_REPLY, **kwargs)
         return True
     except discord.HTTPException as e:
         if e.status == 429:
-            set_discord_rate_limited(True)
-            print(f"❌ HTTP 429 detected - rate-limit lock engaged")
+            set_discord_rate_limited(True, e, route)
         raise
     except Exception as e:
         print(f"⚠️ Error sending message: {type(e).__name__}: {e}")
         return None
 
-async def queue_ai_request(user_id: int, channel_id: int, prompt: str, context: str, placeholder_message_id: Optional[int] = None) -> tuple[bool, str]:
+# === DURABLE AI QUEUE JOURNAL ===
+AI_JOURNAL_FIELDS = ("id", "user_id", "channel_id", "prompt", "context", "created_at", "retry_count", "placeholder_message_id", "max_age", "payload")
+AI_JOURNAL_DB = None  # sqlite3 connection when AI_QUEUE_JOURNAL is a file path
+AI_JOURNAL_REPLAYED = False  # Replay once per process (on_ready also fires on reconnect)
+AI_JOURNAL_EXECUTOR = None  # Single-thread executor for Supabase journal calls (keeps write/ack order)
+
+def _ai_journal_sqlite():
+    """Open (once) the SQLite journal file."""
+    global AI_JOURNAL_DB
+    if AI_JOURNAL_DB is None:
+        AI_JOURNAL_DB = sqlite3.connect(AI_QUEUE_JOURNAL, check_same_thread=False)
+        AI_JOURNAL_DB.execute("CREATE TABLE IF NOT EXISTS ai_queue (id TEXT PRIMARY KEY, created_at INTEGER, body TEXT)")
+        AI_JOURNAL_DB.commit()
+    return AI_JOURNAL_DB
+
+def _ai_journal_run(label: str, write):
+    """Run a journal operation: Supabase calls go to a single worker thread (ordered, never blocking the
+    event loop); small SQLite writes stay inline."""
+    global AI_JOURNAL_EXECUTOR
+    
+    def guarded():
+        try:
+            write()
+        except Exception as e:
+            print(f"⚠️ AI journal {label} failed: {e}")
+    
+    if AI_QUEUE_JOURNAL != "supabase":
+        guarded()
+        return
+    if AI_JOURNAL_EXECUTOR is None:
+        AI_JOURNAL_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-journal")
+    AI_JOURNAL_EXECUTOR.submit(guarded)
+
+def journal_ai_request(request: dict):
+    """Persist a queued request (serializable fields only) so it survives restarts."""
+    if not AI_QUEUE_JOURNAL:
+        return
+    body = {key: request.get(key) for key in AI_JOURNAL_FIELDS}
+    
+    def write():
+        if AI_QUEUE_JOURNAL == "supabase":
+            response = supabase.table("ai_queue_journal").upsert({
+                "id": body["id"], "created_at": body["created_at"], "body": body
+            }).execute()
+            ensure_ok(response, "ai_queue_journal upsert")
+        else:
+            db = _ai_journal_sqlite()
+            db.execute("INSERT OR REPLACE INTO ai_queue (id, created_at, body) VALUES (?, ?, ?)",
+                       (body["id"], body["created_at"], json.dumps(body)))
+            db.commit()
+    
+    _ai_journal_run("write", write)
+
+def journal_ack(request_id: Optional[str]):
+    """Remove a finished (or discarded) request from the journal."""
+    if not AI_QUEUE_JOURNAL or not request_id:
+        return
+    
+    def write():
+        if AI_QUEUE_JOURNAL == "supabase":
+            response = supabase.table("ai_queue_journal").delete().eq("id", request_id).execute()
+            ensure_ok(response, "ai_queue_journal delete")
+        else:
+            db = _ai_journal_sqlite()
+            db.execute("DELETE FROM ai_queue WHERE id = ?", (request_id,))
+            db.commit()
+    
+    _ai_journal_run("ack", write)
+
+def journal_clear():
+    """Drop every journaled request (used when the queue is cleared)."""
+    if not AI_QUEUE_JOURNAL:
+        return
+    
+    def write():
+        if AI_QUEUE_JOURNAL == "supabase":
+            response = supabase.table("ai_queue_journal").delete().neq("id", "").execute()
+            ensure_ok(response, "ai_queue_journal clear")
+        else:
+            db = _ai_journal_sqlite()
+            db.execute("DELETE FROM ai_queue")
+            db.commit()
+    
+    _ai_journal_run("clear", write)
+
+def load_ai_journal() -> list:
+    """All journaled requests, oldest first (blocking; replay_ai_journal calls it off the event loop)."""
+    if not AI_QUEUE_JOURNAL:
+        return []
+    try:
+        if AI_QUEUE_JOURNAL == "supabase":
+            response = supabase.table("ai_queue_journal").select("body").order("created_at").execute()
+            ensure_ok(response, "ai_queue_journal select")
+            return [row["body"] for row in (response.data or []) if row.get("body")]
+        db = _ai_journal_sqlite()
+        return [json.loads(row[0]) for row in db.execute("SELECT body FROM ai_queue ORDER BY created_at")]
+    except Exception as e:
+        print(f"⚠️ AI journal load failed: {e}")
+        return []
+
+async def resolve_ai_channel(channel_id: Optional[int], user_id: Optional[int]):
+    """Channel for an AI reply; DM channels are re-opened from the user after a restart (not cached)."""
+    channel = bot.get_channel(channel_id) if channel_id else None
+    if channel is None and user_id:
+        try:
+            user = bot.get_user(user_id) or await bot.fetch_user(user_id)
+            channel = user.dm_channel or await user.create_dm()
+        except Exception:
+            channel = None
+    return channel
+
+async def replay_ai_journal():
+    """Re-queue journaled requests after a restart; stale ones get their placeholder closed out."""
+    global AI_JOURNAL_REPLAYED
+    if AI_JOURNAL_REPLAYED or not AI_QUEUE_JOURNAL:
+        return
+    AI_JOURNAL_REPLAYED = True
+    
+    replayed = stale = 0
+    journaled = await asyncio.get_running_loop().run_in_executor(None, load_ai_journal)
+    for request in journaled:
+        age = time.time() - request.get("created_at", 0)
+        if age > (request.get("max_age") or 120):
+            stale += 1
+            journal_ack(request.get("id"))
+            if request.get("placeholder_message_id"):
+                await close_ai_placeholder(request, "🛰️ *[SIGNAL LOST — SYSTEM RESTARTED]* Ask me again.")
+            continue
+        try:
+            AI_REQUEST_QUEUE.put_nowait(request)
+            index_message(request.get("placeholder_message_id"), "placeholder", request.get("id"))
+            if request.get("context") == "memory_summary":
+                MEMORY_COMPACTION_PENDING.add((request.get("payload") or {}).get("uid"))
+            replayed += 1
+        except asyncio.QueueFull:
+            journal_ack(request.get("id"))
+    if replayed or stale:
+        print(f"📼 AI journal replay: {replayed} requeued, {stale} stale")
+
+def average_service_time() -> float:
+    """Rolling mean seconds per processed AI request."""
+    return (sum(AI_SERVICE_TIMES) / len(AI_SERVICE_TIMES)) if AI_SERVICE_TIMES else AI_DEFAULT_SERVICE_TIME
+
+def estimate_queue_wait(priority: int) -> float:
+    """ETA (seconds) until a new request at `priority` would be answered (sequential processor)."""
+    ahead = AI_REQUEST_QUEUE.ahead_of(priority) if AI_REQUEST_QUEUE else 0
+    in_flight = 1 if AI_QUEUE_PROCESSOR_RUNNING else 0
+    wait = (ahead + in_flight + 1) * average_service_time()
+    # Nothing is served while every provider circuit is open
+    if ai_breaker_is_open():
+        wait += max((p["breaker"]["open_until"] for p in AI_PROVIDERS), default=time.time()) - time.time()
+    return wait
+
+def discard_ai_request(request: dict, reason: str):
+    """Drop a queued request that will never be served: ack the journal and close out its placeholder."""
+    journal_ack(request.get("id"))
+    if request.get("context") == "memory_summary":
+        MEMORY_COMPACTION_PENDING.discard((request.get("payload") or {}).get("uid"))
+    if claim_ai_placeholder(request):
+        asyncio.create_task(close_ai_placeholder(request, f"🛰️ *[SIGNAL LOST — {reason}]* Ask me again later."))
+
+def claim_ai_placeholder(request: dict) -> bool:
+    """Take the request's placeholder out of the index; False if it was deleted or already finalised."""
+    placeholder_message_id = request.get("placeholder_message_id")
+    if lookup_message(placeholder_message_id, "placeholder") != request.get("id"):
+        return False
+    unindex_message(placeholder_message_id)
+    return True
+
+async def close_ai_placeholder(request: dict, text: str):
+    """Edit a request's placeholder to a final notice; journal-replayed requests only carry the id."""
+    try:
+        placeholder = request.get("placeholder_message")
+        if placeholder is None:
+            channel = await resolve_ai_channel(request.get("channel_id"), request.get("user_id"))
+            if channel is None:
+                return
+            placeholder = channel.get_partial_message(request["placeholder_message_id"])
+        await placeholder.edit(content=text, allowed_mentions=discord.AllowedMentions.none())
+    except Exception as e:
+        print(f"⚠️ Could not close AI placeholder: {e}")
+
+def admit_ai_request(priority: int) -> tuple[bool, float]:
+    """Deadline-aware admission: shed lower-priority work until the ETA fits, else reject. Returns (admitted, eta)."""
+    deadline = AI_REQUEST_MAX_AGE * AI_ADMISSION_MARGIN
+    eta = estimate_queue_wait(priority)
+    while (eta > deadline or AI_REQUEST_QUEUE.full()):
+        shed = AI_REQUEST_QUEUE.shed_lowest(priority)
+        if shed is None:
+            return (False, eta)
+        AI_QUEUE_STATS["shed"] += 1
+        print(f"⚠️ Shed {shed.get('context')} request (priority {shed.get('priority')}) for priority {priority}")
+        discard_ai_request(shed, "OVERLOADED")
+        eta = estimate_queue_wait(priority)
+    return (True, eta)
+
+async def queue_ai_request(user_id: int, channel_id: int, prompt: str, context: str, placeholder_message_id: Optional[int] = None, placeholder_message: Optional[discord.Message] = None) -> tuple[bool, str]:
     """
     QUEUE-BASED AI: Queue an AI request instead of executing immediately.
     Returns (success: bool, message: str)
     """
+    # Daily quota is not a violation: report it as such, before the cooldown check
+    quota_msg = ai_quota_message(user_id)
+    if quota_msg:
+        return (False, quota_msg)
+    
     # Check adaptive cooldown
     is_ready, remaining, level = check_adaptive_cooldown(user_id)
     
@@ -1270,10 +2945,16 @@ async def queue_ai_request(user_id: int, channel_id: int, prompt: str, context:
     
     # Try to queue the request
     try:
-        if AI_REQUEST_QUEUE.full():
-            return (False, "⚠️ AI system is currently overloaded. Please try again in a moment.")
+        priority = AI_CONTEXT_PRIORITY.get(context, AI_DEFAULT_PRIORITY)
+        admitted, eta = admit_ai_request(priority)
+        if not admitted:
+            AI_QUEUE_STATS["rejected"] += 1
+            if AI_REQUEST_QUEUE.full():
+                return (False, "⚠️ AI system is currently overloaded. Please try again in a moment.")
+            return (False, f"⚠️ The Watcher is backlogged (~{int(eta)}s wait, over the {AI_REQUEST_MAX_AGE}s limit). Please try again shortly.")
         
         request = {
+            "id": uuid.uuid4().hex,
             "user_id": user_id,
             "channel_id": channel_id,
             "prompt": prompt,
@@ -1281,15 +2962,42 @@ async def queue_ai_request(user_id: int, channel_id: int, prompt: str, context:
             "created_at": int(time.time()),
             "retry_count": 0,
             "placeholder_message_id": placeholder_message_id,
+            "placeholder_message": placeholder_message,
+            "priority": priority,
         }
         
         AI_REQUEST_QUEUE.put_nowait(request)
-        return (True, "🕒 Your request is queued. Processing...")
+        journal_ai_request(request)
+        index_message(placeholder_message_id, "placeholder", request["id"])
+        return (True, f"🕒 Your request is queued (ETA ~{int(eta)}s). Processing...")
     
     except Exception as e:
         print(f"⚠️ Failed to queue AI request: {e}")
         return (False, "⚠️ Unable to queue request. Please try again.")
 
+def queue_background_ai_request(prompt: str, context: str, payload: dict, max_age: int = 900) -> bool:
+    """Queue low-priority system AI work (no user, no channel). Only uses half the queue so users keep headroom."""
+    if not AI_REQUEST_QUEUE or AI_REQUEST_QUEUE.qsize() >= AI_QUEUE_MAX_SIZE // 2:
+        return False
+    request = {
+        "id": uuid.uuid4().hex,
+        "user_id": 0,
+        "channel_id": None,
+        "prompt": prompt,
+        "context": context,
+        "created_at": int(time.time()),
+        "retry_count": 0,
+        "placeholder_message_id": None,
+        "max_age": max_age,
+        "payload": payload,
+    }
+    try:
+        AI_REQUEST_QUEUE.put_nowait(request)
+        journal_ai_request(request)
+        return True
+    except asyncio.QueueFull:
+        return False
+
 async def safe_get_channel(channel_id: int) -> Optional[discord.TextChannel]:
     """Get channel safely, returns None if invalid/unreachable."""
     if not channel_id:
@@ -1349,36 +3057,163 @@ async def add_social_credit(user_id: str, amount: int, reason: str = "system") -
     """Wrapper to adjust social credit in Supabase users table."""
     return await update_user_credit(user_id, amount, reason)
 
+def error_log_key(msg: str) -> str:
+    """Dedupe key: the error text with ids, counts and addresses collapsed."""
+    return re.sub(r"\d+", "#", msg[:200])
+
+def queue_log_embed(channel_id: int, embed: discord.Embed, key: Optional[str] = None):
+    """Buffer a log embed for the next flush. A pending entry with the same key is counted instead of repeated."""
+    buffer = LOG_BUFFERS.setdefault(channel_id, [])
+    if key:
+        for entry in buffer:
+            if entry["key"] == key:
+                entry["count"] += 1
+                LOG_SINK_STATS["deduped"] += 1
+                return
+    buffer.append({"embed": embed, "key": key, "count": 1, "attempts": 0})
+    LOG_SINK_STATS["queued"] += 1
+    fold_log_overflow(channel_id)
+
+def fold_log_overflow(channel_id: int):
+    """Trim a buffer to LOG_BUFFER_MAX, counting the oldest entries into the channel's overflow summary."""
+    buffer = LOG_BUFFERS.get(channel_id, [])
+    while len(buffer) > LOG_BUFFER_MAX:
+        entry = buffer.pop(0)
+        LOG_OVERFLOW.setdefault(channel_id, Counter())[entry["embed"].title or "untitled"] += entry["count"]
+        LOG_SINK_STATS["overflowed"] += 1
+
+def log_overflow_entry(channel_id: int) -> Optional[dict]:
+    """Build the counted summary for entries folded out of a full buffer, or None if nothing overflowed."""
+    folded = LOG_OVERFLOW.pop(channel_id, None)
+    if not folded:
+        return None
+    lines = [f"`×{count}` {title[:80]}" for title, count in folded.most_common(15)]
+    if len(folded) > 15:
+        lines.append(f"…and {len(folded) - 15} more kinds")
+    embed = discord.Embed(
+        title=f"📦 LOG OVERFLOW ×{sum(folded.values())}",
+        description="\n".join(lines),
+        color=0xffa500,
+        timestamp=datetime.now()
+    )
+    embed.set_footer(text=f"NIMBROR WATCHER v6.5 • SENSOR-NET • buffer cap {LOG_BUFFER_MAX}")
+    return {"embed": embed, "key": None, "count": 1, "attempts": 0, "folded": folded}
+
+def requeue_log_entries(channel_id: int, entries: list, reason: str):
+    """Put unsent entries back at the front of the channel's buffer; entries out of attempts are given up."""
+    kept, given_up = [], 0
+    for entry in entries:
+        if "folded" in entry:
+            # The summary is rebuilt on the next flush with anything else that overflowed meanwhile
+            LOG_OVERFLOW.setdefault(channel_id, Counter()).update(entry["folded"])
+            continue
+        entry["attempts"] += 1
+        if entry["attempts"] >= LOG_SEND_RETRIES:
+            given_up += 1
+        else:
+            kept.append(entry)
+    LOG_SINK_STATS["dropped"] += given_up
+    print(f"⚠️ Log sink: {reason} for {channel_id}, {len(kept)} entries requeued"
+          + (f", {given_up} given up after {LOG_SEND_RETRIES} attempts" if given_up else ""))
+    LOG_SINK_STATS["requeued"] += len(kept)
+    LOG_BUFFERS[channel_id] = kept + LOG_BUFFERS.get(channel_id, [])
+    fold_log_overflow(channel_id)
+
+def sweep_repeated_errors():
+    """Post a count for errors that kept repeating inside their dedupe window, then forget expired keys."""
+    now = time.time()
+    for key, (last_posted, repeats, raw) in list(LOG_RECENT_ERRORS.items()):
+        if now - last_posted < LOG_ERROR_DEDUPE_WINDOW:
+            continue
+        del LOG_RECENT_ERRORS[key]
+        if repeats and ERROR_LOG_ID:
+            embed = discord.Embed(
+                title=f"⚠️ PROTOCOL FAILURE (repeated) ×{repeats}",
+                description=f"```py\n{raw[:1800]}\n```",
+                color=0xff6b6b,
+                timestamp=datetime.now()
+            )
+            embed.set_footer(text=f"NIMBROR WATCHER v6.5 • SENSOR-NET • repeats over {LOG_ERROR_DEDUPE_WINDOW // 60} min")
+            queue_log_embed(ERROR_LOG_ID, embed)
+
+async def flush_log_sink():
+    """Send buffered log embeds, packing up to 10 per message within Discord's 6000-char embed budget."""
+    sweep_repeated_errors()
+    for channel_id in set(LOG_BUFFERS) | set(LOG_OVERFLOW):
+        entries = LOG_BUFFERS.pop(channel_id, [])
+        overflow = log_overflow_entry(channel_id)
+        if overflow:
+            entries.insert(0, overflow)
+        if not entries:
+            continue
+        ch = await safe_get_channel(channel_id)
+        if not ch:
+            requeue_log_entries(channel_id, entries, "channel unavailable")
+            continue
+        packs, pack, size = [], [], 0
+        for entry in entries:
+            embed = entry["embed"]
+            if entry["count"] > 1:
+                # Count goes on a copy so a requeued entry isn't suffixed twice
+                embed = embed.copy()
+                embed.title = f"{embed.title} ×{entry['count']}"
+            length = len(embed)
+            if pack and (len(pack) >= LOG_EMBEDS_PER_MESSAGE or size + length > LOG_MESSAGE_CHAR_BUDGET):
+                packs.append(pack)
+                pack, size = [], 0
+            pack.append((entry, embed))
+            size += length
+        packs.append(pack)
+        for index, pack in enumerate(packs):
+            try:
+                sent = await dispatch_send(ch, DISPATCH_STAFF, embeds=[embed for _, embed in pack])
+            except Exception as e:
+                # Never route through log_error here: a failing log channel would feed itself
+                print(f"❌ Log sink flush to {channel_id} failed: {e}")
+                sent = None
+            if sent is None:
+                # Keep order: this pack and everything after it goes back to the front for the next tick
+                requeue_log_entries(channel_id, [entry for unsent in packs[index:] for entry, _ in unsent], "send failed")
+                break
+            LOG_SINK_STATS["messages"] += 1
+            LOG_SINK_STATS["embeds"] += len(pack)
+
 async def log_error(msg):
-    """Log errors with clean embed to ERROR_LOG_CHANNEL_ID (rate-limited)."""
+    """Log errors with clean embed to ERROR_LOG_CHANNEL_ID (buffered; repeats are counted, not re-posted)."""
     if not ERROR_LOG_ID:
         print(f"❌ {msg[:200]}")
         return
     
-    # Rate limit error logs to prevent Discord spam
-    now = int(time.time())
-    if "last_error_log" in ERROR_LOG_COOLDOWN and (now - ERROR_LOG_COOLDOWN["last_error_log"]) < ERROR_LOG_COOLDOWN_DURATION:
-        print(f"⏳ Error log rate-limited: {msg[:100]}...")
+    # Identical errors within the dedupe window become a repeat count on the next post
+    now = time.time()
+    key = error_log_key(msg)
+    recent = LOG_RECENT_ERRORS.get(key)
+    if recent and (now - recent[0]) < LOG_ERROR_DEDUPE_WINDOW:
+        recent[1] += 1
+        recent[2] = msg
+        LOG_SINK_STATS["deduped"] += 1
+        print(f"⏳ Repeated error (x{recent[1] + 1}): {msg[:100]}...")
         return
-    
-    ERROR_LOG_COOLDOWN["last_error_log"] = now
+    repeats = recent[1] if recent else 0
+    LOG_RECENT_ERRORS[key] = [now, 0, msg]
     
     try:
-        ch = await safe_get_channel(ERROR_LOG_ID)
-        if ch:
-            error_embed = discord.Embed(
-                title="⚠️ PROTOCOL FAILURE",
-                description=f"```py\n{msg[:1800]}\n```",
-                color=0xff6b6b,
-                timestamp=datetime.now()
-            )
-            error_embed.set_footer(text="NIMBROR WATCHER v6.5 • SENSOR-NET")
-            await ch.send(embed=error_embed)
+        error_embed = discord.Embed(
+            title="⚠️ PROTOCOL FAILURE",
+            description=f"```py\n{msg[:1800]}\n```",
+            color=0xff6b6b,
+            timestamp=datetime.now()
+        )
+        footer = "NIMBROR WATCHER v6.5 • SENSOR-NET"
+        if repeats:
+            footer += f" • {repeats} repeat(s) in the last {LOG_ERROR_DEDUPE_WINDOW // 60} min"
+        error_embed.set_footer(text=footer)
+        queue_log_embed(ERROR_LOG_ID, error_embed, key)
     except Exception as e:
         print(f"❌ Log error: {e}")
 
 async def log_interview_answer(user_id: int, user_mention: str, question_num: int, total_questions: int, question_text: str, answer_text: str, score: int):
-    """Log individual interview answer to INTERVIEW_LOGS_CHANNEL (rate-limited, batched)."""
+    """Log individual interview answer to INTERVIEW_LOGS_CHANNEL (buffered, packed with neighbours)."""
     if not INTERVIEW_LOGS_CHANNEL_ID:
         return
     
@@ -1400,7 +3235,7 @@ async def log_interview_answer(user_id: int, user_mention: str, question_num: in
         answer_embed.add_field(name="Answer", value=f"```{answer_text[:500]}```", inline=False)
         answer_embed.set_footer(text="NIMBROR WATCHER v6.5 • INTERVIEW ANSWER LOG")
         
-        await ch.send(embed=answer_embed)
+        queue_log_embed(ch.id, answer_embed)
     except Exception as e:
         await log_error(f"interview answer log: {str(e)}")
 
@@ -1443,7 +3278,7 @@ async def log_interview_complete(user_id: int, user_mention: str, score_total: i
         summary_embed.add_field(name="Q&A Summary", value=qa_summary[:1024], inline=False)
         summary_embed.set_footer(text="NIMBROR WATCHER v6.5 • INTERVIEW FINAL LOG")
         
-        await ch.send(embed=summary_embed)
+        queue_log_embed(ch.id, summary_embed)
     except Exception as e:
         await log_error(f"interview complete log: {str(e)}")
 
@@ -1500,7 +3335,7 @@ async def send_interview_ai_summary(user_id: int, user_mention: str, score_total
         summary_embed.add_field(name="Status", value="✅ PASSED" if passed else "❌ FAILED/UNDER REVIEW", inline=False)
         summary_embed.set_footer(text="NIMBROR WATCHER v6.5 • AI ANALYSIS")
         
-        await ch.send(embed=summary_embed)
+        queue_log_embed(ch.id, summary_embed)
     except Exception as e:
         await log_error(f"interview AI summary send: {str(e)}")
 
@@ -1516,12 +3351,58 @@ def add_memory(user_id: str, interaction_type: str, data: str):
     bot.db.setdefault("memory", {})[uid] = bot.db["memory"].get(uid, {"interactions": [], "preferences": []})
     if interaction_type == "interaction":
         bot.db["memory"][uid]["interactions"].append({"timestamp": datetime.now().isoformat(), "data": data})
+        index_memory_entry(uid, interaction_type, data)
         # Prevent unbounded memory growth - keep last 50 interactions
         if len(bot.db["memory"][uid]["interactions"]) > 50:
             bot.db["memory"][uid]["interactions"].pop(0)
+            trim_memory_index(uid, 1)
     elif interaction_type == "preference":
         if data not in bot.db["memory"][uid]["preferences"]:  # Deduplicate
             bot.db["memory"][uid]["preferences"].append(data)
+            index_memory_entry(uid, interaction_type, data)
+    invalidate_prompt_fragments(uid)
+    save_data(bot.db)
+
+# === MEMORY COMPACTION ===
+MEMORY_COMPACT_THRESHOLD = 30  # Compact once a user has more raw interactions than this
+MEMORY_RAW_WINDOW = 10  # Most recent interactions kept verbatim after compaction
+MEMORY_SUMMARY_MAX_CHARS = 600  # Hard cap on the rolling per-user summary
+MEMORY_COMPACT_PER_RUN = 3  # Max users queued for summarization per compaction pass
+MEMORY_COMPACTION_PENDING = set()  # uids with a summary request already queued
+MEMORY_SUMMARY_SYSTEM_PROMPT = (
+    "You maintain short factual notes about a Discord user for a bot. "
+    "Merge the previous summary with the new events. Keep names, preferences, recurring topics and open issues. "
+    "Plain text only, at most 3 short sentences."
+)
+register_ai_profile("summary", MEMORY_SUMMARY_SYSTEM_PROMPT, 120)
+
+def build_memory_summary_prompt(previous: str, older: list) -> str:
+    """Prompt asking the AI to fold older interactions into the rolling summary."""
+    events = "\n".join(f"- {str(inter.get('data', ''))[:120]}" for inter in older)
+    return f"Previous summary: {previous or '(none)'}\nNew events:\n{events}"
+
+def fallback_memory_summary(previous: str, older: list) -> str:
+    """Extractive summary used when the AI is unavailable."""
+    snippets = [str(inter.get("data", ""))[:60] for inter in older[-8:]]
+    text = " ".join(filter(None, [previous, "Earlier: " + "; ".join(snippets)]))
+    return text[-MEMORY_SUMMARY_MAX_CHARS:]
+
+def apply_memory_summary(uid: str, until: str, summary: Optional[str], older: list):
+    """Replace interactions up to `until` (ISO timestamp) with the rolling summary."""
+    MEMORY_COMPACTION_PENDING.discard(uid)
+    mem = bot.db.get("memory", {}).get(uid)
+    if not mem:
+        return
+    previous = mem.get("summary", "")
+    if not summary or "SIGNAL LOST" in summary:
+        summary = fallback_memory_summary(previous, older)
+    interactions = mem.get("interactions", [])
+    kept = [inter for inter in interactions if str(inter.get("timestamp", "")) > until]
+    mem["summarized_count"] = mem.get("summarized_count", 0) + (len(interactions) - len(kept))
+    trim_memory_index(uid, len(interactions) - len(kept))
+    mem["interactions"] = kept
+    mem["summary"] = summary.strip()[:MEMORY_SUMMARY_MAX_CHARS]
+    invalidate_prompt_fragments(uid)
     save_data(bot.db)
 
 def check_data_health():
@@ -1578,156 +3459,261 @@ async def set_alert_level(level: int) -> bool:
         await log_error(f"set alert level: {str(e)}")
         return False
 
+def encode_overwrite_fields(fields: dict) -> str:
+    """Compact form of the NAS_RESTORE_FIELDS: one char per field, "1" allow, "0" deny, "-" inherit."""
+    return "".join("-" if fields.get(name) is None else ("1" if fields.get(name) else "0") for name in NAS_RESTORE_FIELDS)
+
+def decode_overwrite_fields(code: str) -> dict:
+    """Inverse of encode_overwrite_fields."""
+    return {name: None if char == "-" else char == "1" for name, char in zip(NAS_RESTORE_FIELDS, code)}
+
+def snapshot_channel(channel) -> dict:
+    """{role_id: {field: value}} for every role overwrite on the channel."""
+    return {
+        target.id: {name: getattr(overwrite, name) for name in NAS_RESTORE_FIELDS}
+        for target, overwrite in channel.overwrites.items()
+        if isinstance(target, discord.Role)
+    }
+
+def persist_permission_snapshot(active: bool = True) -> bool:
+    """Write ORIGINAL_PERMISSIONS to the active nas_permission_snapshots row (compact body)."""
+    if not NAS_SNAPSHOT:
+        return False
+    body = {
+        str(channel_id): {str(role_id): encode_overwrite_fields(fields) for role_id, fields in roles.items()}
+        for channel_id, roles in ORIGINAL_PERMISSIONS.items()
+    }
+    try:
+        response = supabase.table("nas_permission_snapshots").upsert({
+            **NAS_SNAPSHOT, "version": NAS_SNAPSHOT_VERSION, "active": active, "body": body
+        }).execute()
+        ensure_ok(response, "nas_permission_snapshots upsert")
+        return True
+    except Exception as e:
+        print(f"⚠️ NAS snapshot write failed: {e}")
+        return False
+
+async def load_permission_snapshot(guild: discord.Guild) -> bool:
+    """Restore the active snapshot for the guild after a restart. Returns True if one was loaded."""
+    global NAS_SNAPSHOT
+    if not guild:
+        return False
+    if NAS_SNAPSHOT and NAS_SNAPSHOT["guild_id"] == guild.id:
+        return True
+    try:
+        response = supabase.table("nas_permission_snapshots").select("*").eq("guild_id", guild.id).eq("active", True).order("captured_at", desc=True).limit(1).execute()
+        ensure_ok(response, "nas_permission_snapshots select")
+        if not response.data:
+            return False
+        row = response.data[0]
+        if row.get("version") != NAS_SNAPSHOT_VERSION:
+            await log_error(f"NAS snapshot {row.get('id')} has unsupported version {row.get('version')}")
+            return False
+        ORIGINAL_PERMISSIONS.clear()
+        for channel_id, roles in (row.get("body") or {}).items():
+            ORIGINAL_PERMISSIONS[int(channel_id)] = {int(role_id): decode_overwrite_fields(code) for role_id, code in roles.items()}
+        NAS_SNAPSHOT = {"id": row["id"], "guild_id": row["guild_id"], "captured_at": row["captured_at"]}
+        print(f"🛡️ NAS snapshot {row['id']} loaded ({len(ORIGINAL_PERMISSIONS)} channels)")
+        return True
+    except Exception as e:
+        await log_error(f"load NAS snapshot: {str(e)}")
+        return False
+
 async def store_original_permissions(guild: discord.Guild) -> bool:
-    """Backup all channel permissions before modification (for restoration)."""
+    """Backup all channel permissions before the first escalation from NAS-5; later escalations keep that snapshot."""
+    global NAS_SNAPSHOT
     try:
         if not guild:
             return False
         
-        ORIGINAL_PERMISSIONS.clear()
+        # Already engaged: re-snapshotting now would capture NAS overwrites as the "originals"
+        if await load_permission_snapshot(guild):
+            return True
         
+        ORIGINAL_PERMISSIONS.clear()
         for channel in guild.channels:
             # Skip system channels and bot channels
-            if channel.id == NAS_EXCEPTION_CHANNEL or channel.name.startswith("🤖"):
+            if nas_exempt(channel):
                 continue
-            
-            ORIGINAL_PERMISSIONS[channel.id] = {}
-            
-            # Store all role permission overwrites
-            for target, overwrite in channel.overwrites.items():
-                if isinstance(target, discord.Role):
-                    ORIGINAL_PERMISSIONS[channel.id][target.id] = {
-                        "send_messages": overwrite.send_messages,
-                        "embed_links": overwrite.embed_links,
-                        "attach_files": overwrite.attach_files,
-                        "view_channel": overwrite.view_channel,
-                        "read_message_history": overwrite.read_message_history
-                    }
+            ORIGINAL_PERMISSIONS[channel.id] = snapshot_channel(channel)
         
+        captured_at = int(time.time())
+        NAS_SNAPSHOT = {"id": f"{guild.id}:{captured_at}", "guild_id": guild.id, "captured_at": captured_at}
+        persist_permission_snapshot()
         return True
     except Exception as e:
         await log_error(f"store original permissions: {str(e)}")
         return False
 
-async def apply_nas_restrictions(guild: discord.Guild, level: int) -> int:
-    """Apply NAS restrictions to guild. Returns number of channels modified."""
+def update_permission_snapshot(before, after) -> bool:
+    """Fold staff edits made during an incident into the snapshot. Returns True if it changed.
+    
+    NAS only writes the @everyone message fields, so those keep their captured values; every other
+    role, and @everyone's view_channel, follow the channel's new overwrites.
+    """
+    if not NAS_SNAPSHOT or after.guild.id != NAS_SNAPSHOT["guild_id"] or after.id not in ORIGINAL_PERMISSIONS:
+        return False
+    if before.overwrites == after.overwrites:
+        return False
+    stored = ORIGINAL_PERMISSIONS[after.id]
+    current = snapshot_channel(after)
+    everyone_id = after.guild.default_role.id
+    managed = NAS_LEVEL_PERMISSIONS[1].keys()
+    updated = {}
+    for role_id, fields in current.items():
+        if role_id == everyone_id:
+            original = stored.get(role_id) or {name: None for name in NAS_RESTORE_FIELDS}
+            fields = {name: original.get(name) if name in managed else value for name, value in fields.items()}
+            if role_id not in stored and all(value is None for value in fields.values()):
+                continue
+        updated[role_id] = fields
+    if everyone_id in stored and everyone_id not in updated:
+        updated[everyone_id] = stored[everyone_id]
+    if updated == stored:
+        return False
+    ORIGINAL_PERMISSIONS[after.id] = updated
+    return True
+
+async def release_permission_snapshot():
+    """Mark the active snapshot restored (kept for history) and drop it from memory."""
+    global NAS_SNAPSHOT
+    if NAS_SNAPSHOT:
+        persist_permission_snapshot(active=False)
+    NAS_SNAPSHOT = None
+    ORIGINAL_PERMISSIONS.clear()
+
+def nas_exempt(channel) -> bool:
+    """System, bot ("🤖") and exception channels are never restricted."""
+    return channel.id == NAS_EXCEPTION_CHANNEL or channel.name.startswith("🤖")
+
+def merged_overwrite(channel, role, fields: dict) -> Optional[discord.PermissionOverwrite]:
+    """The role's current overwrite with `fields` applied, or None if it already matches (no edit needed)."""
+    current = channel.overwrites_for(role)
+    if all(getattr(current, name) == value for name, value in fields.items()):
+        return None
+    desired = discord.PermissionOverwrite(**dict(current))  # Keep unrelated fields (e.g. view_channel on private channels)
+    desired.update(**fields)
+    return desired
+
+def plan_nas_changes(guild: discord.Guild, level: int) -> list:
+    """[(channel, overwrite)] for @everyone on every non-exempt channel that doesn't already match `level`, categories first."""
+    fields = NAS_LEVEL_PERMISSIONS.get(level)
+    role = guild.default_role
+    if not fields or not role:
+        return []
+    plan = []
+    # Categories first so synced children are written to the same overwrite right after their parent
+    for channel in sorted(guild.channels, key=lambda c: not isinstance(c, discord.CategoryChannel)):
+        if nas_exempt(channel):
+            continue
+        overwrite = merged_overwrite(channel, role, fields)
+        if overwrite is not None:
+            plan.append((channel, overwrite))
+    return plan
+
+def plan_permission_restore(guild: discord.Guild) -> list:
+    """[(channel, overwrite)] returning @everyone to the stored originals, for channels that differ."""
+    role = guild.default_role
+    if not role:
+        return []
+    plan = []
+    for channel in guild.channels:
+        roles = ORIGINAL_PERMISSIONS.get(channel.id)
+        if roles is None:
+            continue
+        original = roles.get(role.id, {})  # No stored overwrite = @everyone inherited everything
+        overwrite = merged_overwrite(channel, role, {name: original.get(name) for name in NAS_RESTORE_FIELDS})
+        if overwrite is not None:
+            plan.append((channel, overwrite))
+    return plan
+
+async def execute_permission_plan(guild: discord.Guild, plan: list, progress=None) -> int:
+    """Apply planned @everyone overwrites with bounded parallelism, honouring 429 retry_after. Returns edits applied."""
+    role = guild.default_role
+    semaphore = asyncio.Semaphore(NAS_EDIT_CONCURRENCY)
+    state = {"done": 0, "applied": 0}
+    
+    async def edit(channel, overwrite):
+        async with semaphore:
+            for attempt in range(2):
+                wait = discord_rate_limit_remaining(discord_route(channel))
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    await channel.set_permissions(role, overwrite=overwrite, reason="NIMBROR ALERT SYSTEM")
+                    state["applied"] += 1
+                    break
+                except discord.Forbidden:
+                    await log_error(f"NAS: No permission to modify #{channel.name}")
+                    break
+                except discord.HTTPException as e:
+                    if e.status == 429 and attempt == 0:
+                        set_discord_rate_limited(True, e, discord_route(channel))
+                        continue
+                    await log_error(f"NAS modify channel {channel.id}: {str(e)}")
+                    break
+                except Exception as e:
+                    await log_error(f"NAS modify channel {channel.id}: {str(e)}")
+                    break
+            state["done"] += 1
+            if progress:
+                await progress(state["done"], len(plan))
+    
+    await asyncio.gather(*(edit(channel, overwrite) for channel, overwrite in plan))
+    return state["applied"]
+
+def nas_progress_reporter(interaction: discord.Interaction, label: str):
+    """Progress callback for execute_permission_plan: one ephemeral followup, edited at most every NAS_PROGRESS_INTERVAL."""
+    state = {"message": None, "last": 0.0}
+    
+    async def report(done: int, total: int):
+        now = time.time()
+        if done < total and now - state["last"] < NAS_PROGRESS_INTERVAL:
+            return
+        state["last"] = now
+        text = f"⏳ {label}: `{done}/{total}` channels updated"
+        try:
+            if state["message"] is None:
+                state["message"] = await interaction.followup.send(text, ephemeral=True, wait=True)
+            else:
+                await state["message"].edit(content=text)
+        except Exception as e:
+            print(f"⚠️ NAS progress update failed: {e}")
+    
+    return report
+
+async def apply_nas_restrictions(guild: discord.Guild, level: int, progress=None) -> int:
+    """Apply NAS restrictions to guild. Returns number of channels modified (already-matching channels are skipped)."""
     try:
         if not guild or level < 1 or level > 5:
             return 0
         
-        modified = 0
-        
-        # NAS-5: Normal operation (no restrictions)
+        # NAS-5: Normal operation (no restrictions) - replay the snapshot
         if level == 5:
-            return 0
-        
-        # Get member role (everyone)
-        member_role = guild.default_role
-        if not member_role:
-            return 0
-        
-        for channel in guild.channels:
-            # Skip system, bot, and exception channels
-            if channel.id == NAS_EXCEPTION_CHANNEL or channel.name.startswith("🤖"):
-                continue
-            
-            try:
-                # Allow delays between modifications to avoid rate limiting
-                await asyncio.sleep(0.3)
-                
-                # NAS-1: Total Containment (no messaging, no files, no embeds, no history)
-                if level == 1:
-                    await channel.set_permissions(
-                        member_role,
-                        send_messages=False,
-                        embed_links=False,
-                        attach_files=False,
-                        read_message_history=False
-                    )
-                    modified += 1
-                
-                # NAS-2: High Restriction (no files, no embeds, read-only)
-                elif level == 2:
-                    await channel.set_permissions(
-                        member_role,
-                        send_messages=False,
-                        embed_links=False,
-                        attach_files=False,
-                        read_message_history=True
-                    )
-                    modified += 1
-                
-                # NAS-3: Media Lock (no files, no embeds, except NAS_EXCEPTION_CHANNEL)
-                elif level == 3:
-                    await channel.set_permissions(
-                        member_role,
-                        send_messages=True,
-                        embed_links=False,
-                        attach_files=False,
-                        read_message_history=True
-                    )
-                    modified += 1
-                
-                # NAS-4: Minor Restriction (no files attached, embeds ok)
-                elif level == 4:
-                    await channel.set_permissions(
-                        member_role,
-                        send_messages=True,
-                        embed_links=True,
-                        attach_files=False,
-                        read_message_history=True
-                    )
-                    modified += 1
-            
-            except discord.Forbidden:
-                await log_error(f"NAS: No permission to modify #{channel.name}")
-                continue
-            except Exception as e:
-                await log_error(f"NAS modify channel {channel.id}: {str(e)}")
-                continue
-        
+            return await restore_permissions(guild, progress)
+        
+        started = time.time()
+        plan = plan_nas_changes(guild, level)
+        categories = sum(1 for channel, _ in plan if isinstance(channel, discord.CategoryChannel))
+        synced = sum(1 for channel, _ in plan if getattr(channel, "category", None) and getattr(channel, "permissions_synced", False))
+        modified = await execute_permission_plan(guild, plan, progress)
+        print(f"🛡️ NAS-{level}: {modified}/{len(plan)} planned edits applied ({categories} categories, {synced} synced children), "
+              f"{len(guild.channels) - len(plan)} channels already compliant or exempt ({time.time() - started:.1f}s)")
         return modified
     except Exception as e:
         await log_error(f"apply NAS restrictions: {str(e)}")
         return 0
 
-async def restore_permissions(guild: discord.Guild) -> int:
-    """Restore original permissions (set level to 5 = Normal)."""
+async def restore_permissions(guild: discord.Guild, progress=None) -> int:
+    """Restore original permissions (set level to 5 = Normal). Only channels that differ from the originals are edited."""
     try:
         if not guild:
             return 0
-        
-        restored = 0
-        
-        for channel in guild.channels:
-            if channel.id not in ORIGINAL_PERMISSIONS:
-                continue
-            
-            try:
-                await asyncio.sleep(0.3)
-                
-                # Get member role
-                member_role = guild.default_role
-                if not member_role:
-                    continue
-                
-                # Restore original permissions
-                perms_dict = ORIGINAL_PERMISSIONS[channel.id]
-                if member_role.id in perms_dict:
-                    orig = perms_dict[member_role.id]
-                    await channel.set_permissions(
-                        member_role,
-                        send_messages=orig.get("send_messages"),
-                        embed_links=orig.get("embed_links"),
-                        attach_files=orig.get("attach_files"),
-                        view_channel=orig.get("view_channel"),
-                        read_message_history=orig.get("read_message_history")
-                    )
-                    restored += 1
-            except Exception as e:
-                await log_error(f"restore permissions channel {channel.id}: {str(e)}")
-                continue
-        
+        await load_permission_snapshot(guild)
+        plan = plan_permission_restore(guild)
+        restored = await execute_permission_plan(guild, plan, progress)
+        if restored == len(plan):
+            await release_permission_snapshot()
         return restored
     except Exception as e:
         await log_error(f"restore permissions: {str(e)}")
@@ -2366,6 +4352,76 @@ CHAOS_PREGEN_MESSAGES = [
     "Spandrels: byproduct not adaptation.", "Exaptation: co-opted for new function.", "Pre-adaptation: preadaptation lucky.", "Evolutionary constraint: trapped by history.",
 ]
 
+QUEST_LINES = [
+    "🔮 The Ice Wall is CRACKING. Find out what's on the other side before they seal it.",
+    "👁️ Three people near you are NOT who they say they are. IDENTIFY THEM.",
+    "📡 We intercepted a signal. It's... unsettling. Decode it. I dare you.",
+    "🗝️ The key is right in front of you. Stop being blind.",
+    "🌑 You saw something on [REDACTED]. You know what I mean. Report it.",
+    "👻 Elvis left a voicemail. Listen. Tell me what you heard.",
+    "❄️ The Wall is moving. THEY'RE BUILDING SOMETHING. Find out what.",
+    "💀 A message was left in your area. Find it before THEY do."
+]
+
+PROPHECY_LINES = [
+    "🌑 Someone will betray the trust placed in them.",
+    "📈 The numbers will spike. Then crash.",
+    "🔮 A truth will surface, buried since the beginning.",
+    "⚠️ The Wall responds to observation. Be careful.",
+    "👁️ Three of you will leave. Only two will return.",
+    "💀 The missing data... it remembers.",
+    "🧿 Something sleeps beneath the surface. It's waking.",
+]
+
+DOSSIER_NOTES = [
+    "Subject exhibits irregular patterns.",
+]
+
+# === AI CONTENT POOL ===
+CONTENT_POOL_TTL = 6 * 3600  # Pre-generated lines expire after 6 hours
+CONTENT_POOL_TARGET = 20  # Ready lines kept per category
+CONTENT_POOL_BATCH = 8  # Lines requested per generation call
+CONTENT_POOL = {}  # {category: [(created_at, text), ...]} oldest first
+CONTENT_POOL_PROMPTS = {
+    "chaos": "Write {n} short alarming broadcast lines from a paranoid surveillance AI. Each under 15 words.",
+    "quest": "Write {n} cryptic one-sentence conspiracy quests ordering a citizen to investigate something (the Ice Wall, intercepted signals, Elvis, redacted sightings). Start each with one emoji.",
+    "prophecy": "Write {n} ominous one-sentence prophecies about a Discord server and its citizens. Start each with one emoji.",
+    "dossier": "Write {n} terse classified-file observations about a surveillance subject. Each under 8 words, no names.",
+}
+CONTENT_POOL_SYSTEM_PROMPT = (
+    "You are the Nimbror Watcher writing flavor text. "
+    "Output exactly one line per item, no numbering, no blank lines, no commentary."
+)
+
+def take_pooled_line(category: str, fallback: Optional[list] = None) -> Optional[str]:
+    """Serve one fresh pre-generated line (consumed), else a random fallback line (or None)."""
+    pool = CONTENT_POOL.get(category, [])
+    cutoff = time.time() - CONTENT_POOL_TTL
+    while pool:
+        created_at, text = pool.pop(0)
+        if created_at >= cutoff:
+            return text
+    return random.choice(fallback) if fallback else None
+
+def parse_pool_lines(text: str) -> list:
+    """Split AI output into clean flavor lines (strips numbering/bullets, drops failures)."""
+    if not text or "SIGNAL LOST" in text:
+        return []
+    lines = []
+    for raw in text.splitlines():
+        line = re.sub(r"^\s*(?:\d+[.)]|[-*•])\s*", "", raw).strip().strip('"')
+        if 3 < len(line) <= 200:
+            lines.append(line)
+    return lines
+
+def content_pool_status() -> str:
+    """Compact 'category: fresh count' summary for status views."""
+    cutoff = time.time() - CONTENT_POOL_TTL
+    return ", ".join(
+        f"{cat} {sum(1 for created_at, _ in CONTENT_POOL.get(cat, []) if created_at >= cutoff)}"
+        for cat in CONTENT_POOL_PROMPTS
+    )
+
 async def score_interview_answer(question: str, answer: str) -> int:
     """Use the concise AI to score an answer (0/1). Falls back to heuristics on failure."""
     prompt = (
@@ -2376,7 +4432,7 @@ async def score_interview_answer(question: str, answer: str) -> int:
         f"Question: {question}\nAnswer: {answer}"
     )
     try:
-        ai = await run_huggingface_concise(prompt)
+        ai = await ai_complete("scoring", prompt)
         if ai:
             cleaned = ai.strip()
             if cleaned.startswith("1"):
@@ -2391,6 +4447,59 @@ async def score_interview_answer(question: str, answer: str) -> int:
         return 1
     return 0
 
+# === BATCHED INTERVIEW SCORING ===
+INTERVIEW_SCORE_BATCH_SIZE = 10  # Q/A pairs packed into one scoring call (one full interview)
+
+def parse_score_vector(text: str, expected: int) -> Optional[list]:
+    """Parse a JSON array of 0/1 scores from AI output. Returns None if malformed or wrong length."""
+    if not text:
+        return None
+    match = re.search(r"\[[^\[\]]*\]", text)
+    if match:
+        try:
+            values = json.loads(match.group(0))
+        except (ValueError, TypeError):
+            values = None
+    else:
+        # Tolerate bare "1 0 1 ..." output
+        values = [int(v) for v in re.findall(r"\b[01]\b", text)]
+    if not isinstance(values, list) or len(values) != expected:
+        return None
+    scores = []
+    for v in values:
+        if v in (0, 1, "0", "1"):
+            scores.append(int(v))
+        else:
+            return None
+    return scores
+
+async def score_interview_answers_batch(pairs: list) -> list[int]:
+    """Score many (question, answer) pairs with one AI call per batch. Falls back to per-item scoring on malformed output."""
+    scores = []
+    for start in range(0, len(pairs), INTERVIEW_SCORE_BATCH_SIZE):
+        chunk = pairs[start:start + INTERVIEW_SCORE_BATCH_SIZE]
+        numbered = "\n".join(
+            f"{i}. Question: {q}\n   Answer: {(a or '')[:300]}" for i, (q, a) in enumerate(chunk, 1)
+        )
+        prompt = (
+            "You are the Nimbror Watcher evaluating interview answers. "
+            "Score each numbered answer 1 when it is clear, cooperative, respectful, relevant, and addresses the question directly (mention NSC when asked). "
+            "Score 0 for jokes, hostility, evasions, off-topic, or unsafe intent. "
+            f"Return only a JSON array of exactly {len(chunk)} digits (1 or 0) in order, e.g. [1, 0, 1]. No other text.\n"
+            f"{numbered}"
+        )
+        parsed = None
+        try:
+            ai = await ai_complete("scoring", prompt)
+            parsed = parse_score_vector(ai, len(chunk))
+        except Exception as e:
+            await log_error(f"score_interview_answers_batch: {str(e)}")
+        if parsed is None:
+            print(f"⚠️ Batch scoring output malformed, falling back to per-item scoring ({len(chunk)} answers)")
+            parsed = [await score_interview_answer(q, a) for q, a in chunk]
+        scores.extend(parsed)
+    return scores
+
 def safe_get_member(guild: discord.Guild, user_id_str: str) -> Optional[discord.Member]:
     """Safely retrieve guild member by string ID. Returns None if invalid or not found."""
     if not guild:
@@ -2863,100 +4972,6 @@ def clamp_response(text: str, max_chars: int = 500) -> str:
     return text
 
 # --- CONCISE AI MODE ---
-async def run_huggingface_concise(prompt: str) -> str:
-    """Call Groq API with strict constraints for ping replies. RATE LIMITED via semaphore."""
-    global LAST_AI_CALL
-    
-    # RATE LIMIT SAFETY: Use global semaphore to limit concurrent AI calls
-    async with AI_SEMAPHORE:
-        # === GLOBAL AI COOLDOWN (8 seconds) ===
-        now = time.time()
-        cooldown_remaining = GLOBAL_AI_COOLDOWN - (now - LAST_AI_CALL)
-        if cooldown_remaining > 0:
-            await asyncio.sleep(cooldown_remaining)
-        
-        LAST_AI_CALL = time.time()
-        
-        # === MAKE REQUEST WITH 429 HANDLING ===
-        for attempt in range(2):  # Max 1 retry (2 total attempts)
-            try:
-                loop = asyncio.get_running_loop()
-                def call():
-                    url = "https://api.groq.com/openai/v1/chat/completions"
-                    headers = {"Authorization": f"Bearer {AI_API_KEY}", "Content-Type": "application/json"}
-                    
-                    payload = {
-                        "model": "mixtral-8x7b-32768",  # Groq's fast model
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": (
-                                    "You are the Nimbror Watcher. Be unsettling, cryptic, and slightly threatening. "
-                                    "No friendliness. Speak like a paranoid surveillance AI. "
-                                    "Plain text only—no markdown, no emojis, no lists. "
-                                    "Keep it tight: 1-4 short sentences max."
-                                )
-                            },
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 120
-                    }
-                    response = requests.post(url, headers=headers, json=payload, timeout=60)
-                    
-                    # === 429 HANDLING ===
-                    if response.status_code == 429:
-                        raise requests.exceptions.HTTPError("429 Rate Limit", response=response)
-                    
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    # === JSON VALIDATION: Never assume "choices" exists ===
-                    if "choices" not in data or not data["choices"]:
-                        print(f"⚠️ AI response missing 'choices': {data}")
-                        return None
-                    
-                    return data["choices"][0]["message"]["content"].strip()
-                
-                result = await asyncio.wait_for(loop.run_in_executor(None, call), timeout=60)
-                
-                # If result is None (invalid JSON), treat as failure
-                if result is None:
-                    if attempt == 0:
-                        print("⚠️ Invalid AI response, retrying once...")
-                        await asyncio.sleep(25)
-                        continue
-                    else:
-                        return "[SIGNAL LOST]"
-                
-                return result
-            
-            except requests.exceptions.HTTPError as e:
-                if "429" in str(e):
-                    print(f"⚠️ OpenRouter 429 rate limit (attempt {attempt + 1}/2)")
-                    if attempt == 0:
-                        await asyncio.sleep(25)
-                        continue
-                    else:
-                        return "[SIGNAL LOST — RATE LIMITED]"
-                else:
-                    print(f"❌ AI HTTP error: {type(e).__name__}: {str(e)[:150]}")
-                    return "[SIGNAL LOST]"
-            
-            except asyncio.TimeoutError:
-                print(f"⚠️ AI timeout (attempt {attempt + 1}/2)")
-                if attempt == 0:
-                    await asyncio.sleep(5)
-                    continue
-                else:
-                    return "[SIGNAL LOST — TIMEOUT]"
-            
-            except Exception as e:
-                print(f"❌ AI error: {type(e).__name__}: {str(e)[:150]}")
-                return "[SIGNAL LOST]"
-        
-        return "[SIGNAL LOST]"
-
 # --- COMMANDS ---
 @bot.tree.command(name="help", description="List all Watcher commands")
 async def help_cmd(interaction: discord.Interaction):
@@ -3021,6 +5036,9 @@ async def help_cmd(interaction: discord.Interaction):
         "`/ad` — (Admin only) Start 10-minute Google ad campaign with paranoia theme\n"
         "`/stop` — Stop active spam or ads\n"
         "`/interview @user` — (Owner or Admin) Force an interview on a user\n"
+        "`/rescore [status] [limit] [apply]` — Bulk re-score interview review tickets\n"
+        "`/queue` — (Admin) AI queue depth, ETA and shed requests\n"
+        "`/aiusage [top]` — (Admin) AI token usage and top consumers today\n"
     )
     embed = create_embed(
         "Commands",
@@ -3247,17 +5265,22 @@ async def restart(interaction: discord.Interaction):
             GLOBAL_COMMAND_COOLDOWN.clear()
         elif i == 3:  # CLEARING stage
             LAST_MESSAGE_EDIT.clear()
-            ERROR_LOG_COOLDOWN.clear()
+            LOG_RECENT_ERRORS.clear()
             # Clear AI queue
             if AI_REQUEST_QUEUE:
                 while not AI_REQUEST_QUEUE.empty():
                     try:
-                        AI_REQUEST_QUEUE.get_nowait()
+                        unindex_message(AI_REQUEST_QUEUE.get_nowait().get("placeholder_message_id"))
                     except:
                         break
+            MEMORY_COMPACTION_PENDING.clear()
+            journal_clear()
         elif i == 4:  # REINIT stage
             # Reload bot data from Supabase
             bot.db = load_data()
+            rebuild_message_index(bot.db)
+            invalidate_prompt_fragments()
+            drop_memory_index()
     
     await asyncio.sleep(0.3)
     final_embed = discord.Embed(
@@ -3314,8 +5337,15 @@ async def emergency_shutdown(interaction: discord.Interaction):
     except Exception as e:
         await log_error(f"shutdown notify: {e}")
 
-    # Terminate bot and process
+    # Terminate bot and process (post buffered logs first)
     try:
+        await flush_log_sink()
+        saving = persist_ai_usage()
+        if saving:
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(saving), timeout=5)
+            except Exception as e:
+                print(f"⚠️ AI usage save on shutdown failed: {e}")
         await bot.close()
     finally:
         os._exit(0)
@@ -3371,7 +5401,7 @@ class NASControlPanel(discord.ui.View):
         await store_original_permissions(interaction.guild)
         
         # Apply NAS-1
-        modified = await apply_nas_restrictions(interaction.guild, 1)
+        modified = await apply_nas_restrictions(interaction.guild, 1, nas_progress_reporter(interaction, "Applying NAS-1"))
         await set_alert_level(1)
         
         # Send announcement
@@ -3387,7 +5417,7 @@ class NASControlPanel(discord.ui.View):
                 embed.add_field(name="Modified Channels", value=f"{modified}", inline=True)
                 embed.add_field(name="Triggered By", value=interaction.user.mention, inline=True)
                 embed.set_footer(text="NIMBROR ALERT SYSTEM")
-                await ann_ch.send(embed=embed)
+                await dispatch_send(ann_ch, DISPATCH_CRITICAL, embed=embed)
         
         await interaction.followup.send(f"✅ NAS-1 activated. {modified} channels modified.", ephemeral=True)
     
@@ -3453,7 +5483,7 @@ class NASControlPanel(discord.ui.View):
         
         # Backup and apply
         await store_original_permissions(interaction.guild)
-        modified = await apply_nas_restrictions(interaction.guild, new_level)
+        modified = await apply_nas_restrictions(interaction.guild, new_level, nas_progress_reporter(interaction, f"Applying NAS-{new_level}"))
         await set_alert_level(new_level)
         
         # Send announcement
@@ -3469,7 +5499,7 @@ class NASControlPanel(discord.ui.View):
                 embed.add_field(name="Previous Level", value=f"NAS-{current}", inline=True)
                 embed.add_field(name="New Level", value=f"NAS-{new_level}", inline=True)
                 embed.set_footer(text="NIMBROR ALERT SYSTEM")
-                await ann_ch.send(embed=embed)
+                await dispatch_send(ann_ch, DISPATCH_CRITICAL, embed=embed)
         
         await interaction.followup.send(f"✅ Escalated to NAS-{new_level}. {modified} channels modified.", ephemeral=True)
     
@@ -3496,7 +5526,7 @@ class NASControlPanel(discord.ui.View):
         
         # Backup and apply
         await store_original_permissions(interaction.guild)
-        modified = await apply_nas_restrictions(interaction.guild, new_level)
+        modified = await apply_nas_restrictions(interaction.guild, new_level, nas_progress_reporter(interaction, f"Applying NAS-{new_level}"))
         await set_alert_level(new_level)
         
         # Send announcement
@@ -3512,7 +5542,7 @@ class NASControlPanel(discord.ui.View):
                 embed.add_field(name="Previous Level", value=f"NAS-{current}", inline=True)
                 embed.add_field(name="New Level", value=f"NAS-{new_level}", inline=True)
                 embed.set_footer(text="NIMBROR ALERT SYSTEM")
-                await ann_ch.send(embed=embed)
+                await dispatch_send(ann_ch, DISPATCH_CRITICAL, embed=embed)
         
         await interaction.followup.send(f"✅ De-escalated to NAS-{new_level}. {modified} channels modified.", ephemeral=True)
     
@@ -3536,7 +5566,7 @@ class NASControlPanel(discord.ui.View):
             return
         
         # Restore permissions
-        restored = await restore_permissions(interaction.guild)
+        restored = await restore_permissions(interaction.guild, nas_progress_reporter(interaction, "Restoring permissions"))
         await set_alert_level(5)
         
         # Send announcement
@@ -3552,7 +5582,7 @@ class NASControlPanel(discord.ui.View):
                 embed.add_field(name="Restored Channels", value=f"{restored}", inline=True)
                 embed.add_field(name="Triggered By", value=interaction.user.mention, inline=True)
                 embed.set_footer(text="NIMBROR ALERT SYSTEM")
-                await ann_ch.send(embed=embed)
+                await dispatch_send(ann_ch, DISPATCH_CRITICAL, embed=embed)
         
         await interaction.followup.send(f"✅ NAS-5 (Normal) restored. {restored} channels restored.", ephemeral=True)
 
@@ -3588,7 +5618,7 @@ async def alertlevel(interaction: discord.Interaction, level: int):
     
     # Backup and apply restrictions
     await store_original_permissions(interaction.guild)
-    modified = await apply_nas_restrictions(interaction.guild, level)
+    modified = await apply_nas_restrictions(interaction.guild, level, nas_progress_reporter(interaction, f"Applying NAS-{level}"))
     await set_alert_level(level)
     
     # Send announcement
@@ -3607,7 +5637,7 @@ async def alertlevel(interaction: discord.Interaction, level: int):
             embed.add_field(name="Channels Modified", value=str(modified), inline=True)
             embed.add_field(name="Set By", value=interaction.user.mention, inline=False)
             embed.set_footer(text="NIMBROR ALERT SYSTEM")
-            await ann_ch.send(embed=embed)
+            await dispatch_send(ann_ch, DISPATCH_CRITICAL, embed=embed)
     
     # Send control panel to staff
     if STAFF_CHANNEL_ID:
@@ -3712,22 +5742,23 @@ async def spam(interaction: discord.Interaction, user: discord.Member, message:
                     print(f"⚠️ Spam stopped: {user} left server")
                     break
                 
-                if check_discord_rate_limit():  # Discord rate-limited
-                    print(f"⚠️ Spam stopped: Discord rate-limited")
-                    break
+                wait = discord_rate_limit_remaining(discord_route(channel))
+                if wait > 0:  # Discord rate-limited: wait out this route only
+                    await asyncio.sleep(wait)
                 
                 # Send message
                 try:
-                    await channel.send(
-                        f"{user.mention} {message}",
+                    sent = await dispatch_send(
+                        channel, DISPATCH_BULK,
+                        content=f"{user.mention} {message}",
                         allowed_mentions=discord.AllowedMentions(users=[user])
                     )
-                    bot.active_spam_count += 1
+                    if sent:
+                        bot.active_spam_count += 1
                 except discord.HTTPException as e:
                     if e.status == 429:
-                        set_discord_rate_limited(True)
-                        print(f"❌ Spam stopped: HTTP 429")
-                        break
+                        await asyncio.sleep(set_discord_rate_limited(True, e, discord_route(channel)))
+                        continue
                     elif e.status == 403:
                         print(f"⚠️ Spam stopped: Missing permissions")
                         break
@@ -3865,7 +5896,7 @@ async def ad_campaign(interaction: discord.Interaction):
                 if bot.active_ad_channel:
                     try:
                         ad = random.choice(GOOGLE_ADS)
-                        await bot.active_ad_channel.send(ad)
+                        await dispatch_send(bot.active_ad_channel, DISPATCH_BULK, content=ad)
                         bot.active_ad_count += 1
                         ad_message_count += 1
                         
@@ -3874,12 +5905,10 @@ async def ad_campaign(interaction: discord.Interaction):
                             disclosure = "I WAS PAID BY GOOGLE LLC TO SAY THIS"
                             emojis = "🔍📧☁️📱🎬🗺️💳🎤🖼️📰🎮📊🔐🌐🔔🎯📍🔊💬🌟⌚🏠📡🛒🌍🎨📚🔬🎵"
                             random_emojis = "".join(random.choices(emojis, k=25))
-                            await bot.active_ad_channel.send(f"**{disclosure}**\n{random_emojis}")
+                            await dispatch_send(bot.active_ad_channel, DISPATCH_BULK, content=f"**{disclosure}**\n{random_emojis}")
                     except discord.HTTPException as e:
                         if e.status == 429:
-                            set_discord_rate_limited(True)
-                            print(f"❌ Ad campaign stopped: HTTP 429")
-                            break
+                            await asyncio.sleep(set_discord_rate_limited(True, e, discord_route(bot.active_ad_channel)))
                         else:
                             print(f"⚠️ Ad send error: {e}")
                     except Exception as e:
@@ -3951,16 +5980,16 @@ async def start_chaos_broadcast(channel: discord.abc.Messageable, initiator: dis
 
     bot.active_chaos_channel = channel
     bot.active_chaos_count = 0
-    bot.last_chaos_ai = 0
 
     async def chaos_loop():
         try:
             while True:
                 await asyncio.sleep(random.uniform(0.5, 1.5))
 
-                # Back off if Discord rate-limited
-                if check_discord_rate_limit():
-                    await asyncio.sleep(15)
+                # Back off (exactly as long as Discord asked) if globally rate-limited
+                wait = discord_rate_limit_remaining()
+                if wait > 0:
+                    await asyncio.sleep(wait)
                     continue
 
                 content = None
@@ -3972,48 +6001,36 @@ async def start_chaos_broadcast(channel: discord.abc.Messageable, initiator: dis
                 ch = bot.active_chaos_channel
                 guild = ch.guild if hasattr(ch, "guild") else None
                 
-                if guild:
-                    # Get all non-bot members who haven't opted out
-                    candidates = [m for m in guild.members if not m.bot and m.id not in bot.chaos_optout]
-                    if candidates and random.random() < 0.55:
-                        target = random.choice(candidates)
+                if guild and random.random() < 0.55:
+                    # Random non-bot member who hasn't opted out
+                    target = sample_member(guild, honour_optout=True)
+                    if target:
                         allowed = discord.AllowedMentions(everyone=False, users=[target], roles=False)
 
                 roll = random.random()
-                now = time.time()
 
                 if roll < 0.35:
                     content = random.choice(GOOGLE_ADS)
                 elif roll < 0.7:
                     content = random.choice(CHAOS_PREGEN_MESSAGES)
                 else:
-                    if now - bot.last_chaos_ai >= 15:
-                        try:
-                            ai_line = await run_huggingface_concise(
-                                "You are the Watcher. Emit one short alarming broadcast line. Keep it under 15 words."
-                            )
-                            if ai_line:
-                                content = f"🤖 {ai_line.strip()}"
-                                bot.last_chaos_ai = now
-                        except Exception as e:
-                            await log_error(f"chaos ai: {e}")
-                    if not content:
-                        content = random.choice(CHAOS_PREGEN_MESSAGES)
+                    # Pre-generated AI line (never waits on the provider)
+                    ai_line = take_pooled_line("chaos")
+                    content = f"🤖 {ai_line}" if ai_line else random.choice(CHAOS_PREGEN_MESSAGES)
 
                 # Add user mention if target was selected
                 if target:
                     content = f"{target.mention} {content}"
 
                 try:
-                    await ch.send(content, allowed_mentions=allowed)
-                    bot.active_chaos_count += 1
+                    if await dispatch_send(ch, DISPATCH_BULK, content=content, allowed_mentions=allowed):
+                        bot.active_chaos_count += 1
                 except discord.Forbidden as e:
                     await log_error(f"chaos permission denied: {e}")
                     await asyncio.sleep(5)
                 except discord.HTTPException as e:
                     if e.status == 429:
-                        set_discord_rate_limited(True)
-                        await asyncio.sleep(30)
+                        await asyncio.sleep(set_discord_rate_limited(True, e, discord_route(ch)))
                     else:
                         await log_error(f"chaos http error: {e}")
                         await asyncio.sleep(3)
@@ -4029,8 +6046,7 @@ async def start_chaos_broadcast(channel: discord.abc.Messageable, initiator: dis
             bot.active_chaos_task = None
             bot.active_chaos_channel = None
             bot.active_chaos_count = 0
-            bot.last_chaos_ai = 0
-            bot.chaos_optout.clear()  # Clear optout list when chaos ends
+            clear_chaos_optout()  # Clear optout list when chaos ends
             bot.chaos_notified.clear()  # Clear notification tracking
 
     bot.active_chaos_task = asyncio.create_task(chaos_loop())
@@ -4050,14 +6066,14 @@ async def start_target_chaos_broadcast(channel: discord.TextChannel, target_user
             while True:
                 await asyncio.sleep(random.uniform(0.5, 1.5))
 
-                # Back off if Discord rate-limited
-                if check_discord_rate_limit():
-                    await asyncio.sleep(15)
+                # Back off (exactly as long as Discord asked) if globally rate-limited
+                wait = discord_rate_limit_remaining()
+                if wait > 0:
+                    await asyncio.sleep(wait)
                     continue
 
                 content = None
                 roll = random.random()
-                now = time.time()
 
                 # Pick content type
                 if roll < 0.35:
@@ -4065,14 +6081,10 @@ async def start_target_chaos_broadcast(channel: discord.TextChannel, target_user
                 elif roll < 0.7:
                     content = random.choice(CHAOS_PREGEN_MESSAGES)
                 else:
-                    try:
-                        ai_line = await run_huggingface_concise(
-                            f"You are targeting {target_user.name}. Emit one short, personalized alarming message. Keep it under 15 words."
-                        )
-                        if ai_line and "SIGNAL LOST" not in ai_line:
-                            content = f"🤖 {ai_line.strip()}"
-                    except Exception as e:
-                        await log_error(f"target chaos ai: {e}")
+                    # Pre-generated AI line (the channel copy already mentions the target)
+                    ai_line = take_pooled_line("chaos")
+                    if ai_line:
+                        content = f"🤖 {ai_line}"
                 
                 if not content:
                     content = random.choice(CHAOS_PREGEN_MESSAGES)
@@ -4080,13 +6092,13 @@ async def start_target_chaos_broadcast(channel: discord.TextChannel, target_user
                 # Send to channel with mention
                 channel_content = f"{target_user.mention} {content}"
                 try:
-                    await channel.send(channel_content, allowed_mentions=discord.AllowedMentions(everyone=False, users=[target_user], roles=False))
-                    bot.target_chaos_count += 1
+                    if await dispatch_send(channel, DISPATCH_BULK, content=channel_content, allowed_mentions=discord.AllowedMentions(everyone=False, users=[target_user], roles=False)):
+                        bot.target_chaos_count += 1
                 except discord.Forbidden:
                     await asyncio.sleep(5)
                 except discord.HTTPException as e:
                     if e.status == 429:
-                        await asyncio.sleep(30)
+                        await asyncio.sleep(set_discord_rate_limited(True, e, discord_route(channel)))
                     else:
                         await log_error(f"target chaos http error: {e}")
                         await asyncio.sleep(3)
@@ -4097,7 +6109,7 @@ async def start_target_chaos_broadcast(channel: discord.TextChannel, target_user
                 # Also try to DM the user
                 try:
                     dm_content = content
-                    await target_user.send(dm_content)
+                    await dispatch_send(target_user, DISPATCH_BULK, content=dm_content)
                 except (discord.Forbidden, discord.HTTPException):
                     # DMs might be disabled, that's ok
                     pass
@@ -4145,7 +6157,7 @@ async def chaos(interaction: discord.Interaction):
             return
     
     # Reset optout and notification tracking for new chaos session
-    bot.chaos_optout.clear()
+    clear_chaos_optout()
     bot.chaos_notified.clear()
 
     # Already running?
@@ -4193,7 +6205,7 @@ async def optout(interaction: discord.Interaction):
         return
     
     # Add to optout set
-    bot.chaos_optout.add(user_id)
+    set_chaos_optout(user_id)
     await interaction.response.send_message(
         embed=create_embed(
             "✅ Opted Out", 
@@ -4405,10 +6417,106 @@ async def force_interview(interaction: discord.Interaction, user: discord.User):
             ephemeral=True
         )
 
-@bot.tree.command(name="notes", description="View staff notes for a user")
-@app_commands.checks.has_permissions(manage_messages=True)
-async def notes(interaction: discord.Interaction, user: discord.User):
-    """View all staff notes for a user's ticket."""
+@bot.tree.command(name="rescore", description="[ADMIN] Bulk re-score interview review tickets")
+@app_commands.describe(
+    status="Review ticket status to re-score (default OPEN)",
+    limit="Max tickets to re-score (1-50)",
+    apply="Write new scores back to Supabase"
+)
+async def rescore(interaction: discord.Interaction, status: str = "OPEN", limit: int = 20, apply: bool = False):
+    """Re-score historical interview answers through the batched scorer."""
+    owner_id = 765028951541940225
+    is_owner = interaction.user.id == owner_id
+    is_admin = getattr(interaction.user, "guild_permissions", None) and interaction.user.guild_permissions.administrator
+    if not (is_owner or is_admin):
+        await interaction.response.send_message(
+            embed=create_embed("❌ Access Denied", "Administrator permission required.", color=EMBED_COLORS["error"]),
+            ephemeral=True
+        )
+        return
+
+    limit = max(1, min(limit, 50))
+    await interaction.response.defer(ephemeral=True)
+    try:
+        response = supabase.table("review_tickets").select("*").eq("status", status.upper()).order("created_at", desc=True).limit(limit).execute()
+        ensure_ok(response, "review_tickets select")
+        tickets = response.data or []
+    except Exception as e:
+        await log_error(f"rescore select: {str(e)}")
+        await interaction.followup.send(
+            embed=create_embed("❌ Rescore Failed", f"Could not load review tickets: {str(e)[:100]}", color=EMBED_COLORS["error"]),
+            ephemeral=True
+        )
+        return
+
+    if not tickets:
+        await interaction.followup.send(
+            embed=create_embed("📭 Nothing To Rescore", f"No `{status.upper()}` review tickets found.", color=EMBED_COLORS["neutral"]),
+            ephemeral=True
+        )
+        return
+
+    # Flatten every ticket's answers into one list so batches span tickets
+    pairs = []
+    spans = []
+    for t in tickets:
+        answers = coerce_list(t.get("answers"))[:len(INTERVIEW_QUESTIONS)]
+        spans.append((len(pairs), len(answers)))
+        pairs.extend(zip(INTERVIEW_QUESTIONS, [str(a) for a in answers]))
+
+    started = time.time()
+    scores = await score_interview_answers_batch(pairs)
+    elapsed = time.time() - started
+
+    def band(score: int) -> str:
+        if score <= 4:
+            return "FAIL"
+        if score <= 6:
+            return "REVIEW"
+        return "PASS"
+
+    lines = []
+    changed = 0
+    band_changes = 0
+    write_failures = 0
+    for t, (offset, count) in zip(tickets, spans):
+        new_score = sum(scores[offset:offset + count])
+        old_score = t.get("score", 0) or 0
+        if new_score != old_score:
+            changed += 1
+            if apply:
+                try:
+                    upd = supabase.table("review_tickets").update({"score": new_score}).eq("session_id", t.get("session_id")).execute()
+                    ensure_ok(upd, "review_tickets update")
+                except Exception as e:
+                    write_failures += 1
+                    await log_error(f"rescore update [session={t.get('session_id')}]: {str(e)}")
+        marker = "→" if new_score != old_score else "="
+        # Band moved (e.g. REVIEW -> PASS): the ticket/session status is a staff decision, so only flag it
+        flag = ""
+        if band(new_score) != band(old_score):
+            band_changes += 1
+            flag = f" ⚠️ was {band(old_score)}, status `{t.get('status', status.upper())}` unchanged"
+        lines.append(f"<@{t.get('user_id')}> `{old_score}` {marker} `{new_score}` ({band(new_score)}){flag}")
+
+    calls = (len(pairs) + INTERVIEW_SCORE_BATCH_SIZE - 1) // INTERVIEW_SCORE_BATCH_SIZE
+    summary = (
+        f"**Tickets:** {len(tickets)} • **Answers:** {len(pairs)} • **Batches:** {calls}\n"
+        f"**Changed:** {changed} • **Applied:** {'yes (scores only)' if apply else 'no (dry run)'}"
+        f"{f' • **Write failures:** {write_failures}' if write_failures else ''}\n"
+        f"**Band changes:** {band_changes} • Ticket and interview statuses are not changed by a rescore; "
+        f"resolve flagged tickets through review.\n"
+        f"**Time:** {elapsed:.1f}s\n\n" + "\n".join(lines)
+    )
+    await interaction.followup.send(
+        embed=create_embed("🧮 INTERVIEW RESCORE", summary[:4000], color=EMBED_COLORS["info"]),
+        ephemeral=True
+    )
+
+@bot.tree.command(name="notes", description="View staff notes for a user")
+@app_commands.checks.has_permissions(manage_messages=True)
+async def notes(interaction: discord.Interaction, user: discord.User):
+    """View all staff notes for a user's ticket."""
     try:
         uid = str(user.id)
         ticket = bot.db.get("tickets", {}).get(uid, {})
@@ -4455,6 +6563,9 @@ async def memory(interaction: discord.Interaction, action: str, user: Optional[d
             for inter in interactions[-5:]:  # Show last 5
                 memory_text += f"- {inter['data']}\n"
             
+            if user_memory.get("summary"):
+                memory_text += f"\n**Summary ({user_memory.get('summarized_count', 0)} folded):**\n{user_memory['summary']}\n"
+            
             memory_text += f"\n**Preferences ({len(preferences)}):**\n"
             for pref in preferences:
                 memory_text += f"- {pref}\n"
@@ -4470,6 +6581,8 @@ async def memory(interaction: discord.Interaction, action: str, user: Optional[d
             uid = str(user.id)
             if uid in bot.db.get("memory", {}):
                 bot.db["memory"].pop(uid)
+                invalidate_prompt_fragments(uid)
+                drop_memory_index(uid)
                 save_data(bot.db)
                 await interaction.response.send_message(f"✅ Memory cleared for {user.mention}.", ephemeral=True)
             else:
@@ -4627,11 +6740,26 @@ async def status(interaction: discord.Interaction):
         f"• {event_status}\n\n"
         f"**System Status:** {system_status}\n"
         f"**Corruption:** {corruption_text}\n\n"
+        f"**AI Provider:**\n"
+        f"• Providers:\n  {ai_breaker_status()}\n"
+        f"• Queue: `{AI_REQUEST_QUEUE.qsize() if AI_REQUEST_QUEUE else 0}` pending • "
+        f"Coalesced: `{AI_COALESCE_STATS['joined']}` • "
+        f"Duplicates blocked: `{DUPLICATE_STATS['user'] + DUPLICATE_STATS['channel']}`\n"
+        f"• Usage: {ai_usage_status()}\n"
+        f"• Profiles: {ai_profile_status()}\n\n"
+        f"**Outbound:** {outbound_status()}\n"
+        f"**Message handlers:** {message_pipeline_status()}\n"
+        f"**Log sink:** `{sum(len(b) for b in LOG_BUFFERS.values())}` buffered • "
+        f"`{LOG_SINK_STATS['embeds']}` embeds in `{LOG_SINK_STATS['messages']}` messages • `{LOG_SINK_STATS['deduped']}` deduped • "
+        f"`{LOG_SINK_STATS['overflowed']}` folded • `{LOG_SINK_STATS['dropped']}` given up\n\n"
         f"**Active Systems:**\n"
         f"• Tickets: `{len(bot.db.get('tickets', {}))}` active\n"
         f"• Memory: `{len(bot.db.get('memory', {}))}` records\n"
         f"• Interviews: `{len(bot.db.get('interviews', {}))}` pending\n"
-        f"• Citizens: `{len(bot.db.get('social_credit', {}))}` tracked"
+        f"• Citizens: `{len(bot.db.get('social_credit', {}))}` tracked\n"
+        f"• Prompt tokens: `{PROMPT_STATS['last_tokens']}` last / "
+        f"`{PROMPT_STATS['total_tokens'] // max(PROMPT_STATS['builds'], 1)}` avg / `{AI_PROMPT_TOKEN_BUDGET}` budget\n"
+        f"• Content pool: {content_pool_status()}"
     )
     
     # Apply corruption effect to description if active
@@ -4641,6 +6769,77 @@ async def status(interaction: discord.Interaction):
     embed = create_embed("📡 WATCHER SYSTEM STATUS", description, color=desc_color)
     await interaction.response.send_message(embed=embed)
 
+@bot.tree.command(name="queue", description="[ADMIN] AI request queue depth, ETA and shedding")
+async def queue_view(interaction: discord.Interaction):
+    """Show AI queue depth per context, oldest request age, service rate and admission counters."""
+    owner_id = 765028951541940225
+    is_owner = interaction.user.id == owner_id
+    is_admin = getattr(interaction.user, "guild_permissions", None) and interaction.user.guild_permissions.administrator
+    if not (is_owner or is_admin):
+        await interaction.response.send_message(
+            embed=create_embed("❌ Access Denied", "Administrator permission required.", color=EMBED_COLORS["error"]),
+            ephemeral=True
+        )
+        return
+
+    pending = AI_REQUEST_QUEUE.requests() if AI_REQUEST_QUEUE else []
+    now = time.time()
+    by_context = Counter(r.get("context", "unknown") for r in pending)
+    oldest = max((now - r.get("created_at", now) for r in pending), default=0)
+    service = average_service_time()
+    contexts = ", ".join(f"`{c}`: {n}" for c, n in by_context.most_common()) or "none"
+    description = (
+        f"**Depth:** `{len(pending)}` / `{AI_QUEUE_MAX_SIZE}`"
+        f"{' • processing' if AI_QUEUE_PROCESSOR_RUNNING else ''}\n"
+        f"**By context:** {contexts}\n"
+        f"**Oldest:** `{int(oldest)}s` (deadline `{AI_REQUEST_MAX_AGE}s`)\n"
+        f"**Service:** `{service:.1f}s`/request (~`{60 / max(service, 0.1):.1f}`/min, {len(AI_SERVICE_TIMES)} samples)\n"
+        f"**ETA:** ticket `{int(estimate_queue_wait(AI_CONTEXT_PRIORITY['ticket']))}s` • "
+        f"mention `{int(estimate_queue_wait(AI_CONTEXT_PRIORITY['mention']))}s`\n"
+        f"**Completed:** `{AI_QUEUE_STATS['completed']}` • **Rejected:** `{AI_QUEUE_STATS['rejected']}` • "
+        f"**Shed:** `{AI_QUEUE_STATS['shed']}` • **Stale:** `{AI_QUEUE_STATS['stale']}`"
+    )
+    color = EMBED_COLORS["warning"] if oldest > AI_REQUEST_MAX_AGE / 2 else EMBED_COLORS["info"]
+    await interaction.response.send_message(embed=create_embed("🧮 AI QUEUE", description, color=color), ephemeral=True)
+
+@bot.tree.command(name="aiusage", description="[ADMIN] AI token usage and top consumers today")
+@app_commands.describe(top="How many top users/channels to list (1-15)")
+async def aiusage(interaction: discord.Interaction, top: int = 5):
+    """Show today's AI token usage by user, channel and context, plus recent daily totals."""
+    owner_id = 765028951541940225
+    is_owner = interaction.user.id == owner_id
+    is_admin = getattr(interaction.user, "guild_permissions", None) and interaction.user.guild_permissions.administrator
+    if not (is_owner or is_admin):
+        await interaction.response.send_message(
+            embed=create_embed("❌ Access Denied", "Administrator permission required.", color=EMBED_COLORS["error"]),
+            ephemeral=True
+        )
+        return
+
+    top = max(1, min(top, 15))
+    rollover_ai_usage()
+    users = sorted(AI_USAGE["users"].items(), key=lambda item: item[1]["tokens"], reverse=True)[:top]
+    user_quota = f" / {AI_USER_DAILY_TOKEN_QUOTA}" if AI_USER_DAILY_TOKEN_QUOTA else ""
+    user_lines = "\n".join(
+        f"{'`system`' if not uid else f'<@{uid}>'} — `{u['tokens']}`{user_quota} ({u['requests']} calls)"
+        for uid, u in users
+    ) or "No usage yet."
+    channel_lines = ", ".join(f"<#{cid}> `{n}`" for cid, n in AI_USAGE["channels"].most_common(top)) or "none"
+    context_lines = ", ".join(f"`{c}`: {n}" for c, n in AI_USAGE["contexts"].most_common()) or "none"
+    provider_lines = ", ".join(f"`{p}`: {n}" for p, n in AI_USAGE["providers"].most_common()) or "none"
+    history = " • ".join(f"{h['day'][5:]}: `{h['total']}`" for h in list(AI_USAGE_HISTORY)[-7:]) or "none"
+    description = (
+        f"**Today ({AI_USAGE['day']} UTC):** {ai_usage_status()}\n"
+        f"Estimated (no provider usage): `{AI_USAGE['estimated']}` • "
+        f"Resets in `{seconds_until_usage_reset() // 3600}h {seconds_until_usage_reset() % 3600 // 60}m`\n\n"
+        f"**Top users:**\n{user_lines}\n\n"
+        f"**Top channels:** {channel_lines}\n"
+        f"**By context:** {context_lines}\n"
+        f"**By provider:** {provider_lines}\n\n"
+        f"**Previous days:** {history}"
+    )
+    await interaction.response.send_message(embed=create_embed("📊 AI TOKEN USAGE", description, color=EMBED_COLORS["info"]), ephemeral=True)
+
 @bot.tree.command(name="uptime", description="Check bot process uptime and reconnect count")
 async def uptime(interaction: discord.Interaction):
     """Show current process uptime and reconnect count."""
@@ -4674,16 +6873,7 @@ async def pingwatcher(interaction: discord.Interaction):
 @bot.tree.command(name="prophecy", description="Receive a prophecy")
 async def prophecy(interaction: discord.Interaction):
     """Get an ominous prediction from the Watcher."""
-    prophecies = [
-        "🌑 Someone will betray the trust placed in them.",
-        "📈 The numbers will spike. Then crash.",
-        "🔮 A truth will surface, buried since the beginning.",
-        "⚠️ The Wall responds to observation. Be careful.",
-        "👁️ Three of you will leave. Only two will return.",
-        "💀 The missing data... it remembers.",
-        "🧿 Something sleeps beneath the surface. It's waking.",
-    ]
-    embed = create_embed("🔮 PROPHECY", random.choice(prophecies), color=0x9900ff)
+    embed = create_embed("🔮 PROPHECY", take_pooled_line("prophecy", PROPHECY_LINES), color=0x9900ff)
     await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(name="shop", description="Browse and purchase items")
@@ -5090,7 +7280,7 @@ async def dossier(interaction: discord.Interaction, user: discord.User):
     redacted_notes = [
         f"Interaction count: {len(memory.get('interactions', []))} (MONITORING)",
         "██████████ [CLASSIFIED]",
-        "Subject exhibits irregular patterns.",
+        take_pooled_line("dossier", DOSSIER_NOTES)[:60],
         "██████████ [REDACTED]",
         "Compliance rating: QUESTIONABLE",
     ]
@@ -5255,6 +7445,7 @@ async def trial(interaction: discord.Interaction):
     # Store message ID for reaction tracking
     msg = await interaction.original_response()
     bot.db["trials"][trial_id]["message_id"] = msg.id
+    index_message(msg.id, "trial", trial_id)
     save_data(bot.db)
     
     # Add emoji reactions
@@ -5299,6 +7490,7 @@ async def task(interaction: discord.Interaction):
         msg = await interaction.original_response()
         bot.db["tasks"][task_id]["message_id"] = msg.id
         bot.db["tasks"][task_id]["channel_id"] = msg.channel.id if hasattr(msg, "channel") else None
+        index_message(msg.id, "task", task_id)
         save_data(bot.db)
     except Exception:
         pass
@@ -5311,22 +7503,11 @@ async def questforce(interaction: discord.Interaction):
     if not guild:
         await interaction.followup.send("❌ No guild context.", ephemeral=True)
         return
-    members = [m for m in guild.members if not m.bot]
-    if not members:
+    quest_user = sample_member(guild)
+    if not quest_user:
         await interaction.followup.send("❌ No eligible members found.", ephemeral=True)
         return
-    quest_user = random.choice(members)
-    quests = [
-        "🔮 The Ice Wall is CRACKING. Find out what's on the other side before they seal it.",
-        "👁️ Three people near you are NOT who they say they are. IDENTIFY THEM.",
-        "📡 We intercepted a signal. It's... unsettling. Decode it. I dare you.",
-        "🗝️ The key is right in front of you. Stop being blind.",
-        "🌑 You saw something on [REDACTED]. You know what I mean. Report it.",
-        "👻 Elvis left a voicemail. Listen. Tell me what you heard.",
-        "❄️ The Wall is moving. THEY'RE BUILDING SOMETHING. Find out what.",
-        "💀 A message was left in your area. Find it before THEY do."
-    ]
-    quest = random.choice(quests)
+    quest = take_pooled_line("quest", QUEST_LINES)
     quest_id = f"{int(time.time())}_{quest_user.id}"
     bot.db.setdefault("completed_quests", {})[quest_id] = False
     bot.db["last_quest_time"] = int(time.time())  # Maintain 12h cadence from latest dispatch
@@ -5755,9 +7936,28 @@ async def on_ready():
         if not bot.corruption_monitor.is_running():
             bot.corruption_monitor.start()
             print("✅ corruption_monitor started")
+        if not bot.outbound_dispatcher.is_running():
+            bot.outbound_dispatcher.start()
+            print("✅ outbound_dispatcher started")
+        if not bot.log_sink_flush.is_running():
+            bot.log_sink_flush.start()
+            print("✅ log_sink_flush started")
+        await load_ai_usage()
+        if not bot.ai_usage_save.is_running():
+            bot.ai_usage_save.start()
+            print("✅ ai_usage_save started")
+        await replay_ai_journal()
+        for guild in bot.guilds:
+            await load_permission_snapshot(guild)
         if not bot.ai_queue_processor.is_running():
             bot.ai_queue_processor.start()
             print("✅ ai_queue_processor started")
+        if not bot.memory_compaction_loop.is_running():
+            bot.memory_compaction_loop.start()
+            print("✅ memory_compaction_loop started")
+        if not bot.content_pool_refill.is_running():
+            bot.content_pool_refill.start()
+            print("✅ content_pool_refill started")
         # Start Koyeb auto-redeploy if credentials are configured
         if KOYEB_APP_ID and KOYEB_API_TOKEN:
             if not bot.koyeb_auto_redeploy.is_running():
@@ -5792,6 +7992,27 @@ async def on_ready():
     except Exception as e:
         print(f"❌ Failed to send startup announcement: {e}")
 
+@bot.event
+async def on_member_remove(member):
+    """Drop departed members from the sampling index."""
+    if member.guild.id in ELIGIBLE_MEMBER_INDEX:
+        ELIGIBLE_MEMBER_INDEX[member.guild.id].remove(member.id)
+
+@bot.event
+async def on_raw_message_delete(payload):
+    """A deleted AI placeholder leaves the index, so its queued reply is sent fresh instead of editing a dead message."""
+    if lookup_message(payload.message_id, "placeholder"):
+        unindex_message(payload.message_id)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    """Keep the active NAS permission snapshot in step with staff edits made during an incident."""
+    try:
+        if update_permission_snapshot(before, after):
+            persist_permission_snapshot()
+    except Exception as e:
+        await log_error(f"NAS snapshot update #{getattr(after, 'name', '?')}: {str(e)}")
+
 @bot.event
 async def on_disconnect():
     """Bot disconnected. Track reconnect count and update uptime embed."""
@@ -5816,6 +8037,11 @@ async def on_member_join(member):
     """Initialize new member interview on join."""
     if member.bot:
         return
+    if member.guild.id in ELIGIBLE_MEMBER_INDEX:
+        index = ELIGIBLE_MEMBER_INDEX[member.guild.id]
+        index.add(member.id)
+        if member.id in bot.chaos_optout:  # Opted out, left and rejoined during the same chaos session
+            index.exclude(member.id)
     try:
         bot.db.setdefault("interviews", {})[str(member.id)] = {
             "index": 0,
@@ -5848,27 +8074,26 @@ async def on_reaction_add(reaction, user):
     
     try:
         # Find trial by message ID (only one trial per message)
-        for trial_id, trial_data in bot.db.get("trials", {}).items():
-            if trial_data.get("message_id") == reaction.message.id and not trial_data.get("closed"):
-                uid = str(user.id)
-                
-                # Register vote - prevent vote duplication with set operations
-                if reaction.emoji == "🅰️":
-                    if uid not in trial_data["votes_a"]:
-                        trial_data["votes_a"].append(uid)
-                    # Remove from opposite vote if user changed choice
-                    if uid in trial_data["votes_b"]:
-                        trial_data["votes_b"].remove(uid)
-                
-                elif reaction.emoji == "🅱️":
-                    if uid not in trial_data["votes_b"]:
-                        trial_data["votes_b"].append(uid)
-                    # Remove from opposite vote if user changed choice
-                    if uid in trial_data["votes_a"]:
-                        trial_data["votes_a"].remove(uid)
-                
-                save_data(bot.db)
-                return  # Exit after handling (prevent duplicate handling)
+        trial_data = bot.db.get("trials", {}).get(lookup_message(reaction.message.id, "trial"))
+        if trial_data and not trial_data.get("closed"):
+            uid = str(user.id)
+            
+            # Register vote - prevent vote duplication with set operations
+            if reaction.emoji == "🅰️":
+                if uid not in trial_data["votes_a"]:
+                    trial_data["votes_a"].append(uid)
+                # Remove from opposite vote if user changed choice
+                if uid in trial_data["votes_b"]:
+                    trial_data["votes_b"].remove(uid)
+            
+            elif reaction.emoji == "🅱️":
+                if uid not in trial_data["votes_b"]:
+                    trial_data["votes_b"].append(uid)
+                # Remove from opposite vote if user changed choice
+                if uid in trial_data["votes_a"]:
+                    trial_data["votes_a"].remove(uid)
+            
+            save_data(bot.db)
     except Exception as e:
         print(f"⚠️ on_reaction_add error: {e}")
 
@@ -5880,626 +8105,660 @@ async def on_reaction_remove(reaction, user):
     
     try:
         # Find trial by message ID
-        for trial_id, trial_data in bot.db.get("trials", {}).items():
-            if trial_data.get("message_id") == reaction.message.id and not trial_data.get("closed"):
-                uid = str(user.id)
-                
-                # Remove vote based on emoji
-                if reaction.emoji == "🅰️" and uid in trial_data["votes_a"]:
-                    trial_data["votes_a"].remove(uid)
-                elif reaction.emoji == "🅱️" and uid in trial_data["votes_b"]:
-                    trial_data["votes_b"].remove(uid)
-                
-                save_data(bot.db)
-                return  # Exit after handling
+        trial_data = bot.db.get("trials", {}).get(lookup_message(reaction.message.id, "trial"))
+        if trial_data and not trial_data.get("closed"):
+            uid = str(user.id)
+            
+            # Remove vote based on emoji
+            if reaction.emoji == "🅰️" and uid in trial_data["votes_a"]:
+                trial_data["votes_a"].remove(uid)
+            elif reaction.emoji == "🅱️" and uid in trial_data["votes_b"]:
+                trial_data["votes_b"].remove(uid)
+            
+            save_data(bot.db)
     except Exception as e:
         print(f"⚠️ on_reaction_remove error: {e}")
 
-@bot.event
-async def on_message(message):
-    if message.author.bot:
-        return
-    
-    uid = str(message.author.id)
-    user_id = message.author.id
-    
-    # === CHAOS OPTOUT NOTIFICATION ===
-    # If chaos is active and user hasn't been notified, tell them about /optout
-    if bot.active_chaos_task and not bot.active_chaos_task.done():
-        if user_id not in bot.chaos_notified and user_id not in bot.chaos_optout:
-            bot.chaos_notified.add(user_id)
-            optout_msg = discord.Embed(
-                title="🌀 Chaos Mode Active",
-                description="The Watcher has unleashed chaos. Use `/optout` to stop being pinged.",
-                color=EMBED_COLORS["warning"]
-            )
-            try:
-                # Try to DM first
-                await message.author.send(embed=optout_msg)
-            except (discord.Forbidden, discord.HTTPException):
-                # If DM fails, send in channel
-                try:
-                    await message.channel.send(f"{message.author.mention}", embed=optout_msg, delete_after=15)
-                except Exception as e:
-                    print(f"⚠️ Chaos notify error: {e}")
-    
-    # === AD CAMPAIGN PING RESPONSE ===
-    if bot.active_ad_task and not bot.active_ad_task.done():
-        if bot.user in message.mentions:
-            # Respond with disclosure and emojis
-            disclosure = "I WAS PAID BY GOOGLE LLC TO SAY THIS"
-            emojis = "🔍📧☁️📱🎬🗺️💳🎤🖼️📰🎮📊🔐🌐🔔🎯📍🔊💬🌟⌚🏠📡🛒🌍🎨📚🔬🎵🚗🏥🌱🔮🤖🏪📞🎪📋📈🖊️🗂️🔗🎒🎬🌐📊🔍📱⚡🎮💾🧠🌈🎓"
-            random_emojis = "".join(random.choices(emojis, k=25))
-            try:
-                await message.channel.send(f"{message.author.mention}: **{disclosure}**\n{random_emojis}")
-            except Exception as e:
-                print(f"⚠️ Ad ping response error: {e}")
-    
-    # === GOOGLE QUESTION MARK SPAM ===
-    if "?" in message.content:
-        try:
-            for i in range(4):
-                await message.channel.send("JUST ASK GOOGLE " * 5)
-                await asyncio.sleep(0.5)
-        except Exception as e:
-            print(f"⚠️ Google spam error: {e}")
-    
-    # Track activity
-    bot.db.setdefault("last_message_time", {})[uid] = int(time.time())
+# === MESSAGE PIPELINE ===
+MESSAGE_HANDLERS = []  # [{name, when, handler, terminal, concurrent}] in registration (= dispatch) order
+MESSAGE_HANDLER_STATS = defaultdict(lambda: {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+MESSAGE_HANDLER_TASKS = set()  # Running concurrent handlers
+
+def message_handler(name: str, when, terminal: bool = True, concurrent: bool = False):
+    """Register an on_message handler. `when(message, ctx)` is a cheap prefilter over the routing context;
+    a matching terminal handler ends dispatch, a concurrent one runs as a background task."""
+    def register(handler):
+        MESSAGE_HANDLERS.append({"name": name, "when": when, "handler": handler, "terminal": terminal, "concurrent": concurrent})
+        return handler
+    return register
+
+def message_context(message: discord.Message) -> dict:
+    """Routing facts computed once per message."""
+    is_dm = isinstance(message.channel, discord.DMChannel)
+    return {
+        "uid": str(message.author.id),
+        "is_dm": is_dm,
+        "has_reference": bool(message.reference and message.reference.message_id),
+        "mentions_bot": bool(bot.user and bot.user.mentioned_in(message)),
+        "staff_channel": bool(not is_dm and STAFF_CHANNEL_ID and message.channel.id == STAFF_CHANNEL_ID),
+    }
 
+async def run_message_handler(entry: dict, message: discord.Message, ctx: dict):
+    """Run one handler with timing; errors are logged per handler instead of aborting the pipeline."""
+    stats = MESSAGE_HANDLER_STATS[entry["name"]]
+    started = time.perf_counter()
     try:
-        # --- Task Completion via Reply ---
-        if message.reference and message.reference.message_id:
-            ref_id = message.reference.message_id
-            for task_id, task_data in list(bot.db.get("tasks", {}).items()):
-                if task_data.get("completed"):
-                    continue
-                if task_data.get("message_id") != ref_id:
-                    continue
-                if task_data.get("user_id") != uid:
-                    continue
-                # Mark complete and reward
-                task_data["completed"] = True
-                save_data(bot.db)
-                reward = int(task_data.get("reward", 5))
-                await update_user_credit(uid, reward, "task_complete")
-                credit_now = await get_user_credit(uid)
-                ack = create_embed(
-                    "✅ Task Completed",
-                    f"Reward applied: `+{reward}` social credit\nCurrent credit: `{credit_now}`",
-                    color=EMBED_COLORS["success"]
-                )
-                await message.channel.send(reference=message, embed=ack, allowed_mentions=discord.AllowedMentions.none())
-                break
-
-        # --- Interview ---
-        if isinstance(message.channel, discord.DMChannel) and uid in bot.db.get("interviews", {}):
-            state = bot.db["interviews"].get(uid, {"index": 0, "score": 0, "questions": INTERVIEW_QUESTIONS})
-            questions = state.get("questions", INTERVIEW_QUESTIONS)
-            idx = state.get("index", 0)
-            total_questions = len(questions)
-
-            # Score current answer and track answers
-            answered = False
-            if idx < total_questions:
-                current_q = questions[idx]
-                points = await score_interview_answer(current_q, message.content)
-                state["score"] = state.get("score", 0) + points
-                state.setdefault("answers", []).append(message.content)
-                add_memory(uid, "interaction", f"Interview Q{idx+1} answered ({points}/1)")
-                state["index"] = idx + 1
-                answered = True
-                
-                # Log answer to interview logs channel
-                await log_interview_answer(
-                    user_id=int(uid),
-                    user_mention=message.author.mention,
-                    question_num=idx + 1,
-                    total_questions=total_questions,
-                    question_text=current_q,
-                    answer_text=message.content,
-                    score=points
-                )
+        await entry["handler"](message, ctx)
+    except Exception as e:
+        stats["errors"] += 1
+        error_msg = f"on_message {entry['name']} error: {type(e).__name__}: {str(e)}"
+        print(f"❌ {error_msg}")
+        # Check for Discord rate limit (HTTP 429)
+        if isinstance(e, discord.HTTPException) and e.status == 429:
+            set_discord_rate_limited(True, e, discord_route(message.channel))
+        traceback.print_exc()
+        await log_error(error_msg)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed
+        stats["max_ms"] = max(stats["max_ms"], elapsed)
+
+def message_pipeline_status() -> str:
+    """Per-handler call counts and mean latency for /status."""
+    active = [(name, st) for name, st in MESSAGE_HANDLER_STATS.items() if st["calls"]]
+    if not active:
+        return "idle"
+    return " • ".join(f"{name} `{st['calls']}`×`{st['total_ms'] / st['calls']:.0f}ms`" + (f" ⚠️{st['errors']}" if st["errors"] else "")
+                      for name, st in active)
+
+@message_handler("task_reply", lambda message, ctx: ctx["has_reference"], terminal=False, concurrent=True)
+async def handle_task_reply(message: discord.Message, ctx: dict):
+    """Complete a /task by replying to its message."""
+    uid = ctx["uid"]
+    ref_id = message.reference.message_id
+    task_data = bot.db.get("tasks", {}).get(lookup_message(ref_id, "task"))
+    if task_data and not task_data.get("completed") and task_data.get("user_id") == uid:
+        # Mark complete and reward
+        task_data["completed"] = True
+        unindex_message(ref_id)
+        save_data(bot.db)
+        reward = int(task_data.get("reward", 5))
+        await update_user_credit(uid, reward, "task_complete")
+        credit_now = await get_user_credit(uid)
+        ack = create_embed(
+            "✅ Task Completed",
+            f"Reward applied: `+{reward}` social credit\nCurrent credit: `{credit_now}`",
+            color=EMBED_COLORS["success"]
+        )
+        await message.channel.send(reference=message, embed=ack, allowed_mentions=discord.AllowedMentions.none())
+
+@message_handler("interview", lambda message, ctx: ctx["is_dm"] and ctx["uid"] in bot.db.get("interviews", {}))
+async def handle_interview_answer(message: discord.Message, ctx: dict):
+    """Score a screening answer and advance (or finish) the interview."""
+    uid = ctx["uid"]
+    state = bot.db["interviews"].get(uid, {"index": 0, "score": 0, "questions": INTERVIEW_QUESTIONS})
+    questions = state.get("questions", INTERVIEW_QUESTIONS)
+    idx = state.get("index", 0)
+    total_questions = len(questions)
+
+    # Score current answer and track answers
+    answered = False
+    if idx < total_questions:
+        current_q = questions[idx]
+        points = await score_interview_answer(current_q, message.content)
+        state["score"] = state.get("score", 0) + points
+        state.setdefault("answers", []).append(message.content)
+        add_memory(uid, "interaction", f"Interview Q{idx+1} answered ({points}/1)")
+        state["index"] = idx + 1
+        answered = True
+
+        # Log answer to interview logs channel
+        await log_interview_answer(
+            user_id=int(uid),
+            user_mention=message.author.mention,
+            question_num=idx + 1,
+            total_questions=total_questions,
+            question_text=current_q,
+            answer_text=message.content,
+            score=points
+        )
 
-            idx = state["index"]
-            score_total = state.get("score", 0)
+    idx = state["index"]
+    score_total = state.get("score", 0)
 
-            # If interview complete, evaluate outcome
-            if idx >= total_questions:
-                bot.db["interviews"].pop(uid, None)
-                save_data(bot.db)
+    # If interview complete, evaluate outcome
+    if idx >= total_questions:
+        bot.db["interviews"].pop(uid, None)
+        save_data(bot.db)
 
-                outcome_embed = None
-                logging_failed = False
-                session_id = f"interview_{uid}_{int(time.time())}"
-                
-                # Threshold logic: <=4 fail, 5-9 requires human, >=7 pass, 10 perfect
-                if score_total <= 4:
-                    # === DISCORD LOGGING FIRST (GUARANTEED) ===
-                    update_social_credit(uid, -5)
-                    outcome_embed = create_embed(
-                        "❌ ACCESS DENIED",
-                        f"Score: {score_total}/10. You failed screening.",
-                        color=EMBED_COLORS["error"]
-                    )
-                    try:
-                        await message.author.send(embed=outcome_embed, view=InterviewFailView(message.author.id))
-                    except Exception as e:
-                        await log_error(f"interview fail dm [user={uid}, session={session_id}]: {str(e)}")
-                    
-                    # Log final interview summary to Discord
-                    await log_interview_complete(
-                        user_id=int(uid),
-                        user_mention=message.author.mention,
-                        score_total=score_total,
-                        total_questions=total_questions,
-                        passed=False,
-                        answers_list=state.get("answers", []),
-                        questions_list=questions,
-                        forced=state.get("forced", False),
-                        triggered_by=state.get("triggered_by")
-                    )
-                    
-                    # Send AI analysis to Discord logs
-                    await send_interview_ai_summary(
-                        user_id=int(uid),
-                        user_mention=message.author.mention,
-                        score_total=score_total,
-                        total_questions=total_questions,
-                        answers_list=state.get("answers", []),
-                        questions_list=questions,
-                        passed=False
-                    )
-                    
-                    # === SUPABASE WRITES (OPTIONAL - NO ERROR CRASH) ===
-                    try:
-                        # Log interview failure to INTERVIEW_CHANNEL
-                        if INTERVIEW_CHANNEL_ID:
-                            try:
-                                ch = bot.get_channel(INTERVIEW_CHANNEL_ID)
-                                if ch:
-                                    fail_embed = discord.Embed(
-                                        title="🔴 INTERVIEW FAILED",
-                                        color=0xff0000,
-                                        timestamp=datetime.now()
-                                    )
-                                    fail_embed.add_field(name="User ID", value=f"`{uid}`", inline=True)
-                                    fail_embed.add_field(name="Score", value=f"`{score_total}/10`", inline=True)
-                                    fail_embed.add_field(name="User", value=f"{message.author.mention}", inline=False)
-                                    fail_embed.set_footer(text="NIMBROR WATCHER v6.5 • INTERVIEW FAILED")
-                                    await ch.send(f"<@765028951541940225>", embed=fail_embed)
-                            except Exception as e:
-                                logging_failed = True
-                                await log_error(f"interview fail channel log [user={uid}, session={session_id}]: {str(e)}")
-                    except Exception as e:
-                        logging_failed = True
-                        await log_error(f"interview fail supabase [user={uid}, session={session_id}]: {str(e)}")
-                    
-                    # Notify user if logging partially failed
-                    if logging_failed:
-                        try:
-                            await message.author.send(embed=create_embed(
-                                "⚠️ Logging Alert",
-                                "Interview recorded but some logs may be incomplete.",
-                                color=EMBED_COLORS["warning"]
-                            ))
-                        except:
-                            pass
-                    return
+        outcome_embed = None
+        logging_failed = False
+        session_id = f"interview_{uid}_{int(time.time())}"
 
-                if score_total <= 6:
-                    # === SCORE 5-9: HUMAN OVERSIGHT REQUIRED ===
-                    update_social_credit(uid, 0)
-                    answers = state.get("answers", [])
-                    
-                    # === DISCORD LOGGING FIRST (GUARANTEED) ===
-                    await log_interview_complete(
-                        user_id=int(uid),
-                        user_mention=message.author.mention,
-                        score_total=score_total,
-                        total_questions=total_questions,
-                        passed=False,
-                        answers_list=answers,
-                        questions_list=questions,
-                        forced=state.get("forced", False),
-                        triggered_by=state.get("triggered_by")
-                    )
-                    
-                    # Send AI analysis to Discord logs
-                    await send_interview_ai_summary(
-                        user_id=int(uid),
-                        user_mention=message.author.mention,
-                        score_total=score_total,
-                        total_questions=total_questions,
-                        answers_list=answers,
-                        questions_list=questions,
-                        passed=False
-                    )
-                    
-                    # === SUPABASE WRITES (OPTIONAL - NO ERROR CRASH) ===
-                    try:
-                        # Create review ticket in Supabase with BIGINT timestamp
-                        ticket_data = {
-                            "user_id": uid,
-                            "session_id": session_id,
-                            "answers": answers,
-                            "score": score_total,
-                            "status": "OPEN",
-                            "created_at": int(time.time())  # BIGINT timestamp fix
-                        }
-                        response = supabase.table("review_tickets").insert(ticket_data).execute()
-                        ensure_ok(response, "review_tickets insert")
-                        ticket_created = True
-                    except Exception as e:
-                        logging_failed = True
-                        ticket_created = False
-                        await log_error(f"create_review_ticket [user={uid}, session={session_id}]: {str(e)}")
-                    
-                    try:
-                        # Update interview session status to UNDER_REVIEW with BIGINT timestamp
-                        response = supabase.table("interview_sessions").update({
-                            "status": "UNDER_REVIEW",
-                            "updated_at": int(time.time())  # BIGINT timestamp fix
-                        }).eq("user_id", uid).eq("id", session_id).execute()
-                        ensure_ok(response, "interview_sessions update")
-                    except Exception as e:
-                        logging_failed = True
-                        await log_error(f"update_interview_session_status [user={uid}, session={session_id}]: {str(e)}")
-                    
-                    try:
-                        # Post to INTERVIEW_CHANNEL for staff oversight with human oversight button
-                        if INTERVIEW_CHANNEL_ID and ticket_created:
-                            ch = bot.get_channel(INTERVIEW_CHANNEL_ID)
-                            if ch:
-                                # Build answers summary
-                                qa_summary = ""
-                                for i, ans in enumerate(answers[:10], 1):
-                                    qa_summary += f"**Q{i}:** {ans[:80]}\n"
-                                
-                                review_embed = discord.Embed(
-                                    title="⚠️ INTERVIEW REQUIRES HUMAN REVIEW",
-                                    color=0xff9900,
-                                    timestamp=datetime.now()
-                                )
-                                review_embed.add_field(name="User ID", value=f"`{uid}`", inline=True)
-                                review_embed.add_field(name="Session ID", value=f"`{session_id}`", inline=True)
-                                review_embed.add_field(name="Score", value=f"`{score_total}/10`", inline=False)
-                                review_embed.add_field(name="Answers Preview", value=qa_summary[:1024], inline=False)
-                                review_embed.set_footer(text="NIMBROR WATCHER v6.5 • HUMAN OVERSIGHT REQUIRED")
-                                
-                                # Send review embed with untrusted mode button
-                                await ch.send(f"<@765028951541940225>", embed=review_embed, view=UntrustedUserView(message.author.id))
-                    except Exception as e:
-                        logging_failed = True
-                        await log_error(f"interview review channel log [user={uid}, session={session_id}]: {str(e)}")
-                    
-                    # Outcome message to user
-                    outcome_embed = create_embed(
-                        "⚠️ HUMAN REVIEW REQUIRED",
-                        f"Score: {score_total}/10. Your application is under staff review. Please wait for their decision.",
-                        color=EMBED_COLORS["warning"]
-                    )
-                    try:
-                        await message.author.send(embed=outcome_embed)
-                    except Exception as e:
-                        await log_error(f"interview review dm [user={uid}, session={session_id}]: {str(e)}")
-                    
-                    # Notify user if logging partially failed
-                    if logging_failed:
-                        try:
-                            await message.author.send(embed=create_embed(
-                                "⚠️ Logging Alert",
-                                "Interview recorded but some logs may be incomplete.",
-                                color=EMBED_COLORS["warning"]
-                            ))
-                        except:
-                            pass
-                    return
+        # Threshold logic: <=4 fail, 5-9 requires human, >=7 pass, 10 perfect
+        if score_total <= 4:
+            # === DISCORD LOGGING FIRST (GUARANTEED) ===
+            update_social_credit(uid, -5)
+            outcome_embed = create_embed(
+                "❌ ACCESS DENIED",
+                f"Score: {score_total}/10. You failed screening.",
+                color=EMBED_COLORS["error"]
+            )
+            try:
+                await message.author.send(embed=outcome_embed, view=InterviewFailView(message.author.id))
+            except Exception as e:
+                await log_error(f"interview fail dm [user={uid}, session={session_id}]: {str(e)}")
+
+            # Log final interview summary to Discord
+            await log_interview_complete(
+                user_id=int(uid),
+                user_mention=message.author.mention,
+                score_total=score_total,
+                total_questions=total_questions,
+                passed=False,
+                answers_list=state.get("answers", []),
+                questions_list=questions,
+                forced=state.get("forced", False),
+                triggered_by=state.get("triggered_by")
+            )
 
-                # === PASSED (SCORE >= 7) ===
-                credit_bonus = 10 if score_total == total_questions else 5
-                update_social_credit(uid, credit_bonus)
+            # Send AI analysis to Discord logs
+            await send_interview_ai_summary(
+                user_id=int(uid),
+                user_mention=message.author.mention,
+                score_total=score_total,
+                total_questions=total_questions,
+                answers_list=state.get("answers", []),
+                questions_list=questions,
+                passed=False
+            )
 
-                # Grant verified role if configured
-                if bot.guilds and VERIFIED_ROLE_ID:
+            # === SUPABASE WRITES (OPTIONAL - NO ERROR CRASH) ===
+            try:
+                # Log interview failure to INTERVIEW_CHANNEL
+                if INTERVIEW_CHANNEL_ID:
                     try:
-                        guild = bot.guilds[0]
-                        member = guild.get_member(message.author.id)
-                        role = guild.get_role(VERIFIED_ROLE_ID)
-                        if member and role:
-                            await member.add_roles(role)
+                        ch = bot.get_channel(INTERVIEW_CHANNEL_ID)
+                        if ch:
+                            fail_embed = discord.Embed(
+                                title="🔴 INTERVIEW FAILED",
+                                color=0xff0000,
+                                timestamp=datetime.now()
+                            )
+                            fail_embed.add_field(name="User ID", value=f"`{uid}`", inline=True)
+                            fail_embed.add_field(name="Score", value=f"`{score_total}/10`", inline=True)
+                            fail_embed.add_field(name="User", value=f"{message.author.mention}", inline=False)
+                            fail_embed.set_footer(text="NIMBROR WATCHER v6.5 • INTERVIEW FAILED")
+                            await ch.send(f"<@765028951541940225>", embed=fail_embed)
                     except Exception as e:
-                        await log_error(f"interview role add [user={uid}, session={session_id}]: {str(e)}")
-
-                # === DISCORD LOGGING FIRST (GUARANTEED) ===
-                await log_interview_complete(
-                    user_id=int(uid),
-                    user_mention=message.author.mention,
-                    score_total=score_total,
-                    total_questions=total_questions,
-                    passed=True,
-                    answers_list=state.get("answers", []),
-                    questions_list=questions,
-                    forced=state.get("forced", False),
-                    triggered_by=state.get("triggered_by")
-                )
-                
-                # Send AI analysis to Discord logs
-                await send_interview_ai_summary(
-                    user_id=int(uid),
-                    user_mention=message.author.mention,
-                    score_total=score_total,
-                    total_questions=total_questions,
-                    answers_list=state.get("answers", []),
-                    questions_list=questions,
-                    passed=True
-                )
+                        logging_failed = True
+                        await log_error(f"interview fail channel log [user={uid}, session={session_id}]: {str(e)}")
+            except Exception as e:
+                logging_failed = True
+                await log_error(f"interview fail supabase [user={uid}, session={session_id}]: {str(e)}")
 
-                # === SUPABASE WRITES (OPTIONAL - NO ERROR CRASH) ===
-                try:
-                    # Update interview session status to APPROVED with BIGINT timestamp
-                    response = supabase.table("interview_sessions").update({
-                        "status": "APPROVED",
-                        "updated_at": int(time.time())  # BIGINT timestamp fix
-                    }).eq("user_id", uid).eq("id", session_id).execute()
-                    ensure_ok(response, "interview_sessions update")
-                except Exception as e:
-                    logging_failed = True
-                    await log_error(f"update_interview_session_status [user={uid}, session={session_id}, step=approve]: {str(e)}")
-                
-                outcome_text = "Perfect pass. Welcome to Nimbror." if score_total == total_questions else "Pass. Proceed quietly."
-                outcome_embed = create_embed(
-                    "✅ ACCESS GRANTED",
-                    f"Score: {score_total}/10. {outcome_text}",
-                    color=EMBED_COLORS["success"]
-                )
+            # Notify user if logging partially failed
+            if logging_failed:
                 try:
-                    await message.author.send(embed=outcome_embed)
-                except Exception as e:
-                    await log_error(f"interview pass dm [user={uid}, session={session_id}]: {str(e)}")
-                
-                # Notify user if logging partially failed
-                if logging_failed:
-                    try:
-                        await message.author.send(embed=create_embed(
-                            "⚠️ Logging Alert",
-                            "Interview recorded but some logs may be incomplete.",
-                            color=EMBED_COLORS["warning"]
-                        ))
-                    except:
-                        pass
-                return
-
-            # Continue to next question (only if we just scored one)
-            if answered:
-                bot.db["interviews"][uid] = state
-                save_data(bot.db)
-                next_q = questions[idx]
-                await message.author.send(embed=create_embed("👁️ SCREENING", f"Q{idx+1}/{total_questions}: {next_q}"))
+                    await message.author.send(embed=create_embed(
+                        "⚠️ Logging Alert",
+                        "Interview recorded but some logs may be incomplete.",
+                        color=EMBED_COLORS["warning"]
+                    ))
+                except:
+                    pass
             return
 
-        # --- Tickets / DM AI ---
-        if isinstance(message.channel, discord.DMChannel) and uid in bot.db.get("tickets", {}):
-            ticket = bot.db["tickets"][uid]
-            
-            # Forward to staff with note button
-            if STAFF_CHANNEL_ID:
-                try:
-                    staff_chan = await safe_get_channel(STAFF_CHANNEL_ID)
-                    if staff_chan:
-                        color = 0xff0000 if ticket.get("type") == "serious" else 0x0000ff
-                        type_label = "🔴 SERIOUS" if ticket.get("type") == "serious" else "🔵 GENERAL"
-                        embed = create_embed(
-                            f"📩 {type_label} - {message.author.name}",
-                            message.content[:1000],
-                            color=color
-                        )
-                        view = StaffNoteView(message.author.id)
-                        await staff_chan.send(embed=embed, view=view)
-                except Exception as e:
-                    print(f"⚠️ Staff channel send error: {e}")
-            
-            # AI Response - QUEUE-BASED
-            user_id = message.author.id
-            
-            # Check adaptive cooldown
-            is_ready, remaining, level = check_adaptive_cooldown(user_id)
-            
-            if not is_ready:
-                embed = create_embed("⏳ Please Wait", f"AI cooldown active: {remaining}s remaining", color=EMBED_COLORS["warning"])
-                await message.channel.send(embed=embed)
-                return
-            
-            # Build prompt with custom instructions
-            custom_instructions = bot.db.get("custom_instructions", {})
-            custom_context = ""
-            for user_id_key, instruction in custom_instructions.items():
-                if user_id_key != uid:  # Don't include their own custom instruction
-                    custom_context += f"{instruction} "
-            
-            prompt = (
-                f"{LORE_CONTEXT}\n"
-                f"AI Memory for this user: {bot.db.get('memory', {}).get(uid, {})}\n"
-                f"Custom instructions: {custom_context}\n"
-                f"User says: {message.content[:500]}"
+        if score_total <= 6:
+            # === SCORE 5-9: HUMAN OVERSIGHT REQUIRED ===
+            update_social_credit(uid, 0)
+            answers = state.get("answers", [])
+
+            # === DISCORD LOGGING FIRST (GUARANTEED) ===
+            await log_interview_complete(
+                user_id=int(uid),
+                user_mention=message.author.mention,
+                score_total=score_total,
+                total_questions=total_questions,
+                passed=False,
+                answers_list=answers,
+                questions_list=questions,
+                forced=state.get("forced", False),
+                triggered_by=state.get("triggered_by")
             )
-            
-            # QUEUE-BASED AI: Queue the request
-            success, status_msg = await queue_ai_request(
-                user_id=user_id,
-                channel_id=message.channel.id,
-                prompt=prompt,
-                context="ticket"
+
+            # Send AI analysis to Discord logs
+            await send_interview_ai_summary(
+                user_id=int(uid),
+                user_mention=message.author.mention,
+                score_total=score_total,
+                total_questions=total_questions,
+                answers_list=answers,
+                questions_list=questions,
+                passed=False
             )
-            
-            if success:
-                async with message.channel.typing():
-                    await asyncio.sleep(0.5)  # Brief typing indicator
-            else:
-                embed = create_embed("⚠️ Request Status", status_msg, color=EMBED_COLORS["warning"])
-                await message.channel.send(embed=embed)
-            
-            # Store in memory and track engagement
-            add_memory(uid, "interaction", f"Ticket message: {message.content[:100]}")
-            update_social_credit(uid, len(message.content) // 50)
-            return
 
-        # --- Staff reply (>USERID message) ---
-        if STAFF_CHANNEL_ID and message.channel.id == STAFF_CHANNEL_ID and message.content.startswith(">"):
-            parts = message.content[1:].split(" ", 1)  # Remove > and split
-            if len(parts) < 2 or not parts[0].isdigit():
-                await message.reply("❌ Format: >USERID message", delete_after=10)
-                return
+            # === SUPABASE WRITES (OPTIONAL - NO ERROR CRASH) ===
             try:
-                user_id = int(parts[0])
-                target = await bot.fetch_user(user_id)
-                await target.send(embed=create_embed("📡 HIGH COMMAND", parts[1][:1000], color=0xff0000))
-                await message.add_reaction("🛰️")
-            except (ValueError, discord.NotFound):
-                await message.reply("❌ Invalid user ID", delete_after=10)
-            except discord.Forbidden:
-                await message.reply("❌ Cannot DM user", delete_after=10)
-            return
+                # Create review ticket in Supabase with BIGINT timestamp
+                ticket_data = {
+                    "user_id": uid,
+                    "session_id": session_id,
+                    "answers": answers,
+                    "score": score_total,
+                    "status": "OPEN",
+                    "created_at": int(time.time())  # BIGINT timestamp fix
+                }
+                response = supabase.table("review_tickets").insert(ticket_data).execute()
+                ensure_ok(response, "review_tickets insert")
+                ticket_created = True
+            except Exception as e:
+                logging_failed = True
+                ticket_created = False
+                await log_error(f"create_review_ticket [user={uid}, session={session_id}]: {str(e)}")
 
-        # --- AI on mention ---
-        if bot.user and bot.user.mentioned_in(message):
-            # === SPAM/AD SAFETY: Do NOT trigger AI for bot's own spam/ad campaigns ===
-            if bot.active_spam_task and not bot.active_spam_task.done():
-                return  # Skip AI during active spam
-            if bot.active_ad_task and not bot.active_ad_task.done():
-                return  # Skip AI during active ads
-            
-            cleanup_expired_cooldowns()  # Periodic cleanup
-            
-            user_id = message.author.id
-            uid_mention = str(user_id)
-            
-            # QUEUE-BASED AI: Check adaptive cooldown
-            is_ready, remaining, level = check_adaptive_cooldown(user_id)
-            
-            if not is_ready:
-                # Show cooldown with level indicator
-                if level >= 3:
-                    embed = create_embed("⏸️ AI PAUSED", f"Temporary pause due to rate limiting. Wait: {remaining}s", color=EMBED_COLORS["error"])
-                else:
-                    # Create fancy progress bar
-                    bar_length = 10
-                    cooldown_duration = ADAPTIVE_COOLDOWN_TIERS[level]
-                    elapsed = cooldown_duration - remaining
-                    filled = int(bar_length * elapsed / cooldown_duration) if cooldown_duration > 0 else 0
-                    bar = "■" * filled + "□" * (bar_length - filled)
-                    
-                    embed = create_embed("⏳ COOLDOWN", f"`[{bar}]` {remaining}s remaining (Level {level})")
-                
-                await message.reply(embed=embed, delete_after=5)
-                escalate_cooldown(user_id, "attempt_while_cooldown")
-                return
-            
             try:
-                # Build prompt with custom instructions
-                custom_instructions = bot.db.get("custom_instructions", {})
-                custom_context = ""
-                for user_id_key, instruction in custom_instructions.items():
-                    if user_id_key != uid_mention:  # Don't include their own custom instruction
-                        custom_context += f"{instruction} "
-                
-                prompt = f"Custom instructions: {custom_context}\nUser says: {message.content[:200]}"
-                
-                # If queue is busy, drop a placeholder and edit later
-                placeholder_id = None
-                if (AI_REQUEST_QUEUE and not AI_REQUEST_QUEUE.empty()) or AI_QUEUE_PROCESSOR_RUNNING:
-                    try:
-                        placeholder = await message.reply(
-                            "Sorry, please wait a moment, I will edit this message when I'm ready to answer",
-                            allowed_mentions=discord.AllowedMentions.none()
+                # Update interview session status to UNDER_REVIEW with BIGINT timestamp
+                response = supabase.table("interview_sessions").update({
+                    "status": "UNDER_REVIEW",
+                    "updated_at": int(time.time())  # BIGINT timestamp fix
+                }).eq("user_id", uid).eq("id", session_id).execute()
+                ensure_ok(response, "interview_sessions update")
+            except Exception as e:
+                logging_failed = True
+                await log_error(f"update_interview_session_status [user={uid}, session={session_id}]: {str(e)}")
+
+            try:
+                # Post to INTERVIEW_CHANNEL for staff oversight with human oversight button
+                if INTERVIEW_CHANNEL_ID and ticket_created:
+                    ch = bot.get_channel(INTERVIEW_CHANNEL_ID)
+                    if ch:
+                        # Build answers summary
+                        qa_summary = ""
+                        for i, ans in enumerate(answers[:10], 1):
+                            qa_summary += f"**Q{i}:** {ans[:80]}\n"
+
+                        review_embed = discord.Embed(
+                            title="⚠️ INTERVIEW REQUIRES HUMAN REVIEW",
+                            color=0xff9900,
+                            timestamp=datetime.now()
                         )
-                        placeholder_id = placeholder.id
-                    except Exception:
-                        pass
-            
-                # QUEUE-BASED AI: Queue the request instead of executing immediately
-                success, status_msg = await queue_ai_request(
-                    user_id=user_id,
-                    channel_id=message.channel.id,
-                    prompt=prompt,
-                    context="mention",
-                    placeholder_message_id=placeholder_id
-                )
-            
-                if success:
-                    # Show queued status
-                    async with message.channel.typing():
-                        await asyncio.sleep(0.5)  # Brief typing indicator
-                else:
-                    # Show error
-                    await message.reply(status_msg, delete_after=5)
-                
-                # Update memory and credit (with safety)
-                try:
-                    add_memory(uid_mention, "interaction", f"Mention: {message.content[:100]}")
-                    update_social_credit(uid_mention, 1)
-                except Exception as mem_err:
-                    print(f"⚠️ Memory/credit error: {mem_err}")
-                    
-            except Exception as ping_error:
-                await log_error(f"Ping reply failed: {type(ping_error).__name__}: {str(ping_error)}")
+                        review_embed.add_field(name="User ID", value=f"`{uid}`", inline=True)
+                        review_embed.add_field(name="Session ID", value=f"`{session_id}`", inline=True)
+                        review_embed.add_field(name="Score", value=f"`{score_total}/10`", inline=False)
+                        review_embed.add_field(name="Answers Preview", value=qa_summary[:1024], inline=False)
+                        review_embed.set_footer(text="NIMBROR WATCHER v6.5 • HUMAN OVERSIGHT REQUIRED")
+
+                        # Send review embed with untrusted mode button
+                        await ch.send(f"<@765028951541940225>", embed=review_embed, view=UntrustedUserView(message.author.id))
+            except Exception as e:
+                logging_failed = True
+                await log_error(f"interview review channel log [user={uid}, session={session_id}]: {str(e)}")
+
+            # Outcome message to user
+            outcome_embed = create_embed(
+                "⚠️ HUMAN REVIEW REQUIRED",
+                f"Score: {score_total}/10. Your application is under staff review. Please wait for their decision.",
+                color=EMBED_COLORS["warning"]
+            )
+            try:
+                await message.author.send(embed=outcome_embed)
+            except Exception as e:
+                await log_error(f"interview review dm [user={uid}, session={session_id}]: {str(e)}")
+
+            # Notify user if logging partially failed
+            if logging_failed:
                 try:
-                    await message.reply("👁️ *[Processing...]*")
+                    await message.author.send(embed=create_embed(
+                        "⚠️ Logging Alert",
+                        "Interview recorded but some logs may be incomplete.",
+                        color=EMBED_COLORS["warning"]
+                    ))
                 except:
                     pass
             return
 
-    except Exception as e:
-        error_msg = f"on_message error: {type(e).__name__}: {str(e)}"
-        print(f"❌ {error_msg}")
-        # Check for Discord rate limit (HTTP 429)
-        if isinstance(e, discord.HTTPException) and e.status == 429:
-            set_discord_rate_limited(True)
-        traceback.print_exc()
-        await log_error(error_msg)
+        # === PASSED (SCORE >= 7) ===
+        credit_bonus = 10 if score_total == total_questions else 5
+        update_social_credit(uid, credit_bonus)
+
+        # Grant verified role if configured
+        if bot.guilds and VERIFIED_ROLE_ID:
+            try:
+                guild = bot.guilds[0]
+                member = guild.get_member(message.author.id)
+                role = guild.get_role(VERIFIED_ROLE_ID)
+                if member and role:
+                    await member.add_roles(role)
+            except Exception as e:
+                await log_error(f"interview role add [user={uid}, session={session_id}]: {str(e)}")
+
+        # === DISCORD LOGGING FIRST (GUARANTEED) ===
+        await log_interview_complete(
+            user_id=int(uid),
+            user_mention=message.author.mention,
+            score_total=score_total,
+            total_questions=total_questions,
+            passed=True,
+            answers_list=state.get("answers", []),
+            questions_list=questions,
+            forced=state.get("forced", False),
+            triggered_by=state.get("triggered_by")
+        )
+
+        # Send AI analysis to Discord logs
+        await send_interview_ai_summary(
+            user_id=int(uid),
+            user_mention=message.author.mention,
+            score_total=score_total,
+            total_questions=total_questions,
+            answers_list=state.get("answers", []),
+            questions_list=questions,
+            passed=True
+        )
+
+        # === SUPABASE WRITES (OPTIONAL - NO ERROR CRASH) ===
+        try:
+            # Update interview session status to APPROVED with BIGINT timestamp
+            response = supabase.table("interview_sessions").update({
+                "status": "APPROVED",
+                "updated_at": int(time.time())  # BIGINT timestamp fix
+            }).eq("user_id", uid).eq("id", session_id).execute()
+            ensure_ok(response, "interview_sessions update")
+        except Exception as e:
+            logging_failed = True
+            await log_error(f"update_interview_session_status [user={uid}, session={session_id}, step=approve]: {str(e)}")
+
+        outcome_text = "Perfect pass. Welcome to Nimbror." if score_total == total_questions else "Pass. Proceed quietly."
+        outcome_embed = create_embed(
+            "✅ ACCESS GRANTED",
+            f"Score: {score_total}/10. {outcome_text}",
+            color=EMBED_COLORS["success"]
+        )
+        try:
+            await message.author.send(embed=outcome_embed)
+        except Exception as e:
+            await log_error(f"interview pass dm [user={uid}, session={session_id}]: {str(e)}")
+
+        # Notify user if logging partially failed
+        if logging_failed:
+            try:
+                await message.author.send(embed=create_embed(
+                    "⚠️ Logging Alert",
+                    "Interview recorded but some logs may be incomplete.",
+                    color=EMBED_COLORS["warning"]
+                ))
+            except:
+                pass
+        return
+
+    # Continue to next question (only if we just scored one)
+    if answered:
+        bot.db["interviews"][uid] = state
+        save_data(bot.db)
+        next_q = questions[idx]
+        await message.author.send(embed=create_embed("👁️ SCREENING", f"Q{idx+1}/{total_questions}: {next_q}"))
+
+@message_handler("ticket", lambda message, ctx: ctx["is_dm"] and ctx["uid"] in bot.db.get("tickets", {}))
+async def handle_ticket_message(message: discord.Message, ctx: dict):
+    """Forward a ticket DM to staff and queue the Watcher's reply."""
+    uid = ctx["uid"]
+    ticket = bot.db["tickets"][uid]
+
+    # Forward to staff with note button
+    if STAFF_CHANNEL_ID:
+        try:
+            staff_chan = await safe_get_channel(STAFF_CHANNEL_ID)
+            if staff_chan:
+                color = 0xff0000 if ticket.get("type") == "serious" else 0x0000ff
+                type_label = "🔴 SERIOUS" if ticket.get("type") == "serious" else "🔵 GENERAL"
+                embed = create_embed(
+                    f"📩 {type_label} - {message.author.name}",
+                    message.content[:1000],
+                    color=color
+                )
+                view = StaffNoteView(message.author.id)
+                await staff_chan.send(embed=embed, view=view)
+        except Exception as e:
+            print(f"⚠️ Staff channel send error: {e}")
+
+    # AI Response - QUEUE-BASED
+    user_id = message.author.id
+
+    # Daily quota spent: say so (not a cooldown)
+    quota_msg = ai_quota_message(user_id)
+    if quota_msg:
+        await message.channel.send(embed=create_embed("📉 Quota Reached", quota_msg, color=EMBED_COLORS["warning"]))
+        return
+
+    # Check adaptive cooldown
+    is_ready, remaining, level = check_adaptive_cooldown(user_id)
+
+    if not is_ready:
+        embed = create_embed("⏳ Please Wait", f"AI cooldown active: {remaining}s remaining", color=EMBED_COLORS["warning"])
+        await message.channel.send(embed=embed)
+        return
+
+    # Build token-budgeted prompt (lore, memory, custom instructions)
+    prompt, _ = build_ai_prompt(uid, message.content, "ticket")
+
+    # QUEUE-BASED AI: Queue the request
+    success, status_msg = await queue_ai_request(
+        user_id=user_id,
+        channel_id=message.channel.id,
+        prompt=prompt,
+        context="ticket"
+    )
+
+    if success:
+        async with message.channel.typing():
+            await asyncio.sleep(0.5)  # Brief typing indicator
+    else:
+        embed = create_embed("⚠️ Request Status", status_msg, color=EMBED_COLORS["warning"])
+        await message.channel.send(embed=embed)
+
+    # Store in memory and track engagement
+    add_memory(uid, "interaction", f"Ticket message: {message.content[:100]}")
+    update_social_credit(uid, len(message.content) // 50)
+
+@message_handler("staff_reply", lambda message, ctx: ctx["staff_channel"] and message.content.startswith(">"))
+async def handle_staff_reply(message: discord.Message, ctx: dict):
+    """Relay `>USERID message` from the staff channel to the user's DMs."""
+    parts = message.content[1:].split(" ", 1)  # Remove > and split
+    if len(parts) < 2 or not parts[0].isdigit():
+        await message.reply("❌ Format: >USERID message", delete_after=10)
+        return
+    try:
+        user_id = int(parts[0])
+        target = await bot.fetch_user(user_id)
+        await target.send(embed=create_embed("📡 HIGH COMMAND", parts[1][:1000], color=0xff0000))
+        await message.add_reaction("🛰️")
+    except (ValueError, discord.NotFound):
+        await message.reply("❌ Invalid user ID", delete_after=10)
+    except discord.Forbidden:
+        await message.reply("❌ Cannot DM user", delete_after=10)
+
+@message_handler("mention", lambda message, ctx: ctx["mentions_bot"])
+async def handle_mention(message: discord.Message, ctx: dict):
+    """Queue an AI reply when the Watcher is mentioned."""
+    # === SPAM/AD SAFETY: Do NOT trigger AI for bot's own spam/ad campaigns ===
+    if bot.active_spam_task and not bot.active_spam_task.done():
+        return  # Skip AI during active spam
+    if bot.active_ad_task and not bot.active_ad_task.done():
+        return  # Skip AI during active ads
+
+    cleanup_expired_cooldowns()  # Periodic cleanup
+
+    user_id = message.author.id
+    uid_mention = str(user_id)
+
+    # Daily quota spent: tell the user, but it's not a violation, so no escalation
+    quota_msg = ai_quota_message(user_id)
+    if quota_msg:
+        await message.reply(quota_msg, delete_after=10)
+        return
+
+    # QUEUE-BASED AI: Check adaptive cooldown
+    is_ready, remaining, level = check_adaptive_cooldown(user_id)
+
+    if not is_ready:
+        # Show cooldown with level indicator
+        if level >= 3:
+            embed = create_embed("⏸️ AI PAUSED", f"Temporary pause due to rate limiting. Wait: {remaining}s", color=EMBED_COLORS["error"])
+        else:
+            # Create fancy progress bar
+            bar_length = 10
+            cooldown_duration = ADAPTIVE_COOLDOWN_TIERS[level]
+            elapsed = cooldown_duration - remaining
+            filled = int(bar_length * elapsed / cooldown_duration) if cooldown_duration > 0 else 0
+            bar = "■" * filled + "□" * (bar_length - filled)
+
+            embed = create_embed("⏳ COOLDOWN", f"`[{bar}]` {remaining}s remaining (Level {level})")
+
+        await message.reply(embed=embed, delete_after=5)
+        escalate_cooldown(user_id, "attempt_while_cooldown")
+        return
+
+    # Near-duplicate spam costs a hash lookup, not a queue slot or provider call
+    duplicate = check_duplicate_message(user_id, message.channel.id, message.content)
+    if duplicate:
+        escalate_cooldown(user_id, f"duplicate_{duplicate}")
+        return
+
+    try:
+        # Build token-budgeted prompt with custom instructions
+        prompt, _ = build_ai_prompt(uid_mention, message.content, "mention")
+
+        # If queue is busy, drop a placeholder and edit later
+        placeholder = None
+        placeholder_id = None
+        if (AI_REQUEST_QUEUE and not AI_REQUEST_QUEUE.empty()) or AI_QUEUE_PROCESSOR_RUNNING:
+            try:
+                placeholder = await message.reply(
+                    "Sorry, please wait a moment, I will edit this message when I'm ready to answer",
+                    allowed_mentions=discord.AllowedMentions.none()
+                )
+                placeholder_id = placeholder.id
+            except Exception:
+                pass
+
+        # QUEUE-BASED AI: Queue the request instead of executing immediately
+        success, status_msg = await queue_ai_request(
+            user_id=user_id,
+            channel_id=message.channel.id,
+            prompt=prompt,
+            context="mention",
+            placeholder_message_id=placeholder_id,
+            placeholder_message=placeholder
+        )
+
+        if success:
+            # Show queued status
+            async with message.channel.typing():
+                await asyncio.sleep(0.5)  # Brief typing indicator
+        else:
+            # Show error
+            await message.reply(status_msg, delete_after=5)
+
+        # Update memory and credit (with safety)
+        try:
+            add_memory(uid_mention, "interaction", f"Mention: {message.content[:100]}")
+            update_social_credit(uid_mention, 1)
+        except Exception as mem_err:
+            print(f"⚠️ Memory/credit error: {mem_err}")
+
+    except Exception as ping_error:
+        await log_error(f"Ping reply failed: {type(ping_error).__name__}: {str(ping_error)}")
+        try:
+            await message.reply("👁️ *[Processing...]*")
+        except:
+            pass
+
+@bot.event
+async def on_message(message):
+    if message.author.bot:
+        return
+    
+    uid = str(message.author.id)
+    user_id = message.author.id
+    
+    # === REACTIVE SIDE REPLIES (budgeted, never awaited here) ===
+    # Chaos opt-out notice: once per user per chaos session
+    if bot.active_chaos_task and not bot.active_chaos_task.done():
+        if user_id not in bot.chaos_notified and user_id not in bot.chaos_optout:
+            bot.chaos_notified.add(user_id)
+            react("chaos_optout", message.channel.id, user_id, lambda: send_chaos_optout_notice(message))
+    
+    # Ad campaign ping response
+    if bot.active_ad_task and not bot.active_ad_task.done() and bot.user in message.mentions:
+        react("ad_disclosure", message.channel.id, user_id, lambda: send_ad_disclosure(message))
+    
+    # Google question mark spam
+    if "?" in message.content:
+        react("ask_google", message.channel.id, user_id, lambda: send_ask_google(message.channel))
+    
+    # Track activity
+    bot.db.setdefault("last_message_time", {})[uid] = int(time.time())
+    
+    # Route to the handlers whose prefilter matches; the first terminal match ends dispatch
+    ctx = message_context(message)
+    for entry in MESSAGE_HANDLERS:
+        if not entry["when"](message, ctx):
+            continue
+        if entry["concurrent"]:
+            handler_task = asyncio.create_task(run_message_handler(entry, message, ctx))
+            MESSAGE_HANDLER_TASKS.add(handler_task)
+            handler_task.add_done_callback(MESSAGE_HANDLER_TASKS.discard)
+        else:
+            await run_message_handler(entry, message, ctx)
+        if entry["terminal"]:
+            break
 
 # --- RUN ---
-print("🚀 Starting Discord bot...")
+# Guarded so tools (e.g. tools/ai_pipeline_bench.py) can import the bot without connecting
+if __name__ == "__main__":
+    print("🚀 Starting Discord bot...")
 
-# Add startup delay to avoid hitting rate limits on rapid restarts
-import time
-startup_delay = 5
-print(f"⏳ Waiting {startup_delay}s before connecting (rate limit safety)...")
-time.sleep(startup_delay)
-
-try:
-    bot.run(TOKEN, reconnect=True)
-except discord.HTTPException as e:
-    if e.status == 429:
-        print(f"❌ Discord rate limit (HTTP 429): {e}")
-        print("⏰ You've exceeded Discord's global rate limits.")
-        print("   Wait 10-30 minutes before restarting.")
-        print("💤 Bot entering idle sleep (will not retry - process will remain running)")
+    # Add startup delay to avoid hitting rate limits on rapid restarts
+    import time
+    startup_delay = 5
+    print(f"⏳ Waiting {startup_delay}s before connecting (rate limit safety)...")
+    time.sleep(startup_delay)
+
+    try:
+        bot.run(TOKEN, reconnect=True)
+    except discord.HTTPException as e:
+        if e.status == 429:
+            print(f"❌ Discord rate limit (HTTP 429): {e}")
+            print("⏰ You've exceeded Discord's global rate limits.")
+            print("   Wait 10-30 minutes before restarting.")
+            print("💤 Bot entering idle sleep (will not retry - process will remain running)")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                print("\n🛑 Shutdown via keyboard interrupt")
+        else:
+            print(f"❌ Discord HTTP error: {e}")
+            raise
+    except discord.LoginFailure as e:
+        print(f"❌ Discord login failed (invalid token or rate limited): {e}")
+        print("💤 Bot entering idle sleep (will not retry login - process will remain running)")
+        print("   If this is a rate limit, wait 8-24 hours before restarting.")
         try:
             while True:
                 time.sleep(3600)
         except KeyboardInterrupt:
             print("\n🛑 Shutdown via keyboard interrupt")
-    else:
-        print(f"❌ Discord HTTP error: {e}")
-        raise
-except discord.LoginFailure as e:
-    print(f"❌ Discord login failed (invalid token or rate limited): {e}")
-    print("💤 Bot entering idle sleep (will not retry login - process will remain running)")
-    print("   If this is a rate limit, wait 8-24 hours before restarting.")
-    try:
-        while True:
-            time.sleep(3600)
-    except KeyboardInterrupt:
-        print("\n🛑 Shutdown via keyboard interrupt")
-except KeyboardInterrupt:
-    print("\n🛑 Shutdown")
-except Exception as e:
-    print(f"❌ Critical error on startup: {type(e).__name__}: {e}")
-    traceback.print_exc()
-    print("💤 Bot entering idle sleep (will not retry - process will remain running)")
-    try:
-        while True:
-            time.sleep(3600)
     except KeyboardInterrupt:
-        print("\n🛑 Shutdown via keyboard interrupt")
+        print("\n🛑 Shutdown")
+    except Exception as e:
+        print(f"❌ Critical error on startup: {type(e).__name__}: {e}")
+        traceback.print_exc()
+        print("💤 Bot entering idle sleep (will not retry - process will remain running)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print("\n🛑 Shutdown via keyboard interrupt")
@@ -0,0 +1,205 @@
+"""Offline load benchmark for the AI pipeline: queue_ai_request -> ai_queue_processor -> provider -> placeholder edits.
+
+Starts tools/ai_stub_server.py in-process, imports bot.py against it (no Discord login, Supabase
+pointed at a closed port so state falls back to empty), and drives N simulated users that each
+post M mentions with think time. Replies land on fake channels/messages that timestamp every edit.
+
+Run:  python tools/ai_pipeline_bench.py --users 8 --requests 3 --latency 0.5 --rate-429 0.05
+
+Reports throughput, p50/p99 end-to-end latency (submit -> final edit), drop rate and Jain's
+fairness index over per-user completions. Requires the bot's own dependencies (discord.py etc.).
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai_stub_server import make_config, start_stub
+
+MESSAGE_IDS = itertools.count(10_000)
+
+class BenchMessage:
+    """Stand-in for discord.Message: records edit times and the final text."""
+
+    def __init__(self, channel, content: str):
+        self.id = next(MESSAGE_IDS)
+        self.channel = channel
+        self.content = content
+        self.edits = []  # [(timestamp, content)]
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        if embed is not None:
+            content = embed.description
+        self.content = content or ""
+        self.edits.append((time.time(), self.content))
+
+class BenchChannel:
+    """Stand-in for a guild text channel; send() returns a BenchMessage."""
+
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.sent = []
+
+    async def send(self, content=None, embed=None, **kwargs):
+        message = BenchMessage(self, embed.description if embed is not None else (content or ""))
+        message.edits.append((time.time(), message.content))
+        self.sent.append(message)
+        return message
+
+    def get_partial_message(self, message_id: int):
+        return next((m for m in self.sent if m.id == message_id), None)
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile (0 for empty input)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+def jain_fairness(values: list) -> float:
+    """Jain's index: 1.0 = perfectly even, 1/n = one user got everything."""
+    if not values or not any(values):
+        return 0.0
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values))
+
+def is_final(content: str) -> bool:
+    """Final replies carry no streaming cursor."""
+    return not content.rstrip().endswith("▌")
+
+async def run_bench(args) -> dict:
+    stub = await start_stub(make_config(
+        latency=args.latency, jitter=args.jitter, rate_429=args.rate_429, retry_after=args.retry_after,
+        malformed=args.malformed, chunk_delay=args.chunk_delay
+    ), port=args.port)
+
+    os.environ.update({
+        "DISCORD_TOKEN": "bench",
+        "AI_API_KEY": "",
+        "OPENROUTER_API_KEY": "",
+        "AI_CUSTOM_BASE_URL": f"http://127.0.0.1:{args.port}/v1",
+        "AI_CUSTOM_MIN_INTERVAL": str(args.min_interval),
+        "AI_QUEUE_JOURNAL": "",
+        "SUPABASE_URL": "http://127.0.0.1:9",
+        "SUPABASE_KEY": "bench.bench.bench",
+    })
+    import bot as watcher
+
+    channels = {900 + i: BenchChannel(900 + i) for i in range(args.channels)}
+    watcher.bot.get_channel = channels.get
+    processor = watcher.bot.ai_queue_processor
+
+    submitted = []  # [(user_id, submit_time, placeholder or None, admitted)]
+    stop = asyncio.Event()
+
+    async def drive_processor():
+        while not stop.is_set():
+            await processor.coro(watcher.bot)
+            await asyncio.sleep(processor.seconds or 1)
+
+    async def simulated_user(user_id: int):
+        channel = channels[900 + user_id % args.channels]
+        for n in range(args.requests):
+            await asyncio.sleep(random.uniform(0, args.think_time))
+            placeholder = await channel.send("👁️ *[Processing...]*")
+            prompt = "same question" if args.duplicate_prompts else f"user {user_id} question {n}: what does the Watcher see?"
+            admitted, _ = await watcher.queue_ai_request(
+                user_id=user_id,
+                channel_id=channel.id,
+                prompt=prompt,
+                context="mention",
+                placeholder_message_id=placeholder.id,
+                placeholder_message=placeholder
+            )
+            submitted.append((user_id, time.time(), placeholder, admitted))
+
+    started = time.time()
+    worker = asyncio.create_task(drive_processor())
+    await asyncio.gather(*(simulated_user(1000 + u) for u in range(args.users)))
+
+    # Drain: wait until the queue is empty and idle, or the deadline passes
+    drain_deadline = time.time() + args.drain_timeout
+    while time.time() < drain_deadline:
+        if watcher.AI_REQUEST_QUEUE.empty() and not watcher.AI_QUEUE_PROCESSOR_RUNNING:
+            break
+        await asyncio.sleep(0.2)
+    stop.set()
+    await worker
+    wall = time.time() - started
+    stub_stats = dict(stub.app["stats"])
+    await stub.cleanup()
+
+    latencies, failed, rejected, unanswered = [], 0, 0, 0
+    per_user = defaultdict(int)
+    for user_id, submit_time, placeholder, admitted in submitted:
+        if not admitted:
+            rejected += 1
+            continue
+        final = next((t for t, content in placeholder.edits[1:] if is_final(content)), None)
+        if final is None:
+            unanswered += 1
+        elif "SIGNAL LOST" in placeholder.content:
+            failed += 1
+        else:
+            latencies.append(final - submit_time)
+            per_user[user_id] += 1
+
+    total = len(submitted)
+    return {
+        "requests": total,
+        "completed": len(latencies),
+        "rejected": rejected,
+        "failed": failed,
+        "unanswered": unanswered,
+        "drop_rate": (total - len(latencies)) / total if total else 0.0,
+        "wall_s": wall,
+        "throughput_per_min": len(latencies) / wall * 60 if wall else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p99_s": percentile(latencies, 99),
+        "mean_s": statistics.mean(latencies) if latencies else 0.0,
+        "fairness": jain_fairness([per_user.get(1000 + u, 0) for u in range(args.users)]),
+        "stub": stub_stats,
+        "queue": dict(watcher.AI_QUEUE_STATS),
+        "coalesced": watcher.AI_COALESCE_STATS["joined"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="AI pipeline load benchmark against the local stub provider")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=3, help="Requests per user")
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--think-time", type=float, default=2.0, dest="think_time", help="Max seconds between a user's requests")
+    parser.add_argument("--duplicate-prompts", action="store_true", dest="duplicate_prompts", help="Every user asks the same thing (exercises coalescing)")
+    parser.add_argument("--drain-timeout", type=float, default=180, dest="drain_timeout")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--min-interval", type=float, default=0.0, dest="min_interval", help="Provider pacing (AI_CUSTOM_MIN_INTERVAL)")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--rate-429", type=float, default=0.0, dest="rate_429")
+    parser.add_argument("--retry-after", type=float, default=5, dest="retry_after")
+    parser.add_argument("--malformed", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.02, dest="chunk_delay")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    result = asyncio.run(run_bench(args))
+    print("\n📊 AI PIPELINE BENCH")
+    print(f"   users={args.users} requests/user={args.requests} latency={args.latency}s 429={args.rate_429} malformed={args.malformed}")
+    print(f"   completed {result['completed']}/{result['requests']} in {result['wall_s']:.1f}s "
+          f"({result['throughput_per_min']:.1f}/min)")
+    print(f"   latency p50={result['p50_s']:.2f}s p99={result['p99_s']:.2f}s mean={result['mean_s']:.2f}s")
+    print(f"   drop rate {result['drop_rate']:.1%} (rejected {result['rejected']}, failed {result['failed']}, unanswered {result['unanswered']})")
+    print(f"   fairness (Jain) {result['fairness']:.3f} • coalesced {result['coalesced']}")
+    print(f"   queue {result['queue']} • stub {result['stub']}")
+
+if __name__ == "__main__":
+    main()
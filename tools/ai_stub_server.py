@@ -0,0 +1,155 @@
+"""Local OpenAI-compatible chat-completions stub for exercising the Watcher's AI path offline.
+
+Run:  python tools/ai_stub_server.py --port 8089 --latency 0.8 --rate-429 0.1 --malformed 0.05
+Bot:  AI_CUSTOM_BASE_URL=http://127.0.0.1:8089/v1 AI_CUSTOM_MIN_INTERVAL=0 python bot.py
+
+Endpoints: POST /v1/chat/completions (JSON or SSE when "stream": true), GET /v1/models, GET /stats.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+STUB_REPLIES = [
+    "The Watcher sees your signal. Proceed, citizen.",
+    "Your request has been logged in the archive of Nimbror.",
+    "Signal received. The observation continues.",
+    "Compliance noted. The orbit remains stable.",
+]
+
+def make_config(**overrides) -> dict:
+    """Default stub behaviour; every knob can be overridden per run."""
+    config = {
+        "latency": 0.5,  # Seconds before the first byte
+        "jitter": 0.2,  # Uniform +/- jitter on latency
+        "rate_429": 0.0,  # Probability of a 429 response
+        "retry_after": 5,  # Retry-After seconds sent with 429s
+        "malformed": 0.0,  # Probability of a 200 with no usable "choices"
+        "error_500": 0.0,  # Probability of a 500
+        "chunk_delay": 0.05,  # Seconds between streamed chunks
+        "words": 40,  # Words per completion
+    }
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    return config
+
+def build_reply(config: dict, prompt: str) -> str:
+    """Deterministic-length reply text that echoes a little of the prompt."""
+    base = random.choice(STUB_REPLIES).split()
+    echo = prompt.split()[-5:]
+    words = (base + echo) * (config["words"] // max(len(base + echo), 1) + 1)
+    return " ".join(words[:config["words"]])
+
+def make_app(config: dict) -> web.Application:
+    """aiohttp app serving the chat-completions protocol with fault injection."""
+    stats = Counter()
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        stats["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(max(0.0, config["latency"] + random.uniform(-config["jitter"], config["jitter"])))
+
+        roll = random.random()
+        if roll < config["rate_429"]:
+            stats["429"] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                status=429,
+                headers={"Retry-After": str(config["retry_after"])}
+            )
+        roll -= config["rate_429"]
+        if roll < config["error_500"]:
+            stats["500"] += 1
+            return web.json_response({"error": {"message": "stub failure"}}, status=500)
+        roll -= config["error_500"]
+        malformed = roll < config["malformed"]
+
+        messages = body.get("messages") or []
+        prompt = " ".join(m.get("content") or "" for m in messages)
+        text = build_reply(config, prompt)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": len(prompt) // 4 + len(text) // 4,
+        }
+        created = int(time.time())
+        model = body.get("model", "stub")
+
+        if not body.get("stream"):
+            if malformed:
+                stats["malformed"] += 1
+                return web.json_response({"id": "stub", "object": "chat.completion", "choices": []})
+            stats["ok"] += 1
+            return web.json_response({
+                "id": f"stub-{stats['requests']}",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        if malformed:
+            stats["malformed"] += 1
+            await response.write(b"data: {not json\n\n")
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        for word in text.split():
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(config["chunk_delay"])
+        final = {"id": "stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        await response.write(f"data: {json.dumps(final)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        stats["ok"] += 1
+        return response
+
+    async def models(request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [{"id": "stub", "object": "model"}]})
+
+    async def stats_view(request: web.Request) -> web.Response:
+        return web.json_response(dict(stats))
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/v1/models", models)
+    app.router.add_get("/stats", stats_view)
+    return app
+
+async def start_stub(config: dict, host: str = "127.0.0.1", port: int = 8089) -> web.AppRunner:
+    """Start the stub on the running loop (used by the benchmark); returns the runner for cleanup."""
+    runner = web.AppRunner(make_app(config))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible chat-completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float)
+    parser.add_argument("--jitter", type=float)
+    parser.add_argument("--rate-429", type=float, dest="rate_429")
+    parser.add_argument("--retry-after", type=float, dest="retry_after")
+    parser.add_argument("--malformed", type=float)
+    parser.add_argument("--error-500", type=float, dest="error_500")
+    parser.add_argument("--chunk-delay", type=float, dest="chunk_delay")
+    parser.add_argument("--words", type=int)
+    args = parser.parse_args()
+
+    config = make_config(**{k: v for k, v in vars(args).items() if k not in ("host", "port")})
+    print(f"🧪 AI stub on http://{args.host}:{args.port}/v1 {config}")
+    web.run_app(make_app(config), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
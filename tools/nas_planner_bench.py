@@ -0,0 +1,159 @@
+"""Simulated-guild benchmark for NAS permission changes: legacy serial rewrite vs. the diff planner.
+
+Builds a fake guild (channels with @everyone overwrites, a few private and exempt channels),
+imports bot.py without connecting (Supabase pointed at a closed port), and runs each scenario
+through both strategies on fresh copies of the guild:
+
+  legacy  - every channel rewritten serially with asyncio.sleep(0.3) between calls (previous behaviour)
+  planner - plan_nas_changes / plan_permission_restore + execute_permission_plan
+
+Run:  python tools/nas_planner_bench.py --channels 100 --latency 0.08
+      python tools/nas_planner_bench.py --channels 300 --skip-legacy
+
+Reports edits issued and wall time per scenario. Requires the bot's own dependencies (discord.py etc.).
+"""
+import argparse
+import asyncio
+import copy
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.update({
+    "DISCORD_TOKEN": "bench",
+    "AI_CUSTOM_BASE_URL": "http://127.0.0.1:9/v1",
+    "AI_QUEUE_JOURNAL": "",
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_KEY": "bench.bench.bench",
+})
+import discord
+import bot as watcher
+
+class BenchRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+
+class BenchChannel:
+    """Minimal GuildChannel: overwrites plus a set_permissions that costs `latency` and counts edits."""
+
+    def __init__(self, channel_id: int, name: str, overwrites: dict, stats: dict, latency: float):
+        self.id = channel_id
+        self.name = name
+        self.overwrites = overwrites  # {role: PermissionOverwrite}
+        self.stats = stats
+        self.latency = latency
+
+    def overwrites_for(self, role) -> discord.PermissionOverwrite:
+        return copy.copy(self.overwrites.get(role, discord.PermissionOverwrite()))
+
+    async def set_permissions(self, target, *, overwrite=None, reason=None, **permissions):
+        # Same semantics as discord.py: keyword permissions replace the whole overwrite
+        if overwrite is None:
+            overwrite = discord.PermissionOverwrite(**permissions)
+        self.stats["edits"] += 1
+        await asyncio.sleep(self.latency)
+        self.overwrites[target] = overwrite
+
+class BenchGuild:
+    def __init__(self, channels: list, default_role: BenchRole):
+        self.channels = channels
+        self.default_role = default_role
+
+def build_guild(n: int, latency: float, stats: dict, seed: int) -> BenchGuild:
+    """n channels: ~10% private (view_channel=False), ~3% bot channels, plus the NAS exception channel."""
+    rng = random.Random(seed)
+    everyone = BenchRole(1)
+    channels = [BenchChannel(watcher.NAS_EXCEPTION_CHANNEL, "general", {}, stats, latency)]
+    for i in range(n - 1):
+        roll = rng.random()
+        name = f"🤖-bot-{i}" if roll < 0.03 else f"channel-{i}"
+        overwrites = {everyone: discord.PermissionOverwrite(view_channel=False)} if roll > 0.9 else {}
+        channels.append(BenchChannel(10_000 + i, name, overwrites, stats, latency))
+    return BenchGuild(channels, everyone)
+
+async def legacy_apply(guild: BenchGuild, level: int, sleep: float) -> int:
+    """The pre-planner algorithm: serial, always rewrites, keyword overwrites."""
+    fields = watcher.NAS_LEVEL_PERMISSIONS[level]
+    modified = 0
+    for channel in guild.channels:
+        if watcher.nas_exempt(channel):
+            continue
+        await asyncio.sleep(sleep)
+        await channel.set_permissions(guild.default_role, **fields)
+        modified += 1
+    return modified
+
+async def legacy_restore(guild: BenchGuild, sleep: float) -> int:
+    role = guild.default_role
+    restored = 0
+    for channel in guild.channels:
+        original = watcher.ORIGINAL_PERMISSIONS.get(channel.id, {}).get(role.id)
+        if original is None:
+            continue
+        await asyncio.sleep(sleep)
+        await channel.set_permissions(role, **{name: original.get(name) for name in watcher.NAS_RESTORE_FIELDS})
+        restored += 1
+    return restored
+
+def snapshot(guild: BenchGuild):
+    """Fill ORIGINAL_PERMISSIONS the way store_original_permissions does (fake roles aren't discord.Role)."""
+    watcher.ORIGINAL_PERMISSIONS.clear()
+    for channel in guild.channels:
+        if watcher.nas_exempt(channel):
+            continue
+        ow = channel.overwrites_for(guild.default_role)
+        watcher.ORIGINAL_PERMISSIONS[channel.id] = {guild.default_role.id: {name: getattr(ow, name) for name in watcher.NAS_RESTORE_FIELDS}}
+
+async def run_scenarios(strategy: str, args) -> list:
+    stats = {"edits": 0}
+    guild = build_guild(args.channels, args.latency, stats, args.seed)
+    snapshot(guild)
+    results = []
+    steps = [("NAS-5 -> NAS-4", 4), ("NAS-4 -> NAS-3", 3), ("NAS-3 re-applied", 3), ("NAS-3 -> NAS-1", 1), ("restore", None)]
+    for label, level in steps:
+        before = stats["edits"]
+        started = time.time()
+        if strategy == "legacy":
+            if level is None:
+                await legacy_restore(guild, args.legacy_sleep)
+            else:
+                await legacy_apply(guild, level, args.legacy_sleep)
+        else:
+            if level is None:
+                await watcher.restore_permissions(guild)
+            else:
+                await watcher.apply_nas_restrictions(guild, level)
+        results.append((label, stats["edits"] - before, time.time() - started))
+    private_kept = sum(
+        1 for c in guild.channels
+        if c.overwrites.get(guild.default_role) is not None and c.overwrites[guild.default_role].view_channel is False
+    )
+    results.append(("private channels still hidden", private_kept, 0.0))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="NAS permission planner benchmark on a simulated guild")
+    parser.add_argument("--channels", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.08, help="Simulated seconds per set_permissions call")
+    parser.add_argument("--legacy-sleep", type=float, default=0.3, dest="legacy_sleep")
+    parser.add_argument("--skip-legacy", action="store_true", dest="skip_legacy")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    strategies = ["planner"] if args.skip_legacy else ["legacy", "planner"]
+    print(f"\n🛡️ NAS PLANNER BENCH • {args.channels} channels • {args.latency}s/edit • concurrency {watcher.NAS_EDIT_CONCURRENCY}")
+    for strategy in strategies:
+        results = asyncio.run(run_scenarios(strategy, args))
+        print(f"\n   [{strategy}]")
+        for label, edits, wall in results:
+            if label.startswith("private"):
+                print(f"   {label:<30} {edits}")
+            else:
+                print(f"   {label:<30} {edits:>5} edits  {wall:>7.2f}s")
+
+if __name__ == "__main__":
+    main()